@@ -5,10 +5,8 @@ import numpy as np
 from latlng import LatLng
 from nodes import Node, Nodes
 from ways import Sidewalk, Sidewalks, Street
-from utilities import window
 from network import OSM, parse
-
-log.basicConfig(format="", level=log.DEBUG)
+from instrument import NULL_INSTRUMENT
 
 dummy_street = Street()
 
@@ -50,23 +48,49 @@ def make_sidewalk_nodes(street, prev_node, curr_node, next_node):
         return p_sidewalk_2, p_sidewalk_1
 
 
+def make_sidewalk_nodes_from_offsets(street, curr_node, offsets):
+    """
+    Create the sidewalk nodes of a street node from a row of executor.sidewalk_offsets, like make_sidewalk_nodes
+    """
+    lat1, lng1, lat2, lng2, left = offsets
+    p_sidewalk_1 = Node(None, lat1, lng1)
+    p_sidewalk_2 = Node(None, lat2, lng2)
+    curr_node.append_sidewalk_node(street.id, p_sidewalk_1)
+    curr_node.append_sidewalk_node(street.id, p_sidewalk_2)
+    if left:
+        return p_sidewalk_1, p_sidewalk_2
+    else:
+        return p_sidewalk_2, p_sidewalk_1
+
+
 def make_sidewalks(street_network):
+    """
+    Create sidewalks on both sides of each street. The positions of the sidewalk nodes are computed for all the
+    streets at once by executor.sidewalk_offsets.
+    :param street_network: Street network object
+    """
+    from arrays import NetworkArrays
+    from executor import sidewalk_offsets
+
     # Go through each street and create sidewalks on both sides of the road.
     sidewalks = Sidewalks()
     sidewalk_nodes = Nodes()
     sidewalk_network = OSM(sidewalk_nodes, sidewalks, street_network.bounds)
 
+    arrays = NetworkArrays.from_network(street_network)
+    distances = [street_network.ways.get(wid).distance_to_sidewalk for wid in arrays.way_ids.tolist()]
+    offsets = sidewalk_offsets(arrays, np.arange(len(arrays.way_ids)), distances).tolist()
+    indptr = arrays.way_indptr.tolist()
+
     for street in street_network.ways.get_list():
         sidewalk_1_nodes = []
         sidewalk_2_nodes = []
 
         # Create sidewalk nodes
-        for prev_nid, curr_nid, next_nid in window(street.nids, 3, padding=1):
-            curr_node = street_network.nodes.get(curr_nid)
-            prev_node = street_network.nodes.get(prev_nid)
-            next_node = street_network.nodes.get(next_nid)
-
-            n1, n2 = make_sidewalk_nodes(street, prev_node, curr_node, next_node)
+        i = arrays.way_position(street.id)
+        street_offsets = offsets[indptr[i]:indptr[i + 1]]
+        for nid, row in zip(street.nids, street_offsets):
+            n1, n2 = make_sidewalk_nodes_from_offsets(street, street_network.nodes.get(nid), row)
 
             sidewalk_network.add_node(n1)
             sidewalk_network.add_node(n2)
@@ -250,11 +274,24 @@ def make_crosswalks(street_network, sidewalk_network):
     return
 
 
-def main(street_network):
-    sidewalk_network = make_sidewalks(street_network)
-    make_crosswalks(street_network, sidewalk_network)
+def main(street_network, instrument=NULL_INSTRUMENT):
+    """
+    Make sidewalks and crosswalks from a preprocessed street network and export them
+    :param street_network: Street network object
+    :param instrument: An Instrument that records the time, memory and counters of each stage
+    :return: The sidewalk network in the GeoJSON format
+    """
+    with instrument.stage("make_sidewalks"):
+        sidewalk_network = make_sidewalks(street_network)
+        instrument.count("sidewalks_built", len(sidewalk_network.ways.ways))
+
+    with instrument.stage("make_crosswalks"):
+        way_count = len(sidewalk_network.ways.ways)
+        make_crosswalks(street_network, sidewalk_network)
+        instrument.count("crosswalks_built", len(sidewalk_network.ways.ways) - way_count)
 
-    output = sidewalk_network.export(format='geojson')
+    with instrument.stage("export"):
+        output = sidewalk_network.export(format='geojson')
     return output
 
 
@@ -267,6 +304,7 @@ if __name__ == "__main__":
     # filename = "../resources/SegmentedStreet_01.osm"
     #filename = "../resources/ParallelLanes_03.osm"
 
+    log.basicConfig(format="", level=log.DEBUG)
     filename = "../resources/SmallMap_04.osm"
     #filename = "../resources/capitol.osm"
 
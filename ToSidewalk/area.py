@@ -0,0 +1,71 @@
+"""
+The area filter of parse(), which builds the street network of a neighbourhood out of a large regional extract:
+
+    street_network = parse("virginia.osm.bz2", area=(38.88, -77.12, 38.90, -77.09))
+
+parse() streams the file and keeps only the nodes within a margin of the area (a cheap bounding box test), and the
+streets that touch the area. Of the other nodes it only records the id and the outcode (the sides of the box they
+lie beyond), so that it can still keep the streets whose segments cross the area between two distant nodes. The
+nodes beyond the margin of these candidate streets are read in a second pass over the nodes of the file, which stops
+at the first way, and the streets are then tested with their whole geometry. A street that crosses the boundary is
+kept whole.
+"""
+import math
+
+from arrays import KM_PER_DEGREE
+
+
+class AreaFilter(object):
+    def __init__(self, area, margin=0.2):
+        """
+        :param area: A bbox (min lat, min lng, max lat, max lng), a list of (lat, lng) vertices of a polygon, or a
+        Shapely polygon in (lng, lat)
+        :param margin: Keep the nodes within this distance of the bounding box of the area too (in kilometers)
+        """
+        from shapely.geometry import Polygon, box
+        from shapely.prepared import prep
+
+        if hasattr(area, "bounds"):
+            polygon = area
+        elif len(area) == 4 and not hasattr(area[0], "__len__"):
+            min_lat, min_lng, max_lat, max_lng = [float(value) for value in area]
+            if min_lat > max_lat or min_lng > max_lng:
+                raise ValueError("Invalid bbox %s" % (area,))
+            polygon = box(min_lng, min_lat, max_lng, max_lat)
+        else:
+            polygon = Polygon([(float(lng), float(lat)) for lat, lng in area])
+        self.polygon = polygon
+        self._prepared = prep(polygon)
+
+        min_lng, min_lat, max_lng, max_lat = polygon.bounds
+        dlat = margin / KM_PER_DEGREE
+        dlng = dlat / max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 1e-6)
+        self.box = (min_lat - dlat, min_lng - dlng, max_lat + dlat, max_lng + dlng)
+
+    def near(self, lat, lng):
+        """
+        Check whether a point is within the bounding box of the area plus the margin
+        """
+        box = self.box
+        return box[0] <= lat <= box[2] and box[1] <= lng <= box[3]
+
+    def outcode(self, lat, lng):
+        """
+        Return the Cohen-Sutherland outcode of a point relative to the bounding box of the area plus the margin: 0 if
+        the point is near the area, otherwise one bit for each side of the box the point lies beyond. A segment whose
+        ends share a bit lies beyond that side and cannot touch the area.
+        """
+        box = self.box
+        return (lat < box[0]) | (lat > box[2]) << 1 | (lng < box[1]) << 2 | (lng > box[3]) << 3
+
+    def touches(self, coordinates):
+        """
+        Check whether a line touches the area
+        :param coordinates: A list of (lat, lng)
+        """
+        from shapely.geometry import LineString, Point
+        if not coordinates:
+            return False
+        points = [(lng, lat) for lat, lng in coordinates]
+        geometry = LineString(points) if len(points) > 1 else Point(points[0])
+        return self._prepared.intersects(geometry)
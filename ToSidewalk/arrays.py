@@ -0,0 +1,172 @@
+"""
+A compact array representation of a network: node coordinates and way node lists as NumPy arrays.
+
+The object graph of Nodes and Ways is convenient for building sidewalks, but spatial queries, routing and exports
+over a finished network are faster on flat arrays. NetworkArrays is built once from a network and can be saved to
+and loaded from an .npz file.
+"""
+import numpy as np
+
+
+class NetworkArrays(object):
+    """
+    Node coordinates and way node lists in CSR form. The nodes of way i are
+    node_index[way_indptr[i]:way_indptr[i + 1]].
+    """
+    def __init__(self, node_ids, coordinates, way_ids, way_types, way_indptr, node_index):
+        """
+        :param node_ids: An array of node ids
+        :param coordinates: A (number of nodes, 2) float array of (lat, lng)
+        :param way_ids: An array of way ids
+        :param way_types: An array of way types
+        :param way_indptr: An int array with the offsets of the ways in node_index
+        :param node_index: An int array with the (0-based) node indices of all ways
+        """
+        self.node_ids = np.asarray(node_ids)
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.way_ids = np.asarray(way_ids)
+        self.way_types = np.asarray(way_types)
+        self.way_indptr = np.asarray(way_indptr, dtype=np.int64)
+        self.node_index = np.asarray(node_index, dtype=np.int64)
+        self._node_positions = None
+        self._way_positions = None
+
+    @classmethod
+    def from_network(cls, network):
+        """
+        Build the arrays from a network. Ways whose nodes are missing from the network are skipped.
+        """
+        nodes = network.nodes.get_list()
+        positions = {}
+        node_ids = []
+        coordinates = np.empty((len(nodes), 2))
+        for i, node in enumerate(nodes):
+            positions[node.id] = i
+            node_ids.append(node.id)
+            coordinates[i, 0] = node.lat
+            coordinates[i, 1] = node.lng
+
+        way_ids = []
+        way_types = []
+        way_indptr = [0]
+        node_index = []
+        for way in network.ways.get_list():
+            try:
+                indices = [positions[nid] for nid in way.nids]
+            except KeyError:
+                continue
+            way_ids.append(way.id)
+            way_types.append(str(way.type))
+            node_index.extend(indices)
+            way_indptr.append(len(node_index))
+        return cls(node_ids, coordinates, way_ids, way_types, way_indptr, node_index)
+
+    def node_position(self, nid):
+        """
+        Return the index of a node id
+        """
+        if self._node_positions is None:
+            self._node_positions = dict((nid, i) for i, nid in enumerate(self.node_ids.tolist()))
+        return self._node_positions[nid]
+
+    def way_position(self, wid):
+        """
+        Return the index of a way id
+        """
+        if self._way_positions is None:
+            self._way_positions = dict((wid, i) for i, wid in enumerate(self.way_ids.tolist()))
+        return self._way_positions[wid]
+
+    def way_nodes(self, i):
+        """
+        Return the node indices of the way at index i
+        """
+        return self.node_index[self.way_indptr[i]:self.way_indptr[i + 1]]
+
+    def segments(self):
+        """
+        Return the segments of all the ways
+        :return: A tuple of arrays (start node index, end node index, way index, index of the segment in the way)
+        """
+        lengths = np.diff(self.way_indptr)
+        is_start = np.ones(len(self.node_index), dtype=bool)
+        # The last node of each way does not start a segment
+        is_start[self.way_indptr[1:][lengths > 0] - 1] = False
+        starts = np.nonzero(is_start)[0]
+        way_of_node = np.repeat(np.arange(len(self.way_ids)), lengths)
+        way = way_of_node[starts]
+        return self.node_index[starts], self.node_index[starts + 1], way, starts - self.way_indptr[way]
+
+    def way_bboxes(self):
+        """
+        Return the bounding boxes of the ways as a (number of ways, 4) array of (min lng, min lat, max lng, max lat)
+        """
+        lengths = np.diff(self.way_indptr)
+        bboxes = np.full((len(self.way_ids), 4), np.nan)
+        nonempty = lengths > 0
+        if not nonempty.any():
+            return bboxes
+        lat = self.coordinates[self.node_index, 0]
+        lng = self.coordinates[self.node_index, 1]
+        starts = self.way_indptr[:-1][nonempty]
+        bboxes[nonempty, 0] = np.minimum.reduceat(lng, starts)
+        bboxes[nonempty, 1] = np.minimum.reduceat(lat, starts)
+        bboxes[nonempty, 2] = np.maximum.reduceat(lng, starts)
+        bboxes[nonempty, 3] = np.maximum.reduceat(lat, starts)
+        return bboxes
+
+    def arrays(self, prefix=""):
+        """
+        Return the arrays as a dictionary for np.savez
+        """
+        return {
+            prefix + "node_ids": self.node_ids,
+            prefix + "coordinates": self.coordinates,
+            prefix + "way_ids": self.way_ids,
+            prefix + "way_types": self.way_types,
+            prefix + "way_indptr": self.way_indptr,
+            prefix + "node_index": self.node_index
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=""):
+        return cls(*[arrays[prefix + key] for key in ("node_ids", "coordinates", "way_ids", "way_types",
+                                                      "way_indptr", "node_index")])
+
+
+EARTH_RADIUS = 6371.  # In kilometers, like latlng.haversine
+KM_PER_DEGREE = EARTH_RADIUS * np.pi / 180.
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """
+    Vectorized great circle distance in kilometers between points given in degrees
+    """
+    lat1, lng1, lat2, lng2 = [np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2)]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.)))
+
+
+def project_to_segments(lat, lng, start, end):
+    """
+    Project points on segments, in an equirectangular projection centered on each point
+    :param lat: Latitudes of the points
+    :param lng: Longitudes of the points
+    :param start: A (n, 2) array of the (lat, lng) of the segment starts
+    :param end: A (n, 2) array of the (lat, lng) of the segment ends
+    :return: A tuple (position of the projection along the segment in [0, 1], (n, 2) projected points, distances in
+    kilometers)
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    scale = np.cos(np.radians(lat))
+    ax = (start[:, 1] - lng) * scale
+    ay = start[:, 0] - lat
+    dx = (end[:, 1] - start[:, 1]) * scale
+    dy = end[:, 0] - start[:, 0]
+    length2 = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length2 > 0, -(ax * dx + ay * dy) / length2, 0.)
+    t = np.clip(t, 0., 1.)
+    projected = start + t[:, None] * (end - start)
+    return t, projected, haversine(lat, lng, projected[:, 0], projected[:, 1])
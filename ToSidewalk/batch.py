@@ -0,0 +1,293 @@
+"""
+Run the pipeline over many OSM extracts, e.g. one per county:
+
+    python -m ToSidewalk.batch manifest.txt -o output/ --processes 4 --memory-limit 4096
+
+The manifest lists one input file per line, optionally followed by its output file; blank lines and lines that
+start with # are skipped. Each region runs in a process of its own, at most --processes at a time, largest file first
+so that the long runs do not end up last. A region cannot inherit the memory of the previous one, and its address
+space can be capped. A worker that dies without reporting (killed by the OOM killer or a signal, a crash in GEOS or
+expat, an abort under the memory cap) fails its region with its exit code instead of hanging the batch.
+
+Outputs are written under a temporary name and renamed when complete. Every finished or failed region is appended
+to a journal (JSON lines, by default batch_journal.jsonl in the output directory); a rerun skips the regions that
+the journal records as done with the same format, if their input has not changed and their output still exists.
+A failed region does not stop the others.
+"""
+import json
+import logging as log
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from cli import STAGES, FORMATS, FILE_FORMATS
+from streams import strip_compression
+
+EXTENSIONS = {"geojson": ".geojson", "osm": ".osm", "topojson": ".topojson", "gpkg": ".gpkg", "mvt": ".mbtiles",
+              "csr": ".npz"}
+JOURNAL_NAME = "batch_journal.jsonl"
+POLL_INTERVAL = 0.05  # Seconds between two checks of the running workers
+
+
+def read_manifest(filename, output_dir, format="geojson"):
+    """
+    Read a manifest
+    :param filename: The manifest file
+    :param output_dir: The directory of the outputs that the manifest does not name
+    :param format: The output format, which sets the extension of the default outputs
+    :return: A list of (input, output) paths. Relative paths are relative to the manifest.
+    """
+    base = os.path.dirname(os.path.abspath(filename))
+    entries = []
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split()
+            input_path = os.path.join(base, fields[0])
+            if len(fields) > 1:
+                output_path = os.path.join(base, fields[1])
+            else:
+                name = os.path.splitext(strip_compression(os.path.basename(fields[0])))[0]
+                output_path = os.path.join(os.path.abspath(output_dir), name + EXTENSIONS[format])
+            entries.append((input_path, output_path))
+    return entries
+
+
+def _signature(filename):
+    stat = os.stat(filename)
+    return stat.st_size, int(stat.st_mtime)
+
+
+def read_journal(filename):
+    """
+    Return the last journal record of each input
+    """
+    records = {}
+    if not os.path.exists(filename):
+        return records
+    with open(filename) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            records[record["input"]] = record
+    return records
+
+
+def is_done(record, input_path, output_path, format, stages=STAGES, min_component_size=None):
+    """
+    Check whether a journal record shows that a region does not need to run again: it was done with the same
+    format, stages and min_component_size, its output exists, and its input has not changed since
+    """
+    if record is None or record.get("status") != "done" or record.get("format") != format:
+        return False
+    if record.get("stages") != list(stages) or record.get("min_component_size") != min_component_size:
+        return False
+    if record.get("output") != output_path or not os.path.exists(output_path):
+        return False
+    try:
+        return list(_signature(input_path)) == record.get("signature")
+    except OSError:
+        return False
+
+
+def _limit_memory(memory_limit):
+    """
+    Cap the address space of a worker (in megabytes)
+    """
+    if memory_limit:
+        import resource
+        limit = int(memory_limit) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _run_worker(task, memory_limit, connection):
+    """
+    The body of a worker process: run one region and send its journal record back
+    """
+    _limit_memory(memory_limit)
+    connection.send(run_region(task))
+    connection.close()
+
+
+def _crash_record(task, process, wall_time):
+    input_path, output_path, format, stages, min_component_size = task
+    if process.exitcode < 0:
+        error = "The worker was killed by signal %d" % -process.exitcode
+    else:
+        error = "The worker exited with code %d" % process.exitcode
+    return {"input": input_path, "output": output_path, "format": format, "stages": list(stages),
+            "min_component_size": min_component_size, "pid": process.pid, "status": "failed", "error": error,
+            "wall_time": wall_time}
+
+
+def _temporary_path(output_path):
+    # Keep the extension, which some writers use to pick the format (e.g. .mbtiles, .npz)
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, ".tmp-%d-%s" % (os.getpid(), name))
+
+
+def _replace(source, destination):
+    if os.path.isdir(destination) and not os.path.islink(destination):
+        shutil.rmtree(destination)
+    os.rename(source, destination)
+
+
+def run_region(task):
+    """
+    Run the pipeline on one region and write its output atomically
+    :param task: A tuple (input path, output path, format, stages, min_component_size)
+    :return: A journal record
+    """
+    from cli import build, write, write_text
+    from instrument import NULL_INSTRUMENT
+
+    input_path, output_path, format, stages, min_component_size = task
+    record = {"input": input_path, "output": output_path, "format": format, "stages": list(stages),
+              "min_component_size": min_component_size, "pid": os.getpid()}
+    start = time.time()
+    temporary = _temporary_path(output_path)
+    try:
+        record["signature"] = list(_signature(input_path))
+        network = build(input_path, stages, NULL_INSTRUMENT, min_component_size)
+        directory = os.path.dirname(output_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        if format in FILE_FORMATS:
+            write(network, temporary, format, NULL_INSTRUMENT)
+        else:
+            write_text(network, temporary, format, NULL_INSTRUMENT)
+        _replace(temporary, output_path)
+        record["status"] = "done"
+    except Exception as e:
+        log.exception("Region %s failed", input_path)
+        record["status"] = "failed"
+        record["error"] = "%s: %s" % (type(e).__name__, e)
+        if os.path.isdir(temporary):
+            shutil.rmtree(temporary, ignore_errors=True)
+        elif os.path.exists(temporary):
+            os.remove(temporary)
+    record["wall_time"] = time.time() - start
+    return record
+
+
+def run_batch(entries, journal, format="geojson", stages=STAGES, processes=None, memory_limit=None,
+              min_component_size=None, force=False):
+    """
+    Run the pipeline over many regions
+    :param entries: A list of (input path, output path)
+    :param journal: The journal file
+    :param format: The output format
+    :param stages: The pipeline stages to run
+    :param processes: Number of regions run at a time (default: number of CPUs)
+    :param memory_limit: Cap on the address space of each worker, in megabytes
+    :param min_component_size: Drop the connected components with fewer nodes than this
+    :param force: Run the regions that the journal records as done too
+    :return: A list of journal records, one for each region, in the order of entries. The regions that were skipped
+    have the status "skipped".
+    """
+    records = read_journal(journal)
+    results = {}
+    tasks = []
+    for input_path, output_path in entries:
+        if not force and is_done(records.get(input_path), input_path, output_path, format, stages,
+                                 min_component_size):
+            results[input_path] = {"input": input_path, "output": output_path, "status": "skipped"}
+        else:
+            tasks.append((input_path, output_path, format, stages, min_component_size))
+
+    # Largest first. Missing inputs sort last and fail in their worker.
+    tasks.sort(key=lambda task: os.path.getsize(task[0]) if os.path.exists(task[0]) else -1, reverse=True)
+    log.info("Running %d regions, skipping %d", len(tasks), len(results))
+
+    processes = processes or multiprocessing.cpu_count()
+    pending = list(reversed(tasks))
+    running = []  # (task, process, connection, start time)
+    try:
+        with open(journal, "a") as f:
+            while pending or running:
+                while pending and len(running) < processes:
+                    task = pending.pop()
+                    receiver, sender = multiprocessing.Pipe(duplex=False)
+                    process = multiprocessing.Process(target=_run_worker, args=(task, memory_limit, sender))
+                    process.start()
+                    sender.close()
+                    running.append((task, process, receiver, time.time()))
+
+                finished = []
+                for item in running:
+                    task, process, receiver, start = item
+                    record = None
+                    if receiver.poll():
+                        try:
+                            record = receiver.recv()
+                        except EOFError:
+                            # The worker died before it sent its record
+                            process.join()
+                            record = _crash_record(task, process, time.time() - start)
+                        else:
+                            process.join()
+                    elif not process.is_alive():
+                        process.join()
+                        record = _crash_record(task, process, time.time() - start)
+                    if record is not None:
+                        receiver.close()
+                        finished.append(item)
+                        f.write(json.dumps(record) + "\n")
+                        f.flush()
+                        os.fsync(f.fileno())
+                        results[record["input"]] = record
+                        log.info("%s %s (%.1fs)", record["status"], record["input"], record["wall_time"])
+                for item in finished:
+                    running.remove(item)
+                if running and not finished:
+                    time.sleep(POLL_INTERVAL)
+    finally:
+        for _, process, _, _ in running:
+            process.terminate()
+            process.join()
+    return [results[input_path] for input_path, _ in entries]
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="tosidewalk-batch",
+                                     description="Generate sidewalk networks for the OSM files of a manifest")
+    parser.add_argument("manifest", help="A file with one input (and optionally output) path per line")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory of the outputs the manifest does not name")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="geojson", help="Output format")
+    parser.add_argument("-s", "--stages", nargs="+", choices=STAGES, default=STAGES, help="Pipeline stages to run")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--memory-limit", type=int, default=None, help="Address space cap per worker, in megabytes")
+    parser.add_argument("--min-component-size", type=int, default=None,
+                        help="Drop the connected components with fewer nodes than this")
+    parser.add_argument("--journal", default=None, help="Journal file (default: %s in the output directory)" %
+                        JOURNAL_NAME)
+    parser.add_argument("--force", action="store_true", help="Run the regions that are already done too")
+    args = parser.parse_args(argv)
+    log.basicConfig(format="%(levelname)s: %(message)s", level=log.INFO)
+
+    try:
+        entries = read_manifest(args.manifest, args.output_dir, args.format)
+    except IOError as e:
+        log.error(e)
+        return 1
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+    journal = args.journal or os.path.join(args.output_dir, JOURNAL_NAME)
+    results = run_batch(entries, journal, args.format, args.stages, args.processes, args.memory_limit,
+                        args.min_component_size, args.force)
+    failed = [record for record in results if record["status"] == "failed"]
+    for record in failed:
+        log.error("%s: %s", record["input"], record["error"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
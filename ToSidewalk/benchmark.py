@@ -0,0 +1,338 @@
+"""
+Benchmark the sidewalk generation pipeline (parse, preprocess, make_sidewalks, make_crosswalks and export)
+over the bundled OSM files and over synthetic grid cities of increasing size.
+
+Each case runs in its own process so that the peak memory of one case does not leak into the next one, and so
+that a case that takes too long can be stopped. The results are written as JSON so that runs of different
+versions can be compared with compare().
+
+Example:
+    python -m ToSidewalk.benchmark --sizes 1000 10000 --output results.json
+"""
+import json
+import logging as log
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from Queue import Empty
+
+from network import parse
+from ToSidewalk import make_sidewalks, make_crosswalks
+from instrument import peak_memory, tracemalloc
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "resources")
+RESOURCE_FILES = ["capitol.osm", "newyork3.osm", "ParallelLanes_03.osm", "MapPair_B_01.osm"]
+SYNTHETIC_SIZES = [1000, 10000, 100000, 1000000]
+STAGES = ["parse", "preprocess", "make_sidewalks", "make_crosswalks", "export"]
+
+
+def make_grid_city(filename, size, spacing=0.001, segment_nodes=3, dual_carriageway_every=0, diagonal_every=5,
+                   origin=(38.9, -77.0)):
+    """
+    Write a synthetic grid city to an OSM file.
+
+    The city has size x size intersections. Every block edge is subdivided by segment_nodes intermediate nodes.
+    Every dual_carriageway_every-th east-west street is a dual carriageway (two parallel one-way ways close enough
+    to be merged by OSM.preprocess), and every diagonal_every-th intersection on the main diagonal is crossed by a
+    diagonal avenue, which creates high-degree intersections. Set either parameter to 0 to disable the feature.
+
+    The dual carriageways are off by default: OSM.merge_parallel_street_segments fails on them (it has not been
+    finished), so with them preprocess stops with an error and no later stage is measured.
+    :param filename: Output file name
+    :param size: Number of intersections along each side of the grid
+    :param spacing: Distance between two intersections in degrees
+    :param segment_nodes: Number of intermediate nodes between two intersections
+    :param dual_carriageway_every: Period of the dual carriageways (0: none)
+    :param diagonal_every: Period of the diagonal avenue intersections
+    :param origin: The south-west corner of the grid (lat, lng)
+    :return: The number of nodes written
+    """
+    lat0, lng0 = origin
+    step = spacing / (segment_nodes + 1)
+    offset = spacing / 40  # Half the distance between the two carriageways
+    nodes = []
+    ways = []
+
+    def add_node(lat, lng):
+        nodes.append((lat, lng))
+        return len(nodes)
+
+    # Intersections and the east-west streets. A dual carriageway has one intersection node per carriageway.
+    intersections = {}
+    for row in range(size):
+        lat = lat0 + row * spacing
+        dual = dual_carriageway_every and row % dual_carriageway_every == dual_carriageway_every - 1
+        carriageways = [(lat - offset, "yes"), (lat + offset, "-1")] if dual else [(lat, None)]
+        for c, (carriageway_lat, oneway) in enumerate(carriageways):
+            nids = []
+            for col in range(size):
+                nid = add_node(carriageway_lat, lng0 + col * spacing)
+                intersections[(row, col, c)] = nid
+                nids.append(nid)
+                if col < size - 1:
+                    for k in range(1, segment_nodes + 1):
+                        nids.append(add_node(carriageway_lat, lng0 + col * spacing + k * step))
+            ways.append((nids, "primary" if dual else "residential", oneway))
+
+    # The north-south streets, which cross every carriageway of the east-west streets
+    for col in range(size):
+        lng = lng0 + col * spacing
+        nids = []
+        for row in range(size):
+            c = 0
+            while (row, col, c) in intersections:
+                nids.append(intersections[(row, col, c)])
+                c += 1
+            if row < size - 1:
+                for k in range(1, segment_nodes + 1):
+                    nids.append(add_node(lat0 + row * spacing + k * step, lng))
+        ways.append((nids, "residential", None))
+
+    # Diagonal avenues through the grid intersections
+    if diagonal_every:
+        for start in range(0, size - 1, diagonal_every):
+            nids = []
+            for i in range(start, min(start + diagonal_every, size - 1)):
+                nids.append(intersections[(i, i, 0)])
+                lat, lng = nodes[nids[-1] - 1]
+                for k in range(1, segment_nodes + 1):
+                    nids.append(add_node(lat + k * step, lng + k * step))
+            nids.append(intersections[(min(start + diagonal_every, size - 1),) * 2 + (0,)])
+            ways.append((nids, "secondary", None))
+
+    bounds = (lat0 - spacing, lng0 - spacing, lat0 + size * spacing, lng0 + size * spacing)
+    with open(filename, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="ToSidewalk.benchmark">\n')
+        f.write(' <bounds minlat="%.7f" minlon="%.7f" maxlat="%.7f" maxlon="%.7f"/>\n' % bounds)
+        for nid, (lat, lng) in enumerate(nodes, 1):
+            f.write(' <node id="%d" lat="%.7f" lon="%.7f"/>\n' % (nid, lat, lng))
+        for wid, (nids, highway, oneway) in enumerate(ways, 1):
+            f.write(' <way id="%d">\n' % wid)
+            f.write("".join('  <nd ref="%d"/>\n' % nid for nid in nids))
+            f.write('  <tag k="highway" v="%s"/>\n' % highway)
+            if oneway:
+                f.write('  <tag k="oneway" v="%s"/>\n' % oneway)
+            f.write(' </way>\n')
+        f.write('</osm>\n')
+    return len(nodes)
+
+
+def grid_size_for(target_nodes, segment_nodes=3):
+    """
+    Return the grid size for which make_grid_city writes roughly target_nodes nodes
+    """
+    nodes_per_intersection = 1 + 2 * segment_nodes
+    return max(2, int(round((float(target_nodes) / nodes_per_intersection) ** 0.5)))
+
+
+def measure(stage, func, *args):
+    """
+    Run func(*args) and measure its wall time and peak memory.
+
+    With tracemalloc, peak_memory is the peak of the memory allocated during the stage. Without it, only the high-water
+    mark of the whole process is known: peak_memory is that mark after the stage (the maximum over this stage and all
+    the earlier ones), and peak_memory_increase is how much the stage raised it.
+    :return: A tuple of the return value of func and a record of the measurement
+    """
+    if tracemalloc:
+        tracemalloc.start()
+    else:
+        maxrss_before = peak_memory()
+    start = time.time()
+    record = {"stage": stage, "status": "ok"}
+    result = None
+    try:
+        result = func(*args)
+    except Exception as e:
+        log.exception("Stage %s failed", stage)
+        record["status"] = "error"
+        record["error"] = "%s: %s" % (type(e).__name__, e)
+    record["wall_time"] = time.time() - start
+    if tracemalloc:
+        record["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        record["peak_memory_source"] = "tracemalloc"
+        tracemalloc.stop()
+    else:
+        record["peak_memory"] = peak_memory()
+        record["peak_memory_increase"] = record["peak_memory"] - maxrss_before
+        record["peak_memory_source"] = "process_maxrss"
+    return result, record
+
+
+def run_pipeline(filename, report=None):
+    """
+    Run the whole pipeline on an OSM file and measure each stage
+    :param filename: An OSM file
+    :param report: A callback that receives the record of each stage as soon as the stage is done
+    :return: A list of records, one for each stage that was run
+    """
+    records = []
+    state = {}
+
+    def do_parse():
+        state["street_network"] = parse(filename)
+        state["nodes"] = len(state["street_network"].nodes.nodes)
+
+    def do_preprocess():
+        state["street_network"].preprocess()
+        state["street_network"].parse_intersections()
+
+    def do_make_sidewalks():
+        state["sidewalk_network"] = make_sidewalks(state["street_network"])
+
+    def do_make_crosswalks():
+        make_crosswalks(state["street_network"], state["sidewalk_network"])
+
+    def do_export():
+        state["output"] = state["sidewalk_network"].export(format="geojson")
+
+    stages = [do_parse, do_preprocess, do_make_sidewalks, do_make_crosswalks, do_export]
+    for stage, func in zip(STAGES, stages):
+        _, record = measure(stage, func)
+        record["nodes"] = state.get("nodes", 0)
+        record["nodes_per_second"] = record["nodes"] / record["wall_time"] if record["wall_time"] > 0 else None
+        records.append(record)
+        if report:
+            report(record)
+        if record["status"] != "ok":
+            break
+    return records
+
+
+def _run_pipeline_worker(filename, queue):
+    run_pipeline(filename, report=queue.put)
+    queue.put(None)
+
+
+def run_case(name, filename, timeout=None):
+    """
+    Run the pipeline on an OSM file in a child process
+    :param name: The name of the case
+    :param filename: An OSM file
+    :param timeout: Seconds after which the case is stopped. The stage that was running is reported as a timeout.
+    :return: A list of records
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_pipeline_worker, args=(filename, queue))
+    process.start()
+
+    records = []
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        try:
+            remaining = max(0, deadline - time.time()) if deadline else None
+            record = queue.get(timeout=remaining)
+        except Empty:
+            process.terminate()
+            stage = STAGES[len(records)] if len(records) < len(STAGES) else None
+            records.append({"stage": stage, "status": "timeout", "wall_time": timeout})
+            break
+        if record is None:
+            break
+        records.append(record)
+    process.join()
+
+    for record in records:
+        record["case"] = name
+    return records
+
+
+def run(files=None, sizes=None, timeout=None, **grid_options):
+    """
+    Run the benchmark over the OSM files and the synthetic grid cities
+    :param files: OSM files to run. Defaults to RESOURCE_FILES in the resources directory.
+    :param sizes: Approximate numbers of nodes of the synthetic grid cities. Defaults to SYNTHETIC_SIZES.
+    :param timeout: Seconds after which a case is stopped
+    :param grid_options: Keyword arguments passed to make_grid_city
+    :return: A dictionary with the environment and the list of records
+    """
+    if files is None:
+        files = [os.path.join(RESOURCE_DIR, filename) for filename in RESOURCE_FILES]
+    if sizes is None:
+        sizes = SYNTHETIC_SIZES
+
+    records = []
+    for filename in files:
+        log.info("Benchmarking %s", filename)
+        records.extend(run_case(os.path.basename(filename), filename, timeout))
+
+    temp_dir = tempfile.mkdtemp(prefix="tosidewalk-benchmark-")
+    try:
+        for target_nodes in sizes:
+            size = grid_size_for(target_nodes, grid_options.get("segment_nodes", 3))
+            filename = os.path.join(temp_dir, "grid_%d.osm" % size)
+            make_grid_city(filename, size, **grid_options)
+            log.info("Benchmarking a %d x %d grid city", size, size)
+            records.extend(run_case("grid_%d" % target_nodes, filename, timeout))
+            os.remove(filename)
+    finally:
+        os.rmdir(temp_dir)
+
+    package = sys.modules.get(__name__.rpartition(".")[0])
+    return {
+        "version": getattr(package, "__version__", None),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "records": records
+    }
+
+
+def compare(old, new):
+    """
+    Compare the results of two benchmark runs
+    :param old: Results returned by run() (or loaded from its JSON output)
+    :param new: Results returned by run()
+    :return: A list of (case, stage, old wall time, new wall time, speedup) tuples for the stages that succeeded in
+    both runs
+    """
+    def index(results):
+        return dict(((r["case"], r["stage"]), r) for r in results["records"] if r["status"] == "ok")
+
+    old_index = index(old)
+    new_index = index(new)
+    rows = []
+    for key in sorted(set(old_index) & set(new_index)):
+        old_time = old_index[key]["wall_time"]
+        new_time = new_index[key]["wall_time"]
+        rows.append(key + (old_time, new_time, old_time / new_time if new_time > 0 else None))
+    return rows
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the sidewalk generation pipeline")
+    parser.add_argument("files", nargs="*", help="OSM files to benchmark (default: bundled resources)")
+    parser.add_argument("--sizes", nargs="*", type=int, default=SYNTHETIC_SIZES,
+                        help="Approximate node counts of the synthetic grid cities")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds after which a case is stopped")
+    parser.add_argument("--segment-nodes", type=int, default=3)
+    parser.add_argument("--dual-carriageway-every", type=int, default=0,
+                        help="Period of the dual carriageways (default: none, preprocess cannot merge them yet)")
+    parser.add_argument("--diagonal-every", type=int, default=5)
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Compare with the results in this JSON file")
+    args = parser.parse_args(argv)
+
+    log.basicConfig(format="%(message)s", level=log.INFO)
+    results = run(args.files or None, args.sizes, args.timeout, segment_nodes=args.segment_nodes,
+                  dual_carriageway_every=args.dual_carriageway_every, diagonal_every=args.diagonal_every)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print json.dumps(results, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        for case, stage, old_time, new_time, speedup in compare(old, results):
+            log.info("%s %s: %.3fs -> %.3fs (x%.2f)", case, stage, old_time, new_time, speedup or 0)
+
+
+if __name__ == "__main__":
+    main()
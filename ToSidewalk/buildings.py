@@ -0,0 +1,204 @@
+"""
+Building footprints from an OSM extract, and a stage that flags or clips the sidewalks that run through them.
+
+make_sidewalks offsets the streets by a fixed distance, so on narrow streets the sidewalks may cross buildings. The
+closed ways with a building tag are read out of the same file that the streets come from (streamed, in two passes:
+the ways first, then the nodes that they use) and indexed, and all the sidewalks are tested against the index in
+one batch. With Shapely 1.8 and later the index is an STRtree and the batch is one query_bulk call. Older versions
+of Shapely only query an STRtree one geometry at a time, at about a millisecond per query, so the bounding boxes
+are joined in one vectorized pass over a GridIndex (see index.py) instead, and only the pairs whose boxes overlap
+are tested exactly:
+
+    buildings = Buildings.from_file("input.osm")
+    flagged = mark_buildings(sidewalk_network, buildings)          # tags the ways with building_conflict=yes
+    clipped = mark_buildings(sidewalk_network, buildings, clip=True)  # removes the parts inside the buildings
+
+Multipolygon relations are not read.
+"""
+from xml.etree import cElementTree as ET
+
+import numpy as np
+
+from index import GridIndex
+from network import read_nodes
+from nodes import Node
+from streams import open_input
+
+CONFLICT_TAG = "building_conflict"
+# About 10 cm, so that the rounding of the points where a clipped sidewalk leaves a building does not count
+TOLERANCE = 1e-6
+
+
+def read_building_ways(filename):
+    """
+    Read the closed ways with a building tag
+    :return: A list of (way id, node ids)
+    """
+    ways = []
+    with open_input(filename) as osm:
+        context = ET.iterparse(osm, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "start":
+                continue
+            if elem.tag == "way":
+                building = elem.find("tag[@k='building']")
+                if building is not None and building.get("v") != "no":
+                    nids = [nd.get("ref") for nd in elem if nd.tag == "nd"]
+                    if len(nids) >= 4 and nids[0] == nids[-1]:
+                        ways.append((elem.get("id"), nids))
+            elif elem.tag != "node" and elem.tag != "relation":
+                continue
+            root.clear()
+    return ways
+
+
+class Buildings(object):
+    def __init__(self, ids, polygons, bboxes=None):
+        """
+        :param ids: The way ids of the buildings
+        :param polygons: The Shapely polygons of the buildings, in (lng, lat)
+        :param bboxes: The (min lng, min lat, max lng, max lat) of the polygons, if known. Reading the bounds of many
+        Shapely geometries is slow.
+        """
+        from shapely.strtree import STRtree
+        self.ids = list(ids)
+        self.polygons = list(polygons)
+        self.tree = None
+        self.index = None
+        if self.polygons:
+            if hasattr(STRtree, "query_bulk"):
+                self.tree = STRtree(self.polygons)
+            else:
+                if bboxes is None:
+                    bboxes = [polygon.bounds for polygon in self.polygons]
+                self.index = GridIndex(bboxes)
+        self._prepared = {}
+
+    @classmethod
+    def from_file(cls, filename, area=None):
+        """
+        Read the buildings of an OSM file
+        :param area: Only keep the buildings that touch this area (see parse)
+        """
+        from shapely.geometry import Polygon
+        ways = read_building_ways(filename)
+        nids = set(nid for _, way_nids in ways for nid in way_nids)
+        locations = dict((node.id, (node.lng, node.lat)) for node in read_nodes(filename, nids))
+        area_filter = None
+        if area is not None:
+            from area import AreaFilter
+            area_filter = AreaFilter(area, margin=0.)
+
+        ids, polygons, bboxes = [], [], []
+        for wid, way_nids in ways:
+            if any(nid not in locations for nid in way_nids):
+                continue
+            coordinates = [locations[nid] for nid in way_nids]
+            polygon = Polygon(coordinates)
+            if not polygon.is_valid:
+                polygon = polygon.buffer(0)
+            if polygon.is_empty or (area_filter is not None and not area_filter.polygon.intersects(polygon)):
+                continue
+            ids.append(wid)
+            polygons.append(polygon)
+            lngs, lats = zip(*coordinates)
+            bboxes.append((min(lngs), min(lats), max(lngs), max(lats)))
+        return cls(ids, polygons, bboxes)
+
+    def __len__(self):
+        return len(self.polygons)
+
+    def intersecting(self, geometries, bboxes=None):
+        """
+        Find the buildings that intersect some geometries
+        :param geometries: A list of Shapely geometries in (lng, lat)
+        :param bboxes: The bounding boxes of the geometries, if known
+        :return: A tuple of arrays (index of the geometry, index of the building)
+        """
+        if not geometries or not self.polygons:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if self.tree is not None:
+            pairs = self.tree.query_bulk(np.array(geometries, dtype=object), predicate="intersects")
+            return pairs[0].astype(np.int64), pairs[1].astype(np.int64)
+
+        from shapely.prepared import prep
+        if bboxes is None:
+            bboxes = [geometry.bounds for geometry in geometries]
+        first, second = self.index.join(bboxes)
+        keep = np.zeros(len(first), dtype=bool)
+        for k, (i, b) in enumerate(zip(first.tolist(), second.tolist())):
+            prepared = self._prepared.get(b)
+            if prepared is None:
+                prepared = self._prepared[b] = prep(self.polygons[b])
+            keep[k] = prepared.intersects(geometries[i])
+        return first[keep], second[keep]
+
+
+def mark_buildings(network, buildings, clip=False, types=("footway",), tolerance=TOLERANCE):
+    """
+    Flag or clip the ways of a sidewalk network that intersect buildings
+    :param network: A sidewalk network
+    :param buildings: A Buildings object
+    :param clip: Remove the parts of the ways inside the buildings instead of tagging the ways with
+    building_conflict=yes
+    :param types: The types of the ways to check. The crosswalks are left alone by default.
+    :param tolerance: Ignore the ways that run less than this far inside a building (in degrees)
+    :return: The number of ways that intersect buildings
+    """
+    from shapely.geometry import LineString
+    ways = [way for way in network.ways.get_list() if way.type in types and len(way.nids) >= 2]
+    lines, bboxes = [], []
+    for way in ways:
+        coordinates = [(network.nodes.get(nid).lng, network.nodes.get(nid).lat) for nid in way.nids]
+        lines.append(LineString(coordinates))
+        lngs, lats = zip(*coordinates)
+        bboxes.append((min(lngs), min(lats), max(lngs), max(lats)))
+    way_positions, building_positions = buildings.intersecting(lines, bboxes)
+
+    conflicts = {}
+    for i, b in zip(way_positions.tolist(), building_positions.tolist()):
+        # Sidewalks that only touch or follow a wall, like the pieces left by clipping, are fine
+        polygon = buildings.polygons[b]
+        if lines[i].intersection(polygon).difference(polygon.boundary).length > tolerance:
+            conflicts.setdefault(i, []).append(b)
+    for i, building_list in conflicts.items():
+        way = ways[i]
+        if clip:
+            _clip_way(network, way, lines[i], [buildings.polygons[b] for b in building_list])
+        elif way.get_tag(CONFLICT_TAG) is None:
+            way.tags = way.tags + (CONFLICT_TAG, "yes")
+            way.invalidate_feature()
+    return len(conflicts)
+
+
+def _clip_way(network, way, line, polygons):
+    """
+    Replace a way with its parts outside some polygons
+    """
+    from shapely.ops import unary_union
+    outside = line.difference(unary_union(polygons))
+    parts = getattr(outside, "geoms", [outside])
+
+    nids = dict(((node.lng, node.lat), node.id) for node in (network.nodes.get(nid) for nid in way.nids))
+    for part in parts:
+        if part.is_empty or part.geom_type != "LineString":
+            continue
+        part_nids = []
+        for lng, lat in part.coords:
+            nid = nids.get((lng, lat))
+            if nid is None:
+                # A new node where the way enters or leaves a building
+                node = Node(None, lat, lng)
+                network.add_node(node)
+                nid = nids[(lng, lat)] = node.id
+            part_nids.append(nid)
+        if len(part_nids) < 2:
+            continue
+        piece = type(way)(None, part_nids, way.type)
+        piece.tags = way.tags
+        piece.user = way.user
+        if hasattr(way, "street_id"):
+            piece.set_street_id(way.street_id)
+        network.add_way(piece)
+    network.remove_way(way.id)
@@ -0,0 +1,187 @@
+"""
+A cache of pipeline checkpoints, so that a run can skip the stages whose inputs have not changed.
+
+build() saves the state of the network after parse, after preprocess and after make_sidewalks. Each checkpoint is
+keyed by a hash of the input file and of the parameters of its stage and of every stage before it, so changing a
+parameter invalidates the checkpoints from its stage on, and tweaking the crosswalks reuses the preprocessed street
+network and the sidewalks:
+
+    cache = CheckpointCache("~/.cache/tosidewalk", max_size=2 * 1024 ** 3)
+    network = build("input.osm", cache=cache)
+
+The checkpoints are pickles, one file per key. The cache evicts the least recently used ones when its total size goes
+over max_size. Loading a pickle runs arbitrary code, so the cache directory must not be writable by others.
+
+The nodes and ways that the pipeline creates get negative ids from a counter (see utilities.new_id). A checkpoint
+records these ids and loading it moves the counter past them, so that the objects created after a resume cannot
+reuse them.
+"""
+import cPickle as pickle
+import errno
+import gc
+import hashlib
+import logging as log
+import os
+import tempfile
+
+from utilities import reserve_ids
+
+# Bump when the pickled classes change in a way that breaks the checkpoints already written
+FORMAT_VERSION = 2
+EXTENSION = ".pickle"
+
+
+def file_hash(filename, block_size=1 << 20):
+    """
+    Return the SHA-1 hex digest of the content of a file
+    """
+    digest = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def generated_ids(value):
+    """
+    Return the ids of the nodes and ways of a checkpoint that new_id() must not give again: the generated ones, and
+    the negative ids read from the input
+    :param value: A network or a tuple of networks. Other values have no ids.
+    """
+    ids = set()
+    for network in value if isinstance(value, tuple) else (value,):
+        if not hasattr(network, "nodes") or not hasattr(network, "ways"):
+            continue
+        for item in network.nodes.get_list() + network.ways.get_list():
+            if item.generated or item.id.startswith("-"):
+                ids.add(item.id)
+    return ids
+
+
+def stage_key(previous, stage, parameters=None):
+    """
+    Return the key of a checkpoint
+    :param previous: The key of the previous checkpoint, or the hash of the input file for the first stage
+    :param stage: The name of the stage
+    :param parameters: A dictionary of the parameters of the stage. The values must have a stable repr().
+    :return: A hex digest
+    """
+    digest = hashlib.sha1()
+    digest.update(repr((FORMAT_VERSION, previous, stage, sorted((parameters or {}).items()))))
+    return digest.hexdigest()
+
+
+class CheckpointCache(object):
+    def __init__(self, directory, max_size=None):
+        """
+        :param directory: The cache directory. It is created if it does not exist.
+        :param max_size: The maximum total size of the checkpoints in bytes (None for no limit)
+        """
+        self.directory = os.path.expanduser(directory)
+        self.max_size = max_size
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + EXTENSION)
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key):
+        """
+        Load a checkpoint and mark it as recently used
+        :return: The saved object, or None if there is no valid checkpoint for the key
+        """
+        path = self.path(key)
+        # The collector would otherwise run over the growing object graph again and again while it is rebuilt
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(path, "rb") as f:
+                ids, value = pickle.load(f)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                log.warning("Could not read checkpoint %s: %s", path, e)
+            return None
+        except Exception as e:
+            # Truncated or written by an incompatible version
+            log.warning("Discarding invalid checkpoint %s: %s", path, e)
+            self._remove(path)
+            return None
+        finally:
+            if enabled:
+                gc.enable()
+        reserve_ids(ids)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def save(self, key, value):
+        """
+        Save a checkpoint, then evict the least recently used checkpoints if the cache is over its size limit
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=EXTENSION)
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                pickle.dump((generated_ids(value), value), f, pickle.HIGHEST_PROTOCOL)
+            os.rename(temporary, self.path(key))
+        except BaseException:
+            self._remove(temporary)
+            raise
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        Return a list of (last use time, size, path) of the checkpoints, least recently used first
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(EXTENSION) or name.startswith("."):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used checkpoints until the cache fits in max_size
+        :param keep: The key of a checkpoint that must not be removed, e.g. the one just saved
+        :return: The number of checkpoints removed
+        """
+        if self.max_size is None:
+            return 0
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        kept = self.path(keep) if keep is not None else None
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if path == kept:
+                continue
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
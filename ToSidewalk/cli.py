@@ -0,0 +1,319 @@
+"""
+The tosidewalk command. Generates a sidewalk network from an OSM file:
+
+    tosidewalk input.osm -o sidewalks.geojson
+    tosidewalk input.osm.bz2 -o sidewalks.geojson.gz
+    tosidewalk input.osm -o streets.osm --format osm --stages preprocess
+    tosidewalk input.osm -o sidewalks.topojson --format topojson --precision 6 --no-style
+    tosidewalk virginia.osm.bz2 -o arlington.geojson --bbox 38.84,-77.17,38.93,-77.03
+
+The pipeline modules (and numpy/Shapely with them) are imported only after the arguments are parsed, so that
+invocations such as --help return immediately.
+"""
+import argparse
+import logging as log
+import sys
+
+STAGES = ["preprocess", "sidewalks", "crosswalks"]
+FORMATS = ["geojson", "osm", "topojson", "gpkg", "mvt", "csr"]
+# Formats that are written directly to a file rather than returned as a string by OSM.export()
+FILE_FORMATS = ["gpkg", "mvt", "csr"]
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="tosidewalk",
+                                     description="Generate a potential sidewalk network from OpenStreetMap streets")
+    parser.add_argument("input", help="Input OSM file, optionally compressed with gzip or bzip2")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Output file (default: standard output), compressed if it ends with .gz or .bz2. For "
+                             "mvt, a directory or an .mbtiles file. For csr, a directory of .npy arrays or an .npz "
+                             "file.")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="geojson", help="Output format")
+    parser.add_argument("--precision", type=int, default=6,
+                        help="Decimal places of the quantized coordinates of the topojson format (default: %(default)s)")
+    parser.add_argument("--no-style", action="store_true",
+                        help="Leave the style properties (stroke, user) out of the topojson format")
+    parser.add_argument("--bbox", type=parse_bbox, default=None,
+                        help="Only read the streets that touch this area: min_lat,min_lng,max_lat,max_lng")
+    parser.add_argument("-s", "--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Pipeline stages to run. Without sidewalks, the street network is written.")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="Measure the ways and encode the geojson output in this many worker processes that share "
+                             "the coordinates of the network")
+    parser.add_argument("--split-crossings", action="store_true",
+                        help="Split the sidewalks that cross each other and trim the short dangling ends")
+    parser.add_argument("--buildings", choices=["flag", "clip"], default=None,
+                        help="Tag the sidewalks that run through the buildings of the input with building_conflict=yes "
+                             "(flag), or remove the parts inside the buildings (clip)")
+    parser.add_argument("--min-component-size", type=int, default=None,
+                        help="Drop the connected components with fewer nodes than this before export")
+    parser.add_argument("--index", default=None,
+                        help="Save a spatial query index of the output network to this .npz file")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Save checkpoints after parse, preprocess and make_sidewalks in this directory, and resume "
+                             "from them when the input and parameters are unchanged")
+    parser.add_argument("--cache-size", type=int, default=2048,
+                        help="Maximum size of the checkpoint cache in megabytes (default: %(default)s)")
+    parser.add_argument("--report", default=None,
+                        help="Write the time, memory and counters of each stage to this JSON file")
+    parser.add_argument("--profile-dir", default=None, help="Write a cProfile dump of each stage to this directory")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Log progress (-vv for debug messages)")
+    return parser
+
+
+def parse_bbox(value):
+    """
+    Parse a bbox argument (min lat, min lng, max lat, max lng)
+    """
+    try:
+        bbox = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        bbox = ()
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise argparse.ArgumentTypeError("Expected min_lat,min_lng,max_lat,max_lng, got %s" % value)
+    return bbox
+
+
+def build(filename, stages=STAGES, instrument=None, min_component_size=None, cache=None, area=None,
+          crossings=False, buildings=None):
+    """
+    Run the selected pipeline stages on an OSM file
+    :param filename: Input OSM file
+    :param stages: Stages to run. "crosswalks" requires "sidewalks".
+    :param instrument: An Instrument that records each stage
+    :param min_component_size: Drop the connected components of the result with fewer nodes than this
+    :param cache: A CheckpointCache. The network is saved after parse, preprocess and make_sidewalks, and the run
+    resumes from the latest checkpoint that matches the input file and the parameters.
+    :param area: Only read the streets that touch this bbox or polygon (see parse)
+    :param crossings: Split the sidewalks at their crossings and trim the dangling ends (see crossings.py)
+    :param buildings: "flag" or "clip" the sidewalks that run through the buildings of the input (see buildings.py)
+    :return: The sidewalk network, or the street network if the sidewalks stage is not selected
+    """
+    from instrument import NULL_INSTRUMENT
+    from network import parse
+    from ToSidewalk import make_sidewalks, make_crosswalks
+
+    if "crosswalks" in stages and "sidewalks" not in stages:
+        raise ValueError("The crosswalks stage requires the sidewalks stage")
+    if instrument is None:
+        instrument = NULL_INSTRUMENT
+
+    keys, resumed, state = {}, None, None
+    if cache is not None:
+        with instrument.stage("checkpoint"):
+            checkpoints = checkpoint_keys(filename, stages, area)
+            keys = dict(checkpoints)
+            for stage, key in reversed(checkpoints):
+                state = cache.load(key)
+                if state is not None:
+                    resumed = stage
+                    instrument.count("checkpoint_hits")
+                    log.info("Resuming after %s from checkpoint %s", stage, key)
+                    break
+
+    def save(stage, value):
+        if stage in keys:
+            with instrument.stage("checkpoint"):
+                cache.save(keys[stage], value)
+
+    if resumed is None:
+        with instrument.stage("parse"):
+            network = street_network = parse(filename, area=area)
+        save("parse", street_network)
+    elif resumed == "make_sidewalks":
+        street_network, network = state
+    else:
+        network = street_network = state
+
+    if resumed in (None, "parse"):
+        if "preprocess" in stages:
+            street_network.preprocess(instrument=instrument)
+            save("preprocess", street_network)
+    if resumed != "make_sidewalks":
+        street_network.parse_intersections()
+
+    if "sidewalks" in stages and resumed != "make_sidewalks":
+        with instrument.stage("make_sidewalks"):
+            network = make_sidewalks(street_network)
+        # make_crosswalks needs the street network too, and the links between the two
+        save("make_sidewalks", (street_network, network))
+    if "crosswalks" in stages:
+        with instrument.stage("make_crosswalks"):
+            make_crosswalks(street_network, network)
+
+    if crossings and "sidewalks" in stages:
+        from crossings import split_crossings
+        with instrument.stage("crossings"):
+            found, split, trimmed = split_crossings(network)
+            instrument.count("crossings", found)
+            instrument.count("ways_split", split)
+            instrument.count("ends_trimmed", trimmed)
+        log.info("Split %d ways at %d crossings and trimmed %d dangling ends", split, found, trimmed)
+
+    if buildings and "sidewalks" in stages:
+        from buildings import Buildings, mark_buildings
+        with instrument.stage("buildings"):
+            footprints = Buildings.from_file(filename, area=area)
+            conflicts = mark_buildings(network, footprints, clip=buildings == "clip")
+            instrument.count("buildings", len(footprints))
+            instrument.count("building_conflicts", conflicts)
+        log.info("%d of the sidewalks run through the %d buildings", conflicts, len(footprints))
+
+    if min_component_size:
+        from components import Components, drop_small_components
+        with instrument.stage("components"):
+            components = Components.from_network(network)
+            ways_removed, nodes_removed = drop_small_components(network, min_component_size, components)
+            instrument.count("components", len(components.sizes))
+            instrument.count("ways_removed", ways_removed)
+            instrument.count("nodes_removed", nodes_removed)
+        log.info("Dropped %d of %d connected components (%d ways, %d nodes)",
+                 len(components.small(min_component_size)), len(components.sizes), ways_removed, nodes_removed)
+    return network
+
+
+def checkpoint_keys(filename, stages=STAGES, area=None):
+    """
+    Return the cache keys of the checkpoints of a run
+    :param filename: Input OSM file
+    :param stages: Stages to run
+    :param area: The area passed to parse
+    :return: A list of (stage, key) in the order of the pipeline. Each key depends on the content of the input file,
+    on the parameters of its stage and on the keys before it.
+    """
+    from checkpoint import file_hash, stage_key
+    from network import VALID_HIGHWAYS
+    from tags import TAG_KEYS
+    from ways import Street
+
+    parameters = {"tag_keys": TAG_KEYS, "highways": sorted(VALID_HIGHWAYS)}
+    if area is not None:
+        from area import AreaFilter
+        parameters["area"] = AreaFilter(area).polygon.wkt
+    key = stage_key(file_hash(filename), "parse", parameters)
+    checkpoints = [("parse", key)]
+    if "preprocess" in stages:
+        key = stage_key(key, "preprocess")
+        checkpoints.append(("preprocess", key))
+    if "sidewalks" in stages:
+        key = stage_key(key, "make_sidewalks", {"distance_to_sidewalk": Street().distance_to_sidewalk})
+        checkpoints.append(("make_sidewalks", key))
+    return checkpoints
+
+
+def run(filename, stages=STAGES, format="geojson", instrument=None):
+    """
+    Run the selected pipeline stages on an OSM file and export the result
+    :param filename: Input OSM file
+    :param stages: Stages to run. "crosswalks" requires "sidewalks".
+    :param format: Output format, "geojson", "osm" or "topojson"
+    :param instrument: An Instrument that records each stage
+    :return: The exported network as a string
+    """
+    from instrument import NULL_INSTRUMENT
+    if instrument is None:
+        instrument = NULL_INSTRUMENT
+
+    network = build(filename, stages, instrument)
+    with instrument.stage("export"):
+        return network.export(format=format)
+
+
+def write(network, output, format, instrument):
+    """
+    Write a network to a file in one of the binary formats
+    """
+    if format == "gpkg":
+        from geopackage import write_geopackage
+        with instrument.stage("export"):
+            write_geopackage(network, output)
+    elif format == "mvt":
+        from mvt import write_tiles
+        with instrument.stage("export"):
+            write_tiles(network, output)
+    elif format == "csr":
+        from routing import PedestrianGraph
+        with instrument.stage("export"):
+            PedestrianGraph.from_network(network).save(output)
+
+
+def encode(network, format, instrument, processes=None):
+    """
+    Measure the length of the ways of a network and, for the geojson format, encode their features ahead of the
+    export, in a pool of worker processes that share the coordinates of the network (see executor.py)
+    :param processes: Number of worker processes. With 1, the work runs in this process.
+    """
+    from arrays import NetworkArrays
+    from executor import SharedExecutor, way_lengths
+    with instrument.stage("encode"):
+        with SharedExecutor(NetworkArrays.from_network(network), processes) as executor:
+            length = float(executor.map(way_lengths).sum())
+            instrument.count("length_km", length)
+            if format == "geojson":
+                network.encode_features(executor)
+    log.info("%d ways, %.1f km", len(executor.arrays.way_ids), length)
+
+
+def write_text(network, output, format, instrument, **options):
+    """
+    Write a network in one of the text formats. The output is compressed if its name ends with .gz or .bz2, and the
+    compression and the writes run in a background thread while the features are encoded.
+    :param output: The output file, or "-" for the standard output
+    :param options: Options of the format (see OSM.export)
+    """
+    from streams import open_output
+    with instrument.stage("export"):
+        with open_output(output) as f:
+            if format == "geojson":
+                for chunk in network.iter_geojson():
+                    f.write(chunk)
+            else:
+                f.write(network.export(format=format, **options))
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    level = [log.WARNING, log.INFO, log.DEBUG][min(args.verbose, 2)]
+    log.basicConfig(format="%(levelname)s: %(message)s", level=level)
+
+    if args.format in FILE_FORMATS and args.output == "-":
+        log.error("The %s format needs an output file", args.format)
+        return 1
+
+    from instrument import Instrument, NULL_INSTRUMENT
+    instrument = NULL_INSTRUMENT
+    if args.report or args.profile_dir:
+        instrument = Instrument(profile_dir=args.profile_dir)
+
+    try:
+        cache = None
+        if args.cache_dir:
+            from checkpoint import CheckpointCache
+            cache = CheckpointCache(args.cache_dir, max_size=args.cache_size * 1024 * 1024)
+        network = build(args.input, args.stages, instrument, args.min_component_size, cache, args.bbox,
+                        args.split_crossings, args.buildings)
+        if (args.processes or 1) > 1 or args.report:
+            encode(network, args.format, instrument, args.processes or 1)
+        if args.format in FILE_FORMATS:
+            write(network, args.output, args.format, instrument)
+        else:
+            options = {}
+            if args.format == "topojson":
+                options = {"precision": args.precision, "style": not args.no_style}
+            write_text(network, args.output, args.format, instrument, **options)
+        if args.index:
+            from query import SidewalkQuery
+            with instrument.stage("index"):
+                SidewalkQuery.from_network(network).save(args.index)
+    except (IOError, OSError, ValueError) as e:
+        log.error(e)
+        return 1
+
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(instrument.to_json(indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Connectivity analysis of a sidewalk network.
+
+The connected components are found with a union-find pass over the node-way incidence of the network: every way
+joins its nodes into one set. Small components are usually islands left by a bad crosswalk connection or by the
+merging of parallel lanes; they can be listed, or dropped before export:
+
+    components = Components.from_network(sidewalk_network)
+    print components.report(min_size=10)
+    drop_small_components(sidewalk_network, 10)
+"""
+import numpy as np
+
+from arrays import NetworkArrays
+
+
+def connected_components(arrays):
+    """
+    Label the nodes of a network with their connected component
+    :param arrays: The NetworkArrays of the network
+    :return: An array with the component of each node. Components are numbered by decreasing number of nodes.
+    """
+    n = len(arrays.node_ids)
+    parent = list(range(n))
+    size = [1] * n
+
+    indptr = arrays.way_indptr.tolist()
+    node_index = arrays.node_index.tolist()
+    for w in range(len(indptr) - 1):
+        start, end = indptr[w], indptr[w + 1]
+        if end - start < 2:
+            continue
+        root = node_index[start]
+        while parent[root] != root:
+            parent[root] = root = parent[parent[root]]
+        for k in range(start + 1, end):
+            # Find with path halving
+            other = node_index[k]
+            while parent[other] != other:
+                parent[other] = other = parent[parent[other]]
+            if other == root:
+                continue
+            # Union by size
+            if size[other] > size[root]:
+                root, other = other, root
+            parent[other] = root
+            size[root] += size[other]
+
+    # Point every node to its root
+    roots = np.array(parent, dtype=np.int64)
+    while True:
+        grandparents = roots[roots]
+        if (grandparents == roots).all():
+            break
+        roots = grandparents
+    _, labels, counts = np.unique(roots, return_inverse=True, return_counts=True)
+    rank = np.empty(len(counts), dtype=np.int64)
+    rank[np.argsort(-counts, kind="mergesort")] = np.arange(len(counts))
+    return rank[labels]
+
+
+class Components(object):
+    def __init__(self, arrays):
+        """
+        :param arrays: The NetworkArrays of the network
+        """
+        self.arrays = arrays
+        self.labels = connected_components(arrays)
+        self.sizes = np.bincount(self.labels) if len(self.labels) else np.zeros(0, dtype=np.int64)
+
+        # A way belongs to the component of its first node
+        lengths = np.diff(arrays.way_indptr)
+        self.way_labels = np.full(len(arrays.way_ids), -1, dtype=np.int64)
+        nonempty = lengths > 0
+        self.way_labels[nonempty] = self.labels[arrays.node_index[arrays.way_indptr[:-1][nonempty]]]
+
+        # Bounding boxes as (min lat, min lng, max lat, max lng), like the bounds of a network
+        self.bboxes = np.empty((len(self.sizes), 4))
+        if len(self.sizes):
+            coordinates = arrays.coordinates[np.argsort(self.labels, kind="mergesort")]
+            starts = np.cumsum(self.sizes) - self.sizes
+            self.bboxes[:, :2] = np.minimum.reduceat(coordinates, starts)
+            self.bboxes[:, 2:] = np.maximum.reduceat(coordinates, starts)
+
+    @classmethod
+    def from_network(cls, network):
+        return cls(NetworkArrays.from_network(network))
+
+    def small(self, min_size):
+        """
+        Return the components with fewer than min_size nodes
+        """
+        return np.flatnonzero(self.sizes < min_size)
+
+    def way_ids(self, components):
+        """
+        Return the ids of the ways in the given components
+        """
+        return self.arrays.way_ids[np.in1d(self.way_labels, components)].tolist()
+
+    def node_ids(self, components):
+        """
+        Return the ids of the nodes in the given components
+        """
+        return self.arrays.node_ids[np.in1d(self.labels, components)].tolist()
+
+    def report(self, min_size=None):
+        """
+        Summarize the components
+        :param min_size: List the ways of the components with fewer nodes than this
+        :return: A dictionary that can be serialized to JSON
+        """
+        report = {
+            "components": len(self.sizes),
+            "nodes": len(self.labels),
+            "sizes": self.sizes.tolist(),
+            "bboxes": self.bboxes.tolist()
+        }
+        if min_size is not None:
+            small = self.small(min_size)
+            in_small = np.in1d(self.way_labels, small)
+            way_ids = dict((c, []) for c in small.tolist())
+            for c, wid in zip(self.way_labels[in_small].tolist(), self.arrays.way_ids[in_small].tolist()):
+                way_ids[c].append(wid)
+            report["small"] = [{
+                "component": c,
+                "size": int(self.sizes[c]),
+                "bbox": self.bboxes[c].tolist(),
+                "way_ids": way_ids[c]
+            } for c in small.tolist()]
+        return report
+
+
+def drop_small_components(network, min_size, components=None):
+    """
+    Remove the components with fewer than min_size nodes from a network
+    :param network: A network
+    :param min_size: The minimum number of nodes of the components to keep
+    :param components: The Components of the network, if already computed
+    :return: A tuple (number of ways removed, number of nodes removed)
+    """
+    if components is None:
+        components = Components.from_network(network)
+    small = components.small(min_size)
+    way_ids = components.way_ids(small)
+    node_ids = components.node_ids(small)
+    for wid in way_ids:
+        network.remove_way(wid)
+    # remove_way() removes the nodes left without ways, but not the nodes that had no way to begin with
+    for nid in node_ids:
+        if network.nodes.get(nid) is not None:
+            network.nodes.remove(nid)
+    removed = set(node_ids)
+    network.nodes.crosswalk_node_ids = [nid for nid in network.nodes.crosswalk_node_ids if nid not in removed]
+    return len(way_ids), len(node_ids)
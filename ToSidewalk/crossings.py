@@ -0,0 +1,207 @@
+"""
+Detection of the sidewalk segments that cross each other, and a post-processing stage that splits the ways at the
+crossings and trims the short dangling ends they leave.
+
+make_sidewalks offsets each street independently, so at sharp corners and near short street segments the sidewalks
+of neighbouring streets run past each other. Every segment of the network is registered in a uniform grid of cells
+about as large as the segments (see index.py), and only the segments that share a cell are tested against each
+other. For a network of n segments with k crossings this tests O(n + k) pairs; removing the pairs found in several
+cells is a sort, so the whole search is O((n + k) log n):
+
+    crossings = find_crossings(NetworkArrays.from_network(sidewalk_network))
+    split_crossings(sidewalk_network, max_overshoot=0.02)
+"""
+import numpy as np
+
+from arrays import NetworkArrays, haversine
+from index import GridIndex, ragged_offsets
+from nodes import Node
+
+# The longest dangling end (in kilometers) that split_crossings removes. Sidewalks are about 9 meters from the
+# center of the street, so an overshoot past a crossing is rarely longer than twice that.
+MAX_OVERSHOOT = 0.02
+
+
+class Crossings(object):
+    def __init__(self, segment_a, segment_b, t_a, t_b, coordinates):
+        """
+        The crossings of the segments of a network. The segments are numbered as in NetworkArrays.segments().
+        :param segment_a: The first segment of each crossing
+        :param segment_b: The second segment of each crossing
+        :param t_a: The position of each crossing along its first segment, in (0, 1)
+        :param t_b: The position of each crossing along its second segment, in (0, 1)
+        :param coordinates: A (number of crossings, 2) array of the (lat, lng) of the crossings
+        """
+        self.segment_a = segment_a
+        self.segment_b = segment_b
+        self.t_a = t_a
+        self.t_b = t_b
+        self.coordinates = coordinates
+
+    def __len__(self):
+        return len(self.segment_a)
+
+
+def candidate_pairs(index):
+    """
+    Return the pairs of items that are registered in a common cell of a GridIndex
+    :return: A tuple of arrays (first items, second items), with first < second and without duplicates
+    """
+    cells = len(index.indptr) - 1
+    positions = np.arange(len(index.items))
+    cell_ends = np.repeat(index.indptr[1:], np.diff(index.indptr))
+    # Pair each entry with the entries after it in the same cell
+    counts = cell_ends - positions - 1
+    offsets = ragged_offsets(counts)
+    a = np.repeat(index.items, counts)
+    b = index.items[np.repeat(positions + 1, counts) + offsets]
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    keep = a != b
+    if cells == 0 or not keep.any():
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    n = len(index.bboxes)
+    keys = np.unique(a[keep] * n + b[keep])
+    return keys // n, keys % n
+
+
+def find_crossings(arrays):
+    """
+    Find the segments of a network that cross each other. Segments that share a node, that only touch, or that are
+    collinear are not crossings.
+    :param arrays: The NetworkArrays of the network
+    :return: A Crossings object
+    """
+    start, end, _, _ = arrays.segments()
+    p = arrays.coordinates[start]
+    q = arrays.coordinates[end]
+    bboxes = np.column_stack((np.minimum(p[:, 1], q[:, 1]), np.minimum(p[:, 0], q[:, 0]),
+                              np.maximum(p[:, 1], q[:, 1]), np.maximum(p[:, 0], q[:, 0])))
+    a, b = candidate_pairs(GridIndex(bboxes))
+
+    # Adjacent segments of a way and segments that meet at a node are connected already
+    shared = (start[a] == start[b]) | (start[a] == end[b]) | (end[a] == start[b]) | (end[a] == end[b])
+    ba, bb = bboxes[a], bboxes[b]
+    overlap = (ba[:, 0] <= bb[:, 2]) & (bb[:, 0] <= ba[:, 2]) & (ba[:, 1] <= bb[:, 3]) & (bb[:, 1] <= ba[:, 3])
+    a, b = a[overlap & ~shared], b[overlap & ~shared]
+
+    # The positions of the crossing along both segments. They do not change under the scaling of the longitudes,
+    # so the test runs on the degrees directly.
+    r = q[a] - p[a]
+    s = q[b] - p[b]
+    d = p[b] - p[a]
+    denominator = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_a = (d[:, 0] * s[:, 1] - d[:, 1] * s[:, 0]) / denominator
+        t_b = (d[:, 0] * r[:, 1] - d[:, 1] * r[:, 0]) / denominator
+        crossing = (denominator != 0) & (t_a > 0) & (t_a < 1) & (t_b > 0) & (t_b < 1)
+    a, b, t_a, t_b = a[crossing], b[crossing], t_a[crossing], t_b[crossing]
+    return Crossings(a, b, t_a, t_b, p[a] + t_a[:, None] * r[crossing])
+
+
+def way_length(network, nids):
+    """
+    Return the length of a list of nodes in kilometers
+    """
+    if len(nids) < 2:
+        return 0.
+    coordinates = np.array([network.nodes.get(nid).location() for nid in nids])
+    return float(haversine(coordinates[:-1, 0], coordinates[:-1, 1], coordinates[1:, 0], coordinates[1:, 1]).sum())
+
+
+def split_way(network, way, nids, split_nids):
+    """
+    Replace a way with the pieces of a new list of nodes between the given nodes
+    :param nids: The new node list of the way
+    :param split_nids: The nodes to split the way at
+    :return: The new ways, in order
+    """
+    pieces = []
+    first = 0
+    for i in range(1, len(nids)):
+        if i == len(nids) - 1 or nids[i] in split_nids:
+            piece = type(way)(None, nids[first:i + 1], way.type)
+            piece.tags = way.tags
+            piece.user = way.user
+            if hasattr(way, "street_id"):
+                piece.set_street_id(way.street_id)
+            pieces.append(piece)
+            first = i
+    for piece in pieces:
+        network.add_way(piece)
+    network.remove_way(way.id)
+    return pieces
+
+
+def split_crossings(network, max_overshoot=MAX_OVERSHOOT, arrays=None):
+    """
+    Add a node at each crossing of two segments of a network, split both ways there, and remove the dangling ends
+    left past the crossings that are shorter than max_overshoot
+    :param network: A sidewalk network
+    :param max_overshoot: The longest dangling end to remove, in kilometers (0 to keep them all)
+    :param arrays: The NetworkArrays of the network, if already computed
+    :return: A tuple (number of crossings, number of ways split, number of dangling ends removed)
+    """
+    if arrays is None:
+        arrays = NetworkArrays.from_network(network)
+    crossings = find_crossings(arrays)
+    if not len(crossings):
+        return 0, 0, 0
+    _, _, segment_way, segment_position = arrays.segments()
+    # The number of times each node is used by the ways. The ends of the ways used once are dead ends. (The way_ids
+    # of the nodes are not used, since swap_nodes does not move them to the crosswalk nodes.)
+    uses = dict(zip(arrays.node_ids.tolist(), np.bincount(arrays.node_index, minlength=len(arrays.node_ids)).tolist()))
+
+    # The crossings on each way, as (position of the segment in the way, position along the segment, node id)
+    inserts = {}
+    for i, (lat, lng) in enumerate(crossings.coordinates.tolist()):
+        node = Node(None, lat, lng)
+        network.add_node(node)
+        for segment, t in ((crossings.segment_a[i], crossings.t_a[i]), (crossings.segment_b[i], crossings.t_b[i])):
+            w = int(segment_way[segment])
+            inserts.setdefault(w, []).append((int(segment_position[segment]), float(t), node.id))
+
+    dangling = []
+    for w, points in inserts.items():
+        way = network.ways.get(arrays.way_ids[w])
+        points.sort()
+        nids = []
+        k = 0
+        for i, nid in enumerate(way.nids):
+            nids.append(nid)
+            while k < len(points) and points[k][0] == i:
+                nids.append(points[k][2])
+                k += 1
+        pieces = split_way(network, way, nids, set(nid for _, _, nid in points))
+        if len(pieces) > 1:
+            dangling.append(pieces)
+
+    trimmed = 0
+    if max_overshoot > 0:
+        for pieces in dangling:
+            trimmed += _trim(network, pieces, max_overshoot, uses)
+    return len(crossings), len(inserts), trimmed
+
+
+def _trim(network, pieces, max_overshoot, uses):
+    """
+    Remove the end pieces of a split way that lead to a dead end and are shorter than max_overshoot. At least one
+    piece is kept.
+    :param uses: The number of times each node was used by the ways before the split
+    :return: The number of pieces removed
+    """
+    ends = []
+    for piece, end_nid in ((pieces[0], pieces[0].nids[0]), (pieces[-1], pieces[-1].nids[-1])):
+        if uses.get(end_nid) == 1:
+            length = way_length(network, piece.nids)
+            if length < max_overshoot:
+                ends.append((length, piece))
+    if len(pieces) == 2 and len(ends) == 2:
+        ends = [min(ends)]
+    for _, piece in ends:
+        removed = [nid for nid in piece.nids if len(network.nodes.get(nid).way_ids) == 1]
+        network.remove_way(piece.id)
+        if removed:
+            removed = set(removed)
+            network.nodes.crosswalk_node_ids = [nid for nid in network.nodes.crosswalk_node_ids
+                                                if nid not in removed]
+    return len(ends)
@@ -1,19 +1,47 @@
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
-from geoalchemy2 import Geometry
-from shapely.geometry import LineString, mapping
-from shapely.wkb import loads
 import json
 
+# SQLAlchemy, GeoAlchemy and Shapely are only imported when the database is used. See declare_tables().
+Base = None
+WaysTable = None
 
 
-Base = declarative_base()
+def declare_tables():
+    """
+    Declare the ORM mappings of the PostGIS tables. The mappings are declared on the first call.
+    """
+    global Base, WaysTable
+    if WaysTable is not None:
+        return
+
+    from sqlalchemy import Column, Integer, String
+    from sqlalchemy.ext.declarative import declarative_base
+    from geoalchemy2 import Geometry
+
+    Base = declarative_base()
+
+    class _WaysTable(Base):
+        __tablename__ = "ogrgeojson"
+        ogc_fid = Column(Integer, primary_key=True)
+        wkb_geometry = Column(Geometry("LINESTRING"))
+        stroke = Column(String)
+        type = Column(String)
+        id = Column(String)
+        user = Column(String)
+
+    WaysTable = _WaysTable
 
 
 class DB(object):
 
-    def __init__(self):
+    def __init__(self, echo=False, pool_size=5):
+        """
+        :param echo: Log every SQL statement
+        :param pool_size: Number of connections kept in the engine's pool (see Loader)
+        """
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        declare_tables()
+
         # Interacting with PostGIS using Python
         # http://gis.stackexchange.com/questions/147240/how-to-efficiently-use-a-postgres-db-with-python
         # http://geoalchemy-2.readthedocs.org/en/latest/orm_tutorial.html
@@ -35,11 +63,14 @@ class DB(object):
             else:
                 database_name = "routing"
 
-        engine = create_engine('postgresql://%s@localhost/%s' % (user_name, database_name), echo=True)
-        Session = sessionmaker(bind=engine)
+        self.engine = create_engine('postgresql://%s@localhost/%s' % (user_name, database_name), echo=echo,
+                                    pool_size=pool_size)
+        Session = sessionmaker(bind=self.engine)
         self.session = Session()
 
     def example(self):
+        from shapely.geometry import LineString, mapping
+        from shapely.wkb import loads
         query = self.session.query(WaysTable)
         feature_collection = {
             "type": "FeatureCollection",
@@ -56,15 +87,6 @@ class DB(object):
             feature_collection["features"].append(feature)
         return json.dumps(feature_collection)
 
-class WaysTable(Base):
-    __tablename__ = "ogrgeojson"
-    ogc_fid = Column(Integer, primary_key=True)
-    wkb_geometry = Column(Geometry("LINESTRING"))
-    stroke = Column(String)
-    type = Column(String)
-    id = Column(String)
-    user = Column(String)
-
 if __name__ == "__main__":
     db = DB()
     print db.example()
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+Bulk load a sidewalk network into PostGIS.
+
+Rows are generated lazily from the network and streamed to PostgreSQL with COPY ... FROM STDIN, so nothing but
+the current chunk is held in memory. The sidewalk, crosswalk and node tables are loaded in parallel, each on its own
+connection from the engine's pool, and the spatial indexes are created after the data is in.
+
+Example:
+    db = DB()
+    loader = Loader(db.engine, prefix="dc_")
+    loader.load(sidewalk_network)
+"""
+import logging as log
+import threading
+import time
+
+SRID = 4326
+
+
+def _escape(value):
+    """
+    Escape a value for the text format of COPY
+    """
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def linestring_ewkt(coordinates):
+    return "SRID=%d;LINESTRING(%s)" % (SRID, ",".join("%r %r" % (lng, lat) for lng, lat in coordinates))
+
+
+def point_ewkt(lng, lat):
+    return "SRID=%d;POINT(%r %r)" % (SRID, lng, lat)
+
+
+def way_rows(network, way_type):
+    """
+    Generate the COPY rows (id, type, street_id, geometry) of the ways of a given type
+    :param network: A sidewalk network
+    :param way_type: "crosswalk" for the crosswalks. Any other value selects every way that is not a crosswalk.
+    """
+    for fields, coordinates in network.way_records(way_type == "crosswalk"):
+        fields += (linestring_ewkt(coordinates),)
+        yield "\t".join(_escape(field) for field in fields) + "\n"
+
+
+def node_rows(network):
+    """
+    Generate the COPY rows (id, is_crosswalk, geometry) of the nodes
+    """
+    for (nid, is_crosswalk), (lng, lat) in network.node_records():
+        fields = (nid, "t" if is_crosswalk else "f", point_ewkt(lng, lat))
+        yield "\t".join(_escape(field) for field in fields) + "\n"
+
+
+class IteratorFile(object):
+    """
+    A read-only file-like object over an iterator of strings. cursor.copy_expert() reads from it in chunks.
+    """
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.buffer = ""
+        self.rows = 0
+
+    def read(self, size=-1):
+        chunks = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            try:
+                row = next(self.iterator)
+            except StopIteration:
+                break
+            self.rows += 1
+            chunks.append(row)
+            length += len(row)
+        data = "".join(chunks)
+        if size < 0:
+            self.buffer = ""
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+    def readline(self, size=-1):
+        if self.buffer:
+            line, self.buffer = self.buffer, ""
+            return line
+        try:
+            line = next(self.iterator)
+        except StopIteration:
+            return ""
+        self.rows += 1
+        return line
+
+
+class Loader(object):
+    """
+    Loads sidewalk networks into the <prefix>sidewalks, <prefix>crosswalks and <prefix>nodes tables
+    """
+    def __init__(self, engine, prefix="", chunk_size=1 << 20):
+        """
+        :param engine: A SQLAlchemy engine for a PostGIS database (e.g., DB().engine). Connections are taken from
+        its pool.
+        :param prefix: A prefix for the table names
+        :param chunk_size: Bytes sent to the server per COPY round trip
+        """
+        self.engine = engine
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+
+    def tables(self):
+        return {
+            "sidewalks": "%ssidewalks" % self.prefix,
+            "crosswalks": "%scrosswalks" % self.prefix,
+            "nodes": "%snodes" % self.prefix
+        }
+
+    def create_tables(self, drop=True):
+        """
+        Create the tables without indexes. Indexes are created by create_indexes() after the load.
+        :param drop: Drop existing tables first
+        """
+        tables = self.tables()
+        statements = []
+        for name in (tables["sidewalks"], tables["crosswalks"]):
+            if drop:
+                statements.append("DROP TABLE IF EXISTS %s" % name)
+            statements.append("CREATE TABLE %s (id text, type text, street_id text, geom geometry(LineString, %d))"
+                              % (name, SRID))
+        if drop:
+            statements.append("DROP TABLE IF EXISTS %s" % tables["nodes"])
+        statements.append("CREATE TABLE %s (id text, is_crosswalk boolean, geom geometry(Point, %d))"
+                          % (tables["nodes"], SRID))
+        self._execute(statements)
+
+    def create_indexes(self):
+        """
+        Add the primary keys and the GiST spatial indexes, then update the planner statistics
+        """
+        statements = []
+        for name in self.tables().values():
+            statements.append("ALTER TABLE %s ADD PRIMARY KEY (id)" % name)
+            statements.append("CREATE INDEX %s_geom_idx ON %s USING GIST (geom)" % (name, name))
+        self._execute(statements)
+        # ANALYZE cannot run inside the transaction of _execute()
+        connection = self.engine.raw_connection()
+        try:
+            connection.set_isolation_level(0)
+            cursor = connection.cursor()
+            for name in self.tables().values():
+                cursor.execute("ANALYZE %s" % name)
+            cursor.close()
+        finally:
+            connection.close()
+
+    def copy(self, table, columns, rows):
+        """
+        Stream rows into a table with COPY ... FROM STDIN on a pooled connection
+        :param table: Table name
+        :param columns: Column names
+        :param rows: An iterator of rows in the text format of COPY
+        :return: The number of rows copied
+        """
+        f = IteratorFile(rows)
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.copy_expert("COPY %s (%s) FROM STDIN" % (table, ", ".join(columns)), f, size=self.chunk_size)
+            cursor.close()
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            # Returns the connection to the pool
+            connection.close()
+        return f.rows
+
+    def load(self, sidewalk_network, drop=True, parallel=True):
+        """
+        Create the tables, load the sidewalks, crosswalks and nodes, and create the indexes
+        :param sidewalk_network: A sidewalk network (e.g., built by make_sidewalks() and make_crosswalks())
+        :param drop: Drop existing tables first
+        :param parallel: Load the three tables concurrently on separate connections
+        :return: A dictionary with the number of rows loaded into each table
+        """
+        start = time.time()
+        tables = self.tables()
+        self.create_tables(drop)
+
+        jobs = {
+            "sidewalks": (tables["sidewalks"], ("id", "type", "street_id", "geom"),
+                          way_rows(sidewalk_network, "footway")),
+            "crosswalks": (tables["crosswalks"], ("id", "type", "street_id", "geom"),
+                           way_rows(sidewalk_network, "crosswalk")),
+            "nodes": (tables["nodes"], ("id", "is_crosswalk", "geom"), node_rows(sidewalk_network))
+        }
+        counts = {}
+        errors = []
+
+        def run(key):
+            try:
+                counts[key] = self.copy(*jobs[key])
+            except Exception as e:
+                errors.append(e)
+
+        if parallel:
+            threads = [threading.Thread(target=run, args=(key,)) for key in jobs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            for key in jobs:
+                run(key)
+        if errors:
+            raise errors[0]
+
+        self.create_indexes()
+        log.info("Loaded %s in %.2fs", counts, time.time() - start)
+        return counts
+
+    def _execute(self, statements):
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.close()
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
@@ -0,0 +1,229 @@
+"""
+A spatial diff of two sidewalk networks, e.g. before and after a change of the OSM data or of the parameters:
+
+    tosidewalk-diff old.geojson new.geojson -o diff.geojson --tolerance 0.002
+
+The generated way ids change from run to run, so the ways are matched by geometry. The ways whose coordinates are
+the same (in either direction) are matched first with a hash table. Each remaining way is compared only with the
+ways of the other network whose bounding boxes are within the tolerance of its own (see GridIndex.join), using the
+Hausdorff distance between the polylines, and the closest pairs within the tolerance are matched. The output is a
+GeoJSON FeatureCollection of the added ways, the removed ways, and the modified ways: the matched ways that moved or
+whose type or tags changed. The diff property of each feature says which, and modified ways carry their distance
+(in kilometers) and the id of the old way.
+
+The Hausdorff distance is measured from the vertices of each polyline to the segments of the other, in an
+equirectangular projection, which is exact up to the points between vertices and is close enough for sidewalks.
+"""
+import json
+import logging as log
+import sys
+
+import numpy as np
+
+from arrays import KM_PER_DEGREE
+from index import GridIndex
+
+TOLERANCE = 0.002  # In kilometers
+# The properties that are not compared, since they are generated or only style the features
+IGNORED_PROPERTIES = ("id", "user", "stroke", "stroke-width", "stroke-opacity")
+STROKES = {"added": "#1a9641", "removed": "#d7191c", "modified": "#fdae61"}
+
+
+def load_features(source):
+    """
+    Read the LineString features of a network or of a GeoJSON file
+    :param source: An OSM network, or a GeoJSON file name, optionally compressed with gzip or bzip2
+    :return: A list of (properties, (number of points, 2) array of (lng, lat))
+    """
+    if hasattr(source, "ways"):
+        features = []
+        for way in source.ways.get_list():
+            properties = way.get_tags()
+            properties.update({"type": way.type, "id": way.id})
+            coordinates = [(source.nodes.get(nid).lng, source.nodes.get(nid).lat) for nid in way.nids]
+            if not coordinates:
+                continue
+            features.append((properties, np.array(coordinates, dtype=np.float64).reshape(-1, 2)))
+        return features
+
+    from streams import open_input
+    with open_input(source) as f:
+        collection = json.load(f)
+    features = []
+    for feature in collection["features"]:
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "LineString":
+            lines = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiLineString":
+            lines = geometry["coordinates"]
+        else:
+            continue
+        for line in lines:
+            if not line:
+                continue
+            coordinates = np.array([point[:2] for point in line], dtype=np.float64).reshape(-1, 2)
+            features.append((feature.get("properties") or {}, coordinates))
+    return features
+
+
+def geometry_key(coordinates, decimals=7):
+    """
+    Return a key that is the same for equal polylines, in either direction
+    """
+    points = tuple(map(tuple, np.round(coordinates, decimals).tolist()))
+    return min(points, points[::-1])
+
+
+def compared_properties(properties):
+    return dict((key, value) for key, value in properties.items() if key not in IGNORED_PROPERTIES)
+
+
+def directed_hausdorff(a, b):
+    """
+    Return the largest distance from the points a to the polyline b
+    :param a: A (n, 2) array of projected points
+    :param b: A (m, 2) array of projected points
+    """
+    if len(b) == 1:
+        return np.sqrt(((a - b[0]) ** 2).sum(axis=1)).max()
+    start, direction = b[:-1], b[1:] - b[:-1]
+    length2 = (direction ** 2).sum(axis=1)
+    relative = a[:, None, :] - start[None, :, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length2 > 0, (relative * direction[None, :, :]).sum(axis=2) / length2, 0.)
+    t = np.clip(t, 0., 1.)
+    nearest = relative - t[:, :, None] * direction[None, :, :]
+    return np.sqrt((nearest ** 2).sum(axis=2)).min(axis=1).max()
+
+
+def hausdorff(a, b):
+    """
+    Return the Hausdorff distance between two projected polylines
+    """
+    return max(directed_hausdorff(a, b), directed_hausdorff(b, a))
+
+
+class NetworkDiff(object):
+    def __init__(self, old, new, tolerance=TOLERANCE):
+        """
+        :param old: The features of the old network (see load_features)
+        :param new: The features of the new network
+        :param tolerance: The largest Hausdorff distance between two matched ways, in kilometers
+        """
+        self.old = old
+        self.new = new
+        self.tolerance = tolerance
+        self.modified = []  # (old index, new index, distance)
+        self.unchanged = 0
+
+        # Exactly equal geometries first
+        old_matched = np.zeros(len(old), dtype=bool)
+        new_matched = np.zeros(len(new), dtype=bool)
+        keys = {}
+        for i, (_, coordinates) in enumerate(old):
+            keys.setdefault(geometry_key(coordinates), []).append(i)
+        for j, (properties, coordinates) in enumerate(new):
+            same = keys.get(geometry_key(coordinates))
+            if same:
+                i = same.pop()
+                old_matched[i] = new_matched[j] = True
+                self._match(i, j, 0.)
+
+        # Then the closest geometries within the tolerance
+        old_left = np.flatnonzero(~old_matched)
+        new_left = np.flatnonzero(~new_matched)
+        if len(old_left) and len(new_left):
+            all_points = np.vstack([old[i][1] for i in old_left] + [new[j][1] for j in new_left])
+            scale = np.array([np.cos(np.radians(all_points[:, 1].mean())), 1.]) * KM_PER_DEGREE
+            old_points = [old[i][1] * scale for i in old_left]
+            new_points = [new[j][1] * scale for j in new_left]
+
+            index = GridIndex(np.array([np.hstack((p.min(axis=0), p.max(axis=0))) for p in new_points]))
+            bboxes = np.array([np.hstack((p.min(axis=0) - tolerance, p.max(axis=0) + tolerance))
+                               for p in old_points])
+            first, second = index.join(bboxes)
+            distances = np.array([hausdorff(old_points[a], new_points[b])
+                                  for a, b in zip(first.tolist(), second.tolist())])
+            close = distances <= tolerance if len(distances) else np.zeros(0, dtype=bool)
+            first, second, distances = first[close], second[close], distances[close]
+            for k in np.argsort(distances, kind="mergesort").tolist():
+                i, j = old_left[first[k]], new_left[second[k]]
+                if not old_matched[i] and not new_matched[j]:
+                    old_matched[i] = new_matched[j] = True
+                    self._match(i, j, float(distances[k]))
+
+        self.removed = np.flatnonzero(~old_matched).tolist()
+        self.added = np.flatnonzero(~new_matched).tolist()
+
+    def _match(self, i, j, distance):
+        if distance > 0 or compared_properties(self.old[i][0]) != compared_properties(self.new[j][0]):
+            self.modified.append((i, j, distance))
+        else:
+            self.unchanged += 1
+
+    @classmethod
+    def from_sources(cls, old, new, tolerance=TOLERANCE):
+        """
+        :param old: An OSM network or a GeoJSON file
+        :param new: An OSM network or a GeoJSON file
+        """
+        return cls(load_features(old), load_features(new), tolerance)
+
+    def summary(self):
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "modified": len(self.modified),
+            "unchanged": self.unchanged
+        }
+
+    def to_geojson(self):
+        """
+        :return: A GeoJSON FeatureCollection of the added, removed and modified ways, as a dictionary
+        """
+        def feature(properties, coordinates, change, **extra):
+            properties = dict(properties)
+            properties.update(extra)
+            properties.update({"diff": change, "stroke": STROKES[change]})
+            return {
+                "type": "Feature",
+                "properties": properties,
+                "geometry": {"type": "LineString", "coordinates": coordinates.tolist()}
+            }
+
+        features = [feature(self.new[j][0], self.new[j][1], "added") for j in self.added]
+        features += [feature(self.old[i][0], self.old[i][1], "removed") for i in self.removed]
+        features += [feature(self.new[j][0], self.new[j][1], "modified", distance=distance,
+                             previous_id=self.old[i][0].get("id"))
+                     for i, j, distance in self.modified]
+        return {"type": "FeatureCollection", "features": features}
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="tosidewalk-diff",
+                                     description="Compare two sidewalk networks exported as GeoJSON")
+    parser.add_argument("old", help="The old GeoJSON file, optionally compressed with gzip or bzip2")
+    parser.add_argument("new", help="The new GeoJSON file")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Output GeoJSON file of the differences (default: standard output)")
+    parser.add_argument("-t", "--tolerance", type=float, default=TOLERANCE,
+                        help="Largest distance between matched ways in kilometers (default: %(default)s)")
+    args = parser.parse_args(argv)
+    log.basicConfig(format="%(levelname)s: %(message)s", level=log.INFO)
+
+    from streams import open_output
+    try:
+        diff = NetworkDiff.from_sources(args.old, args.new, args.tolerance)
+        with open_output(args.output) as f:
+            f.write(json.dumps(diff.to_geojson()))
+    except (IOError, OSError, ValueError, KeyError) as e:
+        log.error(e)
+        return 1
+    log.info("%(added)d added, %(removed)d removed, %(modified)d modified, %(unchanged)d unchanged",
+             diff.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+A process pool for the stages that work on each way independently, such as the length metrics and the encoding of
+the exported features.
+
+Pickling Node and Way objects to the workers would cost more than the work itself. SharedExecutor copies the
+coordinates and the way node lists of a NetworkArrays into shared memory once, before the pool starts, so the
+workers inherit them without a copy. A task only sends the function, a range of way indices and the per-way
+arguments of that range, and the results come back as arrays that are concatenated in the order of the ways:
+
+    with SharedExecutor(NetworkArrays.from_network(sidewalk_network), processes=4) as executor:
+        lengths = executor.map(way_lengths)
+        sidewalk_network.encode_features(executor)  # export() then reuses the features encoded by the workers
+
+The functions run in the workers take the arrays of the network, an array of way indices and the slices of the
+per-way arguments, and return an array with one row per way or per node of those ways. They only use the
+coordinates, way_indptr and node_index of the arrays, so they also run in-process on a NetworkArrays: make_sidewalks
+calls sidewalk_offsets that way, since building the Node objects of the sidewalks, which only the parent can do,
+costs two orders of magnitude more than the offsets. update() replaces the network of a running executor; the pool
+is restarted only if the new arrays do not fit in the shared memory.
+"""
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+from arrays import haversine
+from index import ragged_offsets
+
+CHUNK_SIZE = 1024
+
+# The arrays of the network in a worker process, set by _init_worker
+_shared = None
+
+
+class SharedArrays(object):
+    def __init__(self, buffers):
+        """
+        Views of the network arrays in shared memory
+        :param buffers: A tuple (sizes, coordinates, way_indptr, node_index) of RawArrays. sizes holds the number of
+        nodes, ways and way nodes currently stored in the other buffers, which may be larger.
+        """
+        self.buffers = buffers
+        sizes, coordinates, way_indptr, node_index = buffers
+        self._sizes = np.frombuffer(sizes, dtype=np.int64)
+        self._coordinates = np.frombuffer(coordinates, dtype=np.float64).reshape(-1, 2)
+        self._way_indptr = np.frombuffer(way_indptr, dtype=np.int64)
+        self._node_index = np.frombuffer(node_index, dtype=np.int64)
+
+    @classmethod
+    def allocate(cls, nodes, ways, way_nodes):
+        """
+        Allocate the shared memory for a network of the given size
+        """
+        return cls((RawArray("b", 3 * 8), RawArray("b", max(nodes, 1) * 2 * 8), RawArray("b", (ways + 1) * 8),
+                    RawArray("b", max(way_nodes, 1) * 8)))
+
+    def fits(self, arrays):
+        return (len(arrays.coordinates) <= len(self._coordinates) and
+                len(arrays.way_indptr) <= len(self._way_indptr) and
+                len(arrays.node_index) <= len(self._node_index))
+
+    def store(self, arrays):
+        """
+        Copy the arrays of a network into the shared memory
+        :param arrays: A NetworkArrays that fits
+        """
+        self._coordinates[:len(arrays.coordinates)] = arrays.coordinates
+        self._way_indptr[:len(arrays.way_indptr)] = arrays.way_indptr
+        self._node_index[:len(arrays.node_index)] = arrays.node_index
+        self._sizes[:] = (len(arrays.coordinates), len(arrays.way_indptr) - 1, len(arrays.node_index))
+
+    @property
+    def coordinates(self):
+        return self._coordinates[:self._sizes[0]]
+
+    @property
+    def way_indptr(self):
+        return self._way_indptr[:self._sizes[1] + 1]
+
+    @property
+    def node_index(self):
+        return self._node_index[:self._sizes[2]]
+
+
+def way_node_positions(arrays, ways):
+    """
+    Return the positions in node_index of the nodes of some ways
+    :param arrays: A SharedArrays or a NetworkArrays
+    :return: A tuple (positions, number of nodes of each way, position of each node in its way)
+    """
+    indptr = arrays.way_indptr
+    starts = indptr[ways]
+    lengths = indptr[ways + 1] - starts
+    offsets = ragged_offsets(lengths)
+    return np.repeat(starts, lengths) + offsets, lengths, offsets
+
+
+def _init_worker(buffers):
+    global _shared
+    _shared = SharedArrays(buffers)
+
+
+def _run(task):
+    function, start, stop, args = task
+    return function(_shared, np.arange(start, stop), *args)
+
+
+class SharedExecutor(object):
+    def __init__(self, arrays, processes=None, chunk_size=CHUNK_SIZE):
+        """
+        :param arrays: The NetworkArrays of a network
+        :param processes: Number of worker processes (default: number of CPUs). With 1, the tasks run in this
+        process.
+        :param chunk_size: Number of ways in a task
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.arrays = None
+        self.shared = None
+        self.pool = None
+        self.update(arrays)
+
+    def update(self, arrays):
+        """
+        Replace the network of the executor
+        """
+        self.arrays = arrays
+        if self.shared is not None and self.shared.fits(arrays):
+            self.shared.store(arrays)
+            return
+        self.close()
+        self.shared = SharedArrays.allocate(len(arrays.coordinates), len(arrays.way_ids), len(arrays.node_index))
+        self.shared.store(arrays)
+        if self.processes > 1:
+            # The workers inherit the shared memory when they are forked
+            self.pool = multiprocessing.Pool(self.processes, initializer=_init_worker,
+                                             initargs=(self.shared.buffers,))
+
+    def map(self, function, *way_args):
+        """
+        Run a function on all the ways, in chunks
+        :param function: A module level function (shared arrays, way indices, *way_args) that returns an array
+        :param way_args: Arrays with one value per way. Each task receives the slices of its ways.
+        :return: The concatenated results of the chunks, in the order of the ways
+        """
+        n = len(self.arrays.way_ids)
+        tasks = [(function, start, min(start + self.chunk_size, n), tuple(arg[start:start + self.chunk_size]
+                                                                           for arg in way_args))
+                 for start in range(0, n, self.chunk_size)]
+        if self.pool is None:
+            results = [function(self.shared, np.arange(start, stop), *args) for function, start, stop, args in tasks]
+        else:
+            results = self.pool.map(_run, tasks)
+        if not results:
+            return np.zeros(0)
+        return np.concatenate(results)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def way_lengths(shared, ways):
+    """
+    Return the length of some ways in kilometers
+    """
+    positions, lengths, offsets = way_node_positions(shared, ways)
+    if len(positions) < 2:
+        return np.zeros(len(ways))
+    coordinates = shared.coordinates[shared.node_index[positions]]
+    segments = haversine(coordinates[:-1, 0], coordinates[:-1, 1], coordinates[1:, 0], coordinates[1:, 1])
+    # Skip the gaps between the last node of a way and the first node of the next one
+    way = np.repeat(np.arange(len(ways)), lengths)[:-1]
+    inside = offsets[1:] != 0
+    return np.bincount(way[inside], weights=segments[inside], minlength=len(ways))
+
+
+def sidewalk_offsets(shared, ways, distances):
+    """
+    Compute the sidewalk nodes of some streets, like make_sidewalk_nodes
+    :param distances: The distance_to_sidewalk of each street
+    :return: A (number of nodes of the ways, 5) array. The columns are the (lat, lng) of the two sidewalk nodes of a
+    street node, and 1 where the first one is on the left of the street (see make_sidewalk_nodes).
+    """
+    positions, lengths, offsets = way_node_positions(shared, ways)
+    node_index = shared.node_index
+    coordinates = shared.coordinates[node_index[positions]]
+    first = offsets == 0
+    last = offsets == np.repeat(lengths - 1, lengths)
+
+    previous = shared.coordinates[node_index[np.where(first, positions, positions - 1)]]
+    following = shared.coordinates[node_index[np.where(last, positions, positions + 1)]]
+    to_previous = previous - coordinates
+    to_next = following - coordinates
+    # At the ends of a street, the missing neighbor mirrors the other one
+    to_previous[first] = -to_next[first]
+    to_next[last] = -to_previous[last]
+
+    def normalize(v):
+        norm = np.sqrt((v ** 2).sum(axis=1))
+        return np.where(norm[:, None] != 0, v / np.where(norm == 0, 1., norm)[:, None], v)
+
+    to_previous = normalize(to_previous)
+    to_next = normalize(to_next)
+    v = to_previous + to_next
+    norm = np.sqrt((v ** 2).sum(axis=1))
+    perpendicular = np.column_stack((to_next[:, 1], -to_next[:, 0]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        v = np.where(norm[:, None] < 1e-10, perpendicular, v / norm[:, None])
+
+    distance = np.repeat(np.asarray(distances, dtype=np.float64), lengths)[:, None]
+    p1 = coordinates + distance * v
+    p2 = coordinates - distance * v
+    v1 = p1 - coordinates
+    left = to_next[:, 0] * v1[:, 1] - to_next[:, 1] * v1[:, 0] > 0
+    return np.column_stack((p1, p2, left))
+
+
+def geojson_features(shared, ways, ids, types, users, tags):
+    """
+    Encode the GeoJSON features of some ways, like OSM.encode_feature
+    :param ids: The id of each way
+    :param types: The type of each way
+    :param users: The user of each way
+    :param tags: The tags of each way, as flat (key, value, ...) tuples
+    :return: An object array of JSON strings
+    """
+    from network import encode_way_feature
+    positions, lengths, _ = way_node_positions(shared, ways)
+    coordinates = shared.coordinates[shared.node_index[positions]][:, ::-1].tolist()
+    features = np.empty(len(ways), dtype=object)
+    start = 0
+    for k, end in enumerate(np.cumsum(lengths).tolist()):
+        features[k] = encode_way_feature(ids[k], types[k], users[k], tags[k], coordinates[start:end])
+        start = end
+    return features
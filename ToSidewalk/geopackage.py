@@ -0,0 +1,248 @@
+"""
+Write a sidewalk network to a GeoPackage (http://www.geopackage.org/spec/) with only the standard library sqlite3.
+
+The file has three feature tables (sidewalks, crosswalks and nodes) in WGS84. Rows are inserted in large
+transactions, and the R-tree spatial index of each table is built once after all the rows are in.
+
+Example:
+    write_geopackage(sidewalk_network, "sidewalks.gpkg")
+"""
+import logging as log
+import os
+import sqlite3
+import struct
+import time
+
+SRS_ID = 4326
+APPLICATION_ID = 0x47504B47  # "GPKG"
+USER_VERSION = 10200  # GeoPackage 1.2
+
+WKB_POINT = 1
+WKB_LINESTRING = 2
+
+SPATIAL_REF_SYS = [
+    ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", "undefined cartesian coordinate reference system"),
+    ("Undefined geographic SRS", 0, "NONE", 0, "undefined", "undefined geographic coordinate reference system"),
+    ("WGS 84 geodetic", 4326, "EPSG", 4326,
+     'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],'
+     'AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],'
+     'UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4326"]]',
+     "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid")
+]
+
+# Triggers that keep the R-tree in sync with later edits, from the GeoPackage RTree Spatial Indexes extension.
+# They use the ST_* SQL functions that GIS clients (GDAL, QGIS) register. They are not fired by this writer.
+RTREE_TRIGGERS = [
+    """CREATE TRIGGER rtree_{t}_{c}_insert AFTER INSERT ON {t}
+WHEN (new.{c} NOT NULL AND NOT ST_IsEmpty(NEW.{c}))
+BEGIN
+  INSERT OR REPLACE INTO rtree_{t}_{c} VALUES (
+    NEW.{i}, ST_MinX(NEW.{c}), ST_MaxX(NEW.{c}), ST_MinY(NEW.{c}), ST_MaxY(NEW.{c}));
+END""",
+    """CREATE TRIGGER rtree_{t}_{c}_update1 AFTER UPDATE OF {c} ON {t}
+WHEN OLD.{i} = NEW.{i} AND (NEW.{c} NOTNULL AND NOT ST_IsEmpty(NEW.{c}))
+BEGIN
+  INSERT OR REPLACE INTO rtree_{t}_{c} VALUES (
+    NEW.{i}, ST_MinX(NEW.{c}), ST_MaxX(NEW.{c}), ST_MinY(NEW.{c}), ST_MaxY(NEW.{c}));
+END""",
+    """CREATE TRIGGER rtree_{t}_{c}_update2 AFTER UPDATE OF {c} ON {t}
+WHEN OLD.{i} = NEW.{i} AND (NEW.{c} ISNULL OR ST_IsEmpty(NEW.{c}))
+BEGIN
+  DELETE FROM rtree_{t}_{c} WHERE id = OLD.{i};
+END""",
+    """CREATE TRIGGER rtree_{t}_{c}_update3 AFTER UPDATE ON {t}
+WHEN OLD.{i} != NEW.{i} AND (NEW.{c} NOTNULL AND NOT ST_IsEmpty(NEW.{c}))
+BEGIN
+  DELETE FROM rtree_{t}_{c} WHERE id = OLD.{i};
+  INSERT OR REPLACE INTO rtree_{t}_{c} VALUES (
+    NEW.{i}, ST_MinX(NEW.{c}), ST_MaxX(NEW.{c}), ST_MinY(NEW.{c}), ST_MaxY(NEW.{c}));
+END""",
+    """CREATE TRIGGER rtree_{t}_{c}_update4 AFTER UPDATE ON {t}
+WHEN OLD.{i} != NEW.{i} AND (NEW.{c} ISNULL OR ST_IsEmpty(NEW.{c}))
+BEGIN
+  DELETE FROM rtree_{t}_{c} WHERE id IN (OLD.{i}, NEW.{i});
+END""",
+    """CREATE TRIGGER rtree_{t}_{c}_delete AFTER DELETE ON {t}
+WHEN old.{c} NOT NULL
+BEGIN
+  DELETE FROM rtree_{t}_{c} WHERE id = OLD.{i};
+END"""
+]
+
+
+def geometry_blob(geometry_type, coordinates):
+    """
+    Encode a geometry as a GeoPackage binary: a header with the SRS id and the envelope, followed by WKB
+    :param geometry_type: WKB_POINT or WKB_LINESTRING
+    :param coordinates: A list of (x, y) tuples
+    :return: A tuple of the blob and the envelope (min x, max x, min y, max y)
+    """
+    xs = [x for x, y in coordinates]
+    ys = [y for x, y in coordinates]
+    envelope = (min(xs), max(xs), min(ys), max(ys))
+    values = [value for coordinate in coordinates for value in coordinate]
+    if geometry_type == WKB_POINT:
+        # Flags: little endian, no envelope (the envelope of a point is the point itself)
+        header = struct.pack("<2sBBi", b"GP", 0, 0x01, SRS_ID)
+        wkb = struct.pack("<BI2d", 1, WKB_POINT, *values)
+    else:
+        # Flags: little endian, [min x, max x, min y, max y] envelope
+        header = struct.pack("<2sBBi4d", b"GP", 0, 0x03, SRS_ID, *envelope)
+        wkb = struct.pack("<BII%dd" % len(values), 1, geometry_type, len(coordinates), *values)
+    return sqlite3.Binary(header + wkb), envelope
+
+
+class GeoPackageWriter(object):
+    """
+    Writes feature tables into a new GeoPackage file
+    """
+    def __init__(self, filename, batch_size=50000, overwrite=True):
+        """
+        :param filename: The GeoPackage file
+        :param batch_size: Rows inserted per transaction
+        :param overwrite: Replace an existing file
+        """
+        if overwrite and os.path.exists(filename):
+            os.remove(filename)
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA application_id = %d" % APPLICATION_ID)
+        self.connection.execute("PRAGMA user_version = %d" % USER_VERSION)
+        # The file is new, so a crash during the bulk load loses nothing worth a journal.
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.tables = {}
+        self._create_metadata_tables()
+
+    def _create_metadata_tables(self):
+        c = self.connection
+        c.execute("""CREATE TABLE gpkg_spatial_ref_sys (
+            srs_name TEXT NOT NULL, srs_id INTEGER NOT NULL PRIMARY KEY, organization TEXT NOT NULL,
+            organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)""")
+        c.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", SPATIAL_REF_SYS)
+        c.execute("""CREATE TABLE gpkg_contents (
+            table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE,
+            description TEXT DEFAULT '',
+            last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+            min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER,
+            CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id))""")
+        c.execute("""CREATE TABLE gpkg_geometry_columns (
+            table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+            srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL,
+            CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+            CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+            CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id))""")
+        c.execute("""CREATE TABLE gpkg_extensions (
+            table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL, definition TEXT NOT NULL,
+            scope TEXT NOT NULL, CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name))""")
+        c.commit()
+
+    def create_table(self, name, geometry_type_name, columns):
+        """
+        Create a feature table
+        :param name: Table name
+        :param geometry_type_name: "POINT" or "LINESTRING"
+        :param columns: A list of (column name, SQL type) for the attributes
+        """
+        definitions = ", ".join("%s %s" % column for column in columns)
+        self.connection.execute("CREATE TABLE %s (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom %s, %s)"
+                                % (name, geometry_type_name, definitions))
+        self.connection.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, srs_id) "
+                                "VALUES (?, 'features', ?, ?)", (name, name, SRS_ID))
+        self.connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', ?, ?, 0, 0)",
+                                (name, geometry_type_name, SRS_ID))
+        self.tables[name] = {"columns": [column[0] for column in columns], "envelopes": []}
+
+    def write(self, name, features):
+        """
+        Insert features in batched transactions
+        :param name: Table name
+        :param features: An iterable of (geometry type, coordinates, attribute tuple)
+        :return: The number of rows written
+        """
+        table = self.tables[name]
+        sql = "INSERT INTO %s (fid, geom, %s) VALUES (?, ?, %s)" % (name, ", ".join(table["columns"]),
+                                                                   ", ".join("?" * len(table["columns"])))
+        envelopes = table["envelopes"]
+        batch = []
+        for geometry_type, coordinates, attributes in features:
+            blob, envelope = geometry_blob(geometry_type, coordinates)
+            fid = len(envelopes) + 1
+            envelopes.append((fid,) + envelope)
+            batch.append((fid, blob) + tuple(attributes))
+            if len(batch) >= self.batch_size:
+                self._insert(sql, batch)
+                batch = []
+        if batch:
+            self._insert(sql, batch)
+        return len(envelopes)
+
+    def _insert(self, sql, batch):
+        self.connection.executemany(sql, batch)
+        self.connection.commit()
+
+    def close(self):
+        """
+        Record the bounds of the tables in gpkg_contents, build the R-tree indexes and close the file
+        """
+        c = self.connection
+        for name, table in self.tables.items():
+            envelopes = table["envelopes"]
+            if envelopes:
+                bounds = (min(e[1] for e in envelopes), min(e[3] for e in envelopes),
+                          max(e[2] for e in envelopes), max(e[4] for e in envelopes))
+                c.execute("UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ? WHERE table_name = ?",
+                          bounds + (name,))
+            self._create_rtree(name, envelopes)
+        c.commit()
+        c.close()
+
+    def _create_rtree(self, name, envelopes):
+        c = self.connection
+        try:
+            c.execute("CREATE VIRTUAL TABLE rtree_%s_geom USING rtree(id, minx, maxx, miny, maxy)" % name)
+        except sqlite3.OperationalError:
+            log.warning("SQLite was built without the R-tree module. %s has no spatial index.", name)
+            return
+        for start in range(0, len(envelopes), self.batch_size):
+            c.executemany("INSERT INTO rtree_%s_geom VALUES (?, ?, ?, ?, ?)" % name,
+                          envelopes[start:start + self.batch_size])
+        c.execute("INSERT INTO gpkg_extensions VALUES (?, 'geom', 'gpkg_rtree_index', "
+                  "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (name,))
+        for trigger in RTREE_TRIGGERS:
+            c.execute(trigger.format(t=name, c="geom", i="fid"))
+
+
+def _way_features(network, crosswalks):
+    for attributes, coordinates in network.way_records(crosswalks):
+        yield WKB_LINESTRING, coordinates, attributes
+
+
+def _node_features(network):
+    for attributes, point in network.node_records():
+        yield WKB_POINT, [point], attributes
+
+
+def write_geopackage(sidewalk_network, filename, batch_size=50000):
+    """
+    Write a sidewalk network to a GeoPackage with sidewalks, crosswalks and nodes tables
+    :param sidewalk_network: A sidewalk network
+    :param filename: The GeoPackage file. An existing file is replaced.
+    :param batch_size: Rows inserted per transaction
+    :return: A dictionary with the number of rows written to each table
+    """
+    start = time.time()
+    writer = GeoPackageWriter(filename, batch_size)
+    way_columns = [("id", "TEXT"), ("type", "TEXT"), ("street_id", "TEXT")]
+    writer.create_table("sidewalks", "LINESTRING", way_columns)
+    writer.create_table("crosswalks", "LINESTRING", way_columns)
+    writer.create_table("nodes", "POINT", [("id", "TEXT"), ("is_crosswalk", "BOOLEAN")])
+
+    counts = {
+        "sidewalks": writer.write("sidewalks", _way_features(sidewalk_network, False)),
+        "crosswalks": writer.write("crosswalks", _way_features(sidewalk_network, True)),
+        "nodes": writer.write("nodes", _node_features(sidewalk_network))
+    }
+    writer.close()
+    log.info("Wrote %s to %s in %.2fs", counts, filename, time.time() - start)
+    return counts
@@ -0,0 +1,200 @@
+"""
+A static uniform grid spatial index over bounding boxes, built with NumPy.
+
+Every item is registered in each grid cell its bounding box overlaps. The (cell, item) pairs are sorted by cell so
+that the items of a cell are a contiguous slice of one array, and the cells of a grid row are contiguous too, which
+makes a box query a handful of slices followed by a vectorized overlap test. The index is built once and can be
+saved with np.savez and loaded back without rebuilding.
+"""
+import numpy as np
+
+
+def ragged_offsets(counts):
+    """
+    Return the position of each element within its group, for consecutive groups of the given sizes
+    (e.g. [2, 3] gives [0, 1, 0, 1, 2])
+    :param counts: An array of group sizes
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+class GridIndex(object):
+    def __init__(self, bboxes, cell_size=None):
+        """
+        :param bboxes: A (number of items, 4) array of (min x, min y, max x, max y). Rows with NaN are not indexed.
+        :param cell_size: Size of the grid cells. By default the cells are about as large as the items, with roughly
+        one cell per item.
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.bboxes = bboxes
+        valid = ~np.isnan(bboxes).any(axis=1)
+        if not valid.any():
+            self.origin = np.zeros(2)
+            self.cell_size = 1.
+            self.shape = (1, 1)
+            self.indptr = np.zeros(2, dtype=np.int64)
+            self.items = np.zeros(0, dtype=np.int64)
+            return
+
+        b = bboxes[valid]
+        x0, y0 = b[:, 0].min(), b[:, 1].min()
+        x1, y1 = b[:, 2].max(), b[:, 3].max()
+        if cell_size is None:
+            sizes = np.maximum(b[:, 2] - b[:, 0], b[:, 3] - b[:, 1])
+            cell_size = max(np.median(sizes), np.sqrt((x1 - x0) * (y1 - y0) / len(b)))
+        cell_size = float(cell_size) or 1e-9
+        nx = int((x1 - x0) / cell_size) + 1
+        ny = int((y1 - y0) / cell_size) + 1
+        self.origin = np.array([x0, y0])
+        self.cell_size = cell_size
+        self.shape = (ny, nx)
+
+        item_ids = np.nonzero(valid)[0]
+        ix0, iy0, ix1, iy1 = self._cells(b)
+        widths = ix1 - ix0 + 1
+        counts = widths * (iy1 - iy0 + 1)
+        # One (cell, item) pair for each cell covered by each item
+        offsets = ragged_offsets(counts)
+        widths = np.repeat(widths, counts)
+        cx = np.repeat(ix0, counts) + offsets % widths
+        cy = np.repeat(iy0, counts) + offsets // widths
+        cells = cy * nx + cx
+        order = np.argsort(cells, kind="mergesort")
+        self.items = np.repeat(item_ids, counts)[order]
+        self.indptr = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=nx * ny), out=self.indptr[1:])
+
+    def _cells(self, b):
+        ny, nx = self.shape
+        ix0 = np.clip(np.floor((b[..., 0] - self.origin[0]) / self.cell_size).astype(np.int64), 0, nx - 1)
+        iy0 = np.clip(np.floor((b[..., 1] - self.origin[1]) / self.cell_size).astype(np.int64), 0, ny - 1)
+        ix1 = np.clip(np.floor((b[..., 2] - self.origin[0]) / self.cell_size).astype(np.int64), 0, nx - 1)
+        iy1 = np.clip(np.floor((b[..., 3] - self.origin[1]) / self.cell_size).astype(np.int64), 0, ny - 1)
+        return ix0, iy0, ix1, iy1
+
+    def candidates(self, bbox):
+        """
+        Return the items registered in the cells that bbox overlaps, without duplicates. Some of them may not
+        overlap bbox.
+        """
+        min_x, min_y, max_x, max_y = bbox
+        if len(self.items) == 0 or max_x < min_x or max_y < min_y:
+            return np.zeros(0, dtype=np.int64)
+        ix0, iy0, ix1, iy1 = [int(v) for v in self._cells(np.array(bbox, dtype=np.float64))]
+        nx = self.shape[1]
+        slices = [self.items[self.indptr[row * nx + ix0]:self.indptr[row * nx + ix1 + 1]]
+                  for row in range(iy0, iy1 + 1)]
+        return np.unique(np.concatenate(slices))
+
+    def query(self, bbox):
+        """
+        Return the items whose bounding box overlaps bbox (min x, min y, max x, max y)
+        """
+        min_x, min_y, max_x, max_y = bbox
+        items = self.candidates(bbox)
+        b = self.bboxes[items]
+        overlap = (b[:, 0] <= max_x) & (b[:, 2] >= min_x) & (b[:, 1] <= max_y) & (b[:, 3] >= min_y)
+        return items[overlap]
+
+    def join(self, bboxes):
+        """
+        Find the items that overlap each of many boxes, in one vectorized pass
+        :param bboxes: A (number of boxes, 4) array of (min x, min y, max x, max y)
+        :return: A tuple of arrays (box positions, items), sorted by box and without duplicates
+        """
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        empty = np.zeros(0, dtype=np.int64)
+        if len(self.items) == 0 or len(bboxes) == 0:
+            return empty, empty
+        ix0, iy0, ix1, iy1 = self._cells(bboxes)
+        nx = self.shape[1]
+        # One contiguous range of items per row of cells covered by each box
+        rows = iy1 - iy0 + 1
+        boxes = np.repeat(np.arange(len(bboxes)), rows)
+        row = np.repeat(iy0, rows) + ragged_offsets(rows)
+        starts = self.indptr[row * nx + ix0[boxes]]
+        counts = self.indptr[row * nx + ix1[boxes] + 1] - starts
+        offsets = ragged_offsets(counts)
+        boxes = np.repeat(boxes, counts)
+        items = self.items[np.repeat(starts, counts) + offsets]
+
+        a, b = bboxes[boxes], self.bboxes[items]
+        overlap = (b[:, 0] <= a[:, 2]) & (b[:, 2] >= a[:, 0]) & (b[:, 1] <= a[:, 3]) & (b[:, 3] >= a[:, 1])
+        keys = np.unique(boxes[overlap] * len(self.bboxes) + items[overlap])
+        return keys // len(self.bboxes), keys % len(self.bboxes)
+
+    def arrays(self, prefix=""):
+        """
+        Return the index as a dictionary of arrays for np.savez
+        """
+        return {
+            prefix + "bboxes": self.bboxes,
+            prefix + "origin": self.origin,
+            prefix + "grid": np.array([self.cell_size, self.shape[0], self.shape[1]]),
+            prefix + "indptr": self.indptr,
+            prefix + "items": self.items
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix=""):
+        index = cls.__new__(cls)
+        index.bboxes = arrays[prefix + "bboxes"]
+        index.origin = arrays[prefix + "origin"]
+        cell_size, ny, nx = arrays[prefix + "grid"]
+        index.cell_size = float(cell_size)
+        index.shape = (int(ny), int(nx))
+        index.indptr = arrays[prefix + "indptr"]
+        index.items = arrays[prefix + "items"]
+        return index
+
+    def neighborhood(self, x, y, k, x_scale=1., y_scale=1.):
+        """
+        Return the items registered in the (2k + 1) x (2k + 1) cells around the cells of many points, as pairs
+        :param x: An array of point x
+        :param y: An array of point y
+        :param k: Number of rings of cells around the cell of each point
+        :param x_scale: Scale of x distances in the returned bounds (a number or an array with one value per point)
+        :param y_scale: Scale of y distances in the returned bounds
+        :return: A tuple (point positions, items, bounds). The pairs are grouped by point, and an item may appear more
+        than once for a point. Every item that is not paired with a point is farther than its bound from it (inf
+        when the neighborhood covers the whole grid).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ny, nx = self.shape
+        cx = np.clip(np.floor((x - self.origin[0]) / self.cell_size).astype(np.int64), 0, nx - 1)
+        cy = np.clip(np.floor((y - self.origin[1]) / self.cell_size).astype(np.int64), 0, ny - 1)
+        cx0, cx1 = np.maximum(cx - k, 0), np.minimum(cx + k, nx - 1)
+        cy0, cy1 = np.maximum(cy - k, 0), np.minimum(cy + k, ny - 1)
+
+        # Distance to each part of the grid outside the neighborhood: the columns to its left and right and the rows
+        # below and above it
+        left, bottom = self.origin
+        right, top = self.origin + self.cell_size * np.array([nx, ny])
+
+        def gap(v, low, high):
+            return np.maximum(np.maximum(low - v, v - high), 0.)
+
+        x_gap = gap(x, left, right) * x_scale
+        y_gap = gap(y, bottom, top) * y_scale
+        bounds = np.full(len(x), np.inf)
+        for outside, distance, other_gap in (
+                (cx0 > 0, gap(x, left, left + cx0 * self.cell_size) * x_scale, y_gap),
+                (cx1 < nx - 1, gap(x, left + (cx1 + 1) * self.cell_size, right) * x_scale, y_gap),
+                (cy0 > 0, gap(y, bottom, bottom + cy0 * self.cell_size) * y_scale, x_gap),
+                (cy1 < ny - 1, gap(y, bottom + (cy1 + 1) * self.cell_size, top) * y_scale, x_gap)):
+            bounds = np.where(outside, np.minimum(bounds, np.hypot(distance, other_gap)), bounds)
+
+        # One contiguous range of items per row of the neighborhood
+        rows = 2 * k + 1
+        row = cy0[:, None] + np.arange(rows)[None, :]
+        valid = row <= cy1[:, None]
+        row = np.minimum(row, ny - 1)
+        starts = self.indptr[row * nx + cx0[:, None]]
+        ends = self.indptr[row * nx + cx1[:, None] + 1]
+        counts = np.where(valid, ends - starts, 0).ravel()
+        starts = starts.ravel()
+        offsets = ragged_offsets(counts)
+        points = np.repeat(np.repeat(np.arange(len(x)), rows), counts)
+        return points, self.items[np.repeat(starts, counts) + offsets], bounds
@@ -0,0 +1,206 @@
+"""
+Per-stage timing and memory instrumentation for the sidewalk generation pipeline.
+
+OSM.preprocess() and ToSidewalk.main() accept an Instrument and record the wall time, CPU time, peak memory and
+counters (e.g., candidate pairs tested, pairs merged, nodes removed, crosswalks built) of each stage:
+
+    instrument = Instrument(profile_dir="profiles")
+    street_network.preprocess(instrument=instrument)
+    main(street_network, instrument=instrument)
+    print instrument.to_json()
+
+When no instrument is passed, the pipeline uses NULL_INSTRUMENT, whose methods do nothing.
+"""
+import json
+import os
+import resource
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def cpu_time():
+    """
+    Return the user and system CPU time of this process in seconds
+    """
+    times = os.times()
+    return times[0] + times[1]
+
+
+def peak_memory():
+    """
+    Return the high-water mark of the resident set size of this process in bytes
+    """
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class NullInstrument(object):
+    """
+    An instrument that records nothing. This is used when instrumentation is disabled.
+    """
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, n=1):
+        return
+
+    def report(self):
+        return {"stages": [], "counters": {}}
+
+NULL_INSTRUMENT = NullInstrument()
+
+
+class _Stage(object):
+    def __init__(self, instrument, name):
+        self.instrument = instrument
+        self.name = name
+        self.record = None
+        self.profiler = None
+
+    def __enter__(self):
+        instrument = self.instrument
+        parent = instrument.stack[-1] if instrument.stack else None
+        self.record = {
+            "name": self.name,
+            "parent": parent.record["name"] if parent else None,
+            "status": "ok",
+            "counters": {}
+        }
+        instrument.records.append(self.record)
+
+        if instrument.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            else:
+                self.started_tracing = False
+                instrument.fold_peak()
+            self.record["peak_memory"] = tracemalloc.get_traced_memory()[0]
+
+        if instrument.profile_dir:
+            # Only one profiler can be active at a time, so the parent's profile excludes its sub-stages.
+            import cProfile
+            if parent and parent.profiler:
+                parent.profiler.disable()
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        instrument.stack.append(self)
+        self.cpu_start = cpu_time()
+        self.wall_start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record["wall_time"] = time.time() - self.wall_start
+        self.record["cpu_time"] = cpu_time() - self.cpu_start
+        if exc_type is not None:
+            self.record["status"] = "error"
+            self.record["error"] = "%s: %s" % (exc_type.__name__, exc_value)
+
+        instrument = self.instrument
+        if instrument.trace_memory:
+            instrument.fold_peak()
+        instrument.stack.pop()
+        parent = instrument.stack[-1] if instrument.stack else None
+
+        if self.profiler:
+            self.profiler.disable()
+            filename = os.path.join(instrument.profile_dir, "%03d_%s.prof" % (len(instrument.records),
+                                                                              self.name))
+            self.profiler.dump_stats(filename)
+            self.record["profile"] = filename
+            if parent and parent.profiler:
+                parent.profiler.enable()
+
+        if instrument.trace_memory:
+            if self.started_tracing:
+                tracemalloc.stop()
+        else:
+            self.record["peak_memory"] = peak_memory()
+        return False
+
+
+class Instrument(object):
+    """
+    Records the wall time, CPU time, peak memory and counters of nested pipeline stages.
+
+    The peak memory is measured with tracemalloc when it is available, and is otherwise the high-water mark of the
+    process' resident set size (which never goes down, so it is only an upper bound for later stages).
+    """
+    enabled = True
+
+    def __init__(self, trace_memory=True, profile_dir=None):
+        """
+        :param trace_memory: Measure the peak memory of each stage with tracemalloc, if it is available
+        :param profile_dir: If given, a cProfile dump of each stage is written to this directory
+        """
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self.profile_dir = profile_dir
+        if profile_dir and not os.path.isdir(profile_dir):
+            os.makedirs(profile_dir)
+        self.records = []
+        self.stack = []
+
+    def stage(self, name):
+        """
+        Return a context manager that measures a stage
+        :param name: The name of the stage
+        """
+        return _Stage(self, name)
+
+    def count(self, name, n=1):
+        """
+        Add n to a counter of the current stage
+        :param name: The name of the counter
+        :param n: The increment
+        """
+        if self.stack:
+            counters = self.stack[-1].record["counters"]
+            counters[name] = counters.get(name, 0) + n
+
+    def fold_peak(self):
+        """
+        Fold the traced memory peak since the last call into the stages that are running
+        """
+        peak = tracemalloc.get_traced_memory()[1]
+        for stage in self.stack:
+            stage.record["peak_memory"] = max(stage.record["peak_memory"], peak)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    def report(self):
+        """
+        Return the measurements as a dictionary with the list of stage records (in the order the stages started)
+        and the totals of the counters
+        """
+        totals = {}
+        for record in self.records:
+            for name, n in record["counters"].items():
+                totals[name] = totals.get(name, 0) + n
+        return {
+            "stages": self.records,
+            "counters": totals,
+            "peak_memory_source": "tracemalloc" if self.trace_memory else "maxrss"
+        }
+
+    def to_json(self, **kwargs):
+        """
+        Return the report as a JSON string
+        """
+        return json.dumps(self.report(), **kwargs)
@@ -0,0 +1,328 @@
+"""
+Export a sidewalk network as a pyramid of Mapbox Vector Tiles (https://github.com/mapbox/vector-tile-spec).
+
+The ways are bucketed into the z/x/y tiles they touch over the network's bounds. Each tile is then clipped,
+quantized to the tile extent and encoded as MVT protobuf in a process pool. The tiles are written either to a
+z/x/y.pbf directory tree or to an MBTiles SQLite file.
+
+Example:
+    write_tiles(sidewalk_network, "tiles.mbtiles", min_zoom=14, max_zoom=18)
+"""
+import gzip
+import io
+import json
+import logging as log
+import math
+import multiprocessing
+import os
+import sqlite3
+
+EXTENT = 4096
+BUFFER = 64
+LAYER_NAME = "sidewalks"
+
+# Geometry types and commands of the vector tile specification
+LINESTRING = 2
+MOVE_TO = 1
+LINE_TO = 2
+
+
+def lnglat_to_world(lng, lat):
+    """
+    Project a coordinate to Web Mercator world coordinates in [0, 1) x [0, 1), y growing southward
+    """
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    x = (lng + 180.) / 360.
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def tile_range(bounds, zoom):
+    """
+    Return the range of tiles (min x, min y, max x, max y) that cover bounds (min lat, min lng, max lat, max lng)
+    """
+    min_lat, min_lng, max_lat, max_lng = [float(value) for value in bounds]
+    n = 2 ** zoom
+    x0, y0 = lnglat_to_world(min_lng, max_lat)
+    x1, y1 = lnglat_to_world(max_lng, min_lat)
+    clamp = lambda v: max(0, min(n - 1, int(math.floor(v * n))))
+    return clamp(x0), clamp(y0), clamp(x1), clamp(y1)
+
+
+def clip_line(points, min_v, max_v):
+    """
+    Clip a polyline against the square [min_v, max_v]^2 (Liang-Barsky on each segment)
+    :param points: A list of (x, y)
+    :return: A list of parts, each a list of (x, y) with at least two points
+    """
+    parts = []
+    current = []
+    for (x0, y0), (x1, y1) in zip(points[:-1], points[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        t0, t1 = 0., 1.
+        inside = True
+        for p, q in ((-dx, x0 - min_v), (dx, max_v - x0), (-dy, y0 - min_v), (dy, max_v - y0)):
+            if p == 0:
+                if q < 0:
+                    inside = False
+                    break
+            else:
+                t = q / p
+                if p < 0:
+                    t0 = max(t0, t)
+                else:
+                    t1 = min(t1, t)
+                if t0 > t1:
+                    inside = False
+                    break
+        if not inside:
+            if len(current) > 1:
+                parts.append(current)
+            current = []
+            continue
+        # Keep the vertices exact so that the continuity test below sees consecutive segments as connected
+        start = (x0, y0) if t0 == 0. else (x0 + t0 * dx, y0 + t0 * dy)
+        end = (x1, y1) if t1 == 1. else (x0 + t1 * dx, y0 + t1 * dy)
+        if not current or current[-1] != start:
+            if len(current) > 1:
+                parts.append(current)
+            current = [start]
+        current.append(end)
+        if t1 < 1.:
+            # The segment leaves the square
+            parts.append(current)
+            current = []
+    if len(current) > 1:
+        parts.append(current)
+    return parts
+
+
+def zigzag(n):
+    return (n << 1) ^ (n >> 31)
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field, data):
+    return _key(field, 2) + _varint(len(data)) + data
+
+
+def _packed(field, values):
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def encode_geometry(parts):
+    """
+    Encode quantized line parts as MVT geometry commands with zigzag-encoded deltas
+    """
+    commands = []
+    cx = cy = 0
+    for part in parts:
+        commands.append((1 << 3) | MOVE_TO)
+        x, y = part[0]
+        commands.extend((zigzag(x - cx), zigzag(y - cy)))
+        cx, cy = x, y
+        commands.append((len(part) - 1 << 3) | LINE_TO)
+        for x, y in part[1:]:
+            commands.extend((zigzag(x - cx), zigzag(y - cy)))
+            cx, cy = x, y
+    return commands
+
+
+def encode_tile(z, x, y, features, extent=EXTENT, buffer=BUFFER):
+    """
+    Clip, quantize and encode the features of one tile
+    :param features: A list of (feature id, properties dict, [(world x, world y), ...])
+    :return: The tile as MVT protobuf bytes, or None if no feature is left after clipping
+    """
+    n = 2 ** z
+    keys, values = [], []
+    key_index, value_index = {}, {}
+    encoded_features = []
+    for fid, properties, points in features:
+        local = [((px * n - x) * extent, (py * n - y) * extent) for px, py in points]
+        parts = []
+        for part in clip_line(local, -buffer, extent + buffer):
+            quantized = []
+            for px, py in part:
+                point = (int(round(px)), int(round(py)))
+                if not quantized or quantized[-1] != point:
+                    quantized.append(point)
+            if len(quantized) > 1:
+                parts.append(quantized)
+        if not parts:
+            continue
+
+        tags = []
+        for key, value in sorted(properties.items()):
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            if value not in value_index:
+                value_index[value] = len(values)
+                values.append(value)
+            tags.extend((key_index[key], value_index[value]))
+
+        feature = _key(1, 0) + _varint(fid)
+        feature += _packed(2, tags)
+        feature += _key(3, 0) + _varint(LINESTRING)
+        feature += _packed(4, encode_geometry(parts))
+        encoded_features.append(feature)
+
+    if not encoded_features:
+        return None
+
+    layer = _key(15, 0) + _varint(2)
+    layer += _bytes_field(1, LAYER_NAME.encode("utf-8"))
+    for feature in encoded_features:
+        layer += _bytes_field(2, feature)
+    for key in keys:
+        layer += _bytes_field(3, key.encode("utf-8"))
+    for value in values:
+        layer += _bytes_field(4, _bytes_field(1, value.encode("utf-8")))
+    layer += _key(5, 0) + _varint(extent)
+    return _bytes_field(3, layer)
+
+
+def _encode_task(task):
+    z, x, y, features = task
+    return z, x, y, encode_tile(z, x, y, features)
+
+
+def bucket_features(network, min_zoom, max_zoom):
+    """
+    Assign the ways of a network to the tiles they touch within the network's bounds
+    :return: A dictionary from (z, x, y) to a list of (feature id, properties, world coordinates)
+    """
+    tiles = {}
+    margin = float(BUFFER) / EXTENT
+    ranges = dict((z, tile_range(network.bounds, z)) for z in range(min_zoom, max_zoom + 1))
+    for i, way in enumerate(network.ways.get_list()):
+        points = []
+        for nid in way.nids:
+            node = network.nodes.get(nid)
+            points.append(lnglat_to_world(node.lng, node.lat))
+        if len(points) < 2:
+            continue
+        fid = int(way.id) if way.id.isdigit() else i
+        feature = (fid, {"type": str(way.type)}, points)
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        for z in range(min_zoom, max_zoom + 1):
+            n = 2 ** z
+            min_tx, min_ty, max_tx, max_ty = ranges[z]
+            for tx in range(max(min_tx, int(min(xs) * n - margin)), min(max_tx, int(max(xs) * n + margin)) + 1):
+                for ty in range(max(min_ty, int(min(ys) * n - margin)), min(max_ty, int(max(ys) * n + margin)) + 1):
+                    tiles.setdefault((z, tx, ty), []).append(feature)
+    return tiles
+
+
+def write_tiles(sidewalk_network, output, min_zoom=14, max_zoom=18, processes=None, compress=None):
+    """
+    Write a sidewalk network as a vector tile pyramid
+    :param sidewalk_network: A sidewalk network
+    :param output: A directory for z/x/y.pbf files, or a file name ending with .mbtiles
+    :param min_zoom: The lowest zoom level
+    :param max_zoom: The highest zoom level
+    :param processes: Size of the process pool that encodes the tiles (default: number of CPUs)
+    :param compress: Gzip the tiles. Defaults to True for MBTiles (as the specification requires) and False for
+    directories.
+    :return: The number of tiles written
+    """
+    mbtiles = output.endswith(".mbtiles")
+    if compress is None:
+        compress = mbtiles
+    tiles = bucket_features(sidewalk_network, min_zoom, max_zoom)
+    tasks = [key + (features,) for key, features in tiles.items()]
+    log.info("Encoding %d tiles", len(tasks))
+
+    sink = _MBTilesSink(output, sidewalk_network.bounds, min_zoom, max_zoom) if mbtiles else _DirectorySink(output)
+    count = 0
+    pool = multiprocessing.Pool(processes)
+    try:
+        for z, x, y, data in pool.imap_unordered(_encode_task, tasks, chunksize=16):
+            if data is None:
+                continue
+            if compress:
+                data = _gzip(data)
+            sink.put(z, x, y, data)
+            count += 1
+        pool.close()
+    except Exception:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        sink.close()
+    return count
+
+
+def _gzip(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+class _DirectorySink(object):
+    def __init__(self, directory):
+        self.directory = directory
+
+    def put(self, z, x, y, data):
+        tile_dir = os.path.join(self.directory, str(z), str(x))
+        if not os.path.isdir(tile_dir):
+            os.makedirs(tile_dir)
+        with open(os.path.join(tile_dir, "%d.pbf" % y), "wb") as f:
+            f.write(data)
+
+    def close(self):
+        return
+
+
+class _MBTilesSink(object):
+    def __init__(self, filename, bounds, min_zoom, max_zoom):
+        if os.path.exists(filename):
+            os.remove(filename)
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+        self.connection.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, "
+                                "tile_data BLOB)")
+        min_lat, min_lng, max_lat, max_lng = [float(value) for value in bounds]
+        vector_layers = [{"id": LAYER_NAME, "fields": {"type": "String"}, "minzoom": min_zoom, "maxzoom": max_zoom}]
+        metadata = [
+            ("name", LAYER_NAME),
+            ("format", "pbf"),
+            ("type", "overlay"),
+            ("version", "1"),
+            ("minzoom", str(min_zoom)),
+            ("maxzoom", str(max_zoom)),
+            ("bounds", "%f,%f,%f,%f" % (min_lng, min_lat, max_lng, max_lat)),
+            ("center", "%f,%f,%d" % ((min_lng + max_lng) / 2, (min_lat + max_lat) / 2, max_zoom)),
+            ("json", json.dumps({"vector_layers": vector_layers}))
+        ]
+        self.connection.executemany("INSERT INTO metadata VALUES (?, ?)", metadata)
+
+    def put(self, z, x, y, data):
+        # MBTiles uses the TMS scheme, where rows count from the south
+        self.connection.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)", (z, x, 2 ** z - 1 - y, sqlite3.Binary(data)))
+
+    def close(self):
+        self.connection.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+        self.connection.commit()
+        self.connection.close()
@@ -1,5 +1,7 @@
+from array import array
 from xml.etree import cElementTree as ET
-from shapely.geometry import Polygon, Point, LineString
+from xml.sax.saxutils import escape
+import gc
 import json
 import logging as log
 import math
@@ -7,11 +9,17 @@ import numpy as np
 
 from nodes import Node, Nodes
 from ways import Street, Streets
-from utilities import window, area
+from utilities import window, area, reserve_ids
+from instrument import NULL_INSTRUMENT
+from tags import TagStore, TAG_KEYS, common_tags
+from streams import open_input
 
 from itertools import combinations
 from heapq import heappush, heappop, heapify
 
+# Only the ways with these highway tags are read as streets
+VALID_HIGHWAYS = {'primary', 'secondary', 'tertiary', 'residential'}
+
 
 class Network(object):
     def __init__(self, nodes, ways):
@@ -126,7 +134,7 @@ class Network(object):
         :return:
         """
         # Take all nodes from way 2 and add them to way 1
-        log.debug("Attempting to join ways " + way_id_1 + " and " + way_id_2 + " for merging.")
+        log.debug("Attempting to join ways %s and %s for merging.", way_id_1, way_id_2)
         try:
             way2 = self.ways.get(way_id_2)
             for nid in way2.get_node_ids():
@@ -237,64 +245,120 @@ class OSM(Network):
                 new_segments_to_merge.append(pair)
         return new_segments_to_merge
 
-    def preprocess(self):
+    def preprocess(self, instrument=NULL_INSTRUMENT):
         """
         Preprocess and clean up the data
+        :param instrument: An Instrument that records the time, memory and counters of each step
         :return:
         """
-        parallel_segments = self.find_parallel_street_segments()
-        parallel_segments_filtered = self.join_connected_ways(parallel_segments)
-        self.merge_parallel_street_segments(parallel_segments_filtered)
-
-        self.split_streets()
-        self.update_ways()
-        self.merge_nodes()
-
-        # Clean up and so I can make a sidewalk network
-        self.clean_street_segmentation()
-        # Remove ways that have only a single node.
-        for way in self.ways.get_list():
-            if len(way.nids) < 2:
-                self.remove_way(way.id)
+        with instrument.stage("preprocess"):
+            with instrument.stage("find_parallel_street_segments"):
+                way_count = len(self.ways.ways)
+                parallel_segments = self.find_parallel_street_segments()
+                instrument.count("candidate_pairs_tested", way_count * (way_count - 1) / 2)
+                instrument.count("parallel_pairs_found", len(parallel_segments))
+
+            with instrument.stage("join_connected_ways"):
+                parallel_segments_filtered = self.join_connected_ways(parallel_segments)
+                instrument.count("ways_joined", len(parallel_segments) - len(parallel_segments_filtered))
+
+            with instrument.stage("merge_parallel_street_segments"):
+                pairs_merged = self.merge_parallel_street_segments(parallel_segments_filtered)
+                instrument.count("pairs_merged", pairs_merged)
+
+            with instrument.stage("split_streets"):
+                way_count = len(self.ways.ways)
+                self.split_streets()
+                self.update_ways()
+                instrument.count("ways_added", len(self.ways.ways) - way_count)
+
+            with instrument.stage("merge_nodes"):
+                node_count = len(self.nodes.nodes)
+                self.merge_nodes()
+                instrument.count("nodes_removed", node_count - len(self.nodes.nodes))
+
+            # Clean up and so I can make a sidewalk network
+            with instrument.stage("clean_street_segmentation"):
+                way_count = len(self.ways.ways)
+                self.clean_street_segmentation()
+                # Remove ways that have only a single node.
+                for way in self.ways.get_list():
+                    if len(way.nids) < 2:
+                        self.remove_way(way.id)
+                instrument.count("ways_removed", way_count - len(self.ways.ways))
         return
 
     def clean_street_segmentation(self):
         """
         Go through nodes and find ones that have two connected ways (nodes should have either one or more than two ways)
+        and join the ways at them. Each maximal chain of ways joined end to end at such nodes is found with one walk
+        and replaced by a single street, so a street split into k segments costs O(k) rather than O(k^2). The network
+        is only modified once all the chains are found.
         """
-        for node in self.nodes.get_list():
-            if len(node.get_way_ids()) == 2:
-                way_id_1, way_id_2 = node.get_way_ids()
-                way_1 = self.ways.get(way_id_1)
-                way_2 = self.ways.get(way_id_2)
-
-                # Given that the streets are split, node's index in each way's nids (a list of node ids) should
-                # either be 0 or else.
-                if way_1.nids.index(node.id) == 0 and way_2.nids.index(node.id) == 0:
-                    combined_nids = way_1.nids[:0:-1] + way_2.nids
-                elif way_1.nids.index(node.id) != 0 and way_2.nids.index(node.id) == 0:
-                    combined_nids = way_1.nids[:-1] + way_2.nids
-                elif way_1.nids.index(node.id) == 0 and way_2.nids.index(node.id) != 0:
-                    combined_nids = way_2.nids[:-1] + way_1.nids
+        ways = self.ways
+
+        def is_joint(nid):
+            # A node where exactly two different ways end
+            way_ids = self.nodes.get(nid).get_way_ids()
+            if len(way_ids) != 2 or way_ids[0] == way_ids[1]:
+                return False
+            for way_id in way_ids:
+                nids = ways.get(way_id).nids
+                if nids[0] == nids[-1] or nid not in (nids[0], nids[-1]):
+                    return False
+            return True
+
+        def extend(nids, chain, visited):
+            # Follow the chain past the last node of nids
+            while is_joint(nids[-1]):
+                way_id_1, way_id_2 = self.nodes.get(nids[-1]).get_way_ids()
+                way_id = way_id_2 if way_id_1 in visited else way_id_1
+                if way_id in visited:
+                    # A closed loop of segments
+                    break
+                visited.add(way_id)
+                chain.append(way_id)
+                way = ways.get(way_id)
+                if way.nids[0] == nids[-1]:
+                    nids.extend(way.nids[1:])
                 else:
-                    combined_nids = way_1.nids + way_2.nids[1::-1]
-
-                # Create a new way from way_1 and way_2. Then remove the two ways from self.way
-                new_street = Street(None, combined_nids, "footway")
-                self.add_way(new_street)
-                self.remove_way(way_id_1)
-                self.remove_way(way_id_2)
+                    nids.extend(way.nids[-2::-1])
 
+        visited = set()
+        chains = []
+        for way in ways.get_list():
+            if way.id in visited or len(way.nids) < 2:
+                continue
+            visited.add(way.id)
+            chain = [way.id]
+            nids = list(way.nids)
+            extend(nids, chain, visited)
+            nids.reverse()
+            extend(nids, chain, visited)
+            if len(chain) > 1:
+                nids.reverse()
+                chains.append((chain, nids))
+
+        # Create a new way from each chain. Then remove the old ways from self.ways
+        for chain, combined_nids in chains:
+            new_street = Street(None, combined_nids, "footway")
+            new_street.tags = reduce(common_tags, (ways.get(way_id).tags for way_id in chain))
+            self.add_way(new_street)
+            for way_id in chain:
+                self.remove_way(way_id)
         return
 
-    def export(self, format="geojson"):
+    def export(self, format="geojson", **options):
         """
         Export the node and way data.
-        Todo: Implement geojson format for export.
+        :param format: "geojson", "osm" or "topojson"
+        :param options: Options of the topojson format: precision and style (see topojson.py)
         """
-        if format == 'osm':
-            header = """
-<?xml version="1.0" encoding="UTF-8"?>
+        if format == 'topojson':
+            from topojson import dumps
+            return dumps(self, **options)
+        elif format == 'osm':
+            header = """<?xml version="1.0" encoding="UTF-8"?>
 <osm version="0.6">
 <bounds minlat="%s" minlon="%s" maxlat="%s" maxlon="%s" />
 """ % (str(self.bounds[0]), str(self.bounds[1]), str(self.bounds[2]), str(self.bounds[3]))
@@ -302,7 +366,7 @@ class OSM(Network):
             footer = "</osm>"
             node_list = []
             for node in self.nodes.get_list():
-                lat, lng = node.latlng.location(radian=False)
+                lat, lng = node.location()
                 node_str = """<node id="%s" visible="true" user="test" lat="%s" lon="%s" />""" % (str(node.id), str(lat), str(lng))
                 node_list.append(node_str)
 
@@ -322,39 +386,114 @@ class OSM(Network):
                         # http://wiki.openstreetmap.org/wiki/Tag:footway%3Dsidewalk
                         tag = """<tag k="%s" v="%s" />""" % ("footway", "sidewalk")
                     way_list.append(tag)
+                for key, value in zip(way.tags[::2], way.tags[1::2]):
+                    if key != "highway" or way.type is None:
+                        if not isinstance(value, str):
+                            # ElementTree returns non-ASCII values as unicode; the document is UTF-8
+                            value = value.encode("utf-8")
+                        way_list.append("""<tag k="%s" v="%s" />""" % (key, escape(value, {'"': "&quot;"})))
                 way_list.append("</way>")
 
             osm = header + "\n".join(node_list) + "\n" + "\n".join(way_list) + "\n" + footer
 
             return osm
         else:
-            # Mapbox GeoJson format
-            # https://github.com/mapbox/simplestyle-spec/tree/master/1.1.0
-            geojson = {}
-            geojson['type'] = "FeatureCollection"
-            geojson['features'] = []
-            for way in self.ways.get_list():
-                feature = {}
-                feature['properties'] = {
-                    'type': way.type,
-                    'id': way.id,
-                    'user': way.user,
-                    'stroke': '#555555'
-                }
-                feature['type'] = 'Feature'
-                feature['id'] = 'way/%s' % way.id
-
-                coordinates = []
-                for nid in way.nids:
-                    node = self.nodes.get(nid)
-                    coordinates.append([node.lng, node.lat])
-                feature['geometry'] = {
-                    'type': 'LineString',
-                    'coordinates': coordinates
-                }
-                geojson['features'].append(feature)
+            return self.export_subset(self.ways.ways.keys())
+
+    def encode_feature(self, way):
+        """
+        Return the GeoJSON feature of a way as a JSON string. The string is cached on the way, and is encoded again
+        when the way gets a new list of node ids or new properties. Way.swap_nodes(), Node.set_location() and
+        Nodes.update() invalidate the features they affect; other code that modifies nids in place or moves a node
+        must call Way.invalidate_feature().
+        :param way: A way of this network
+        """
+        properties = (way.id, way.type, way.user, way.tags)
+        cached = way._feature
+        if cached is not None and cached[0] is way.nids and cached[1] == properties:
+            return cached[2]
 
-            return json.dumps(geojson)
+        coordinates = []
+        for nid in way.nids:
+            node = self.nodes.get(nid)
+            coordinates.append([node.lng, node.lat])
+        feature = encode_way_feature(way.id, way.type, way.user, way.tags, coordinates)
+        # Holding on to nids keeps the identity check exact
+        way._feature = (way.nids, properties, feature)
+        return feature
+
+    def encode_features(self, executor):
+        """
+        Encode the GeoJSON features of the ways in the worker processes of an executor, and cache them like
+        encode_feature does, so that export() and iter_geojson() only join them
+        :param executor: A SharedExecutor over the NetworkArrays of this network (see executor.py)
+        """
+        from executor import geojson_features
+        ways = [self.ways.ways[way_id] for way_id in executor.arrays.way_ids.tolist()]
+        features = executor.map(geojson_features, [way.id for way in ways], [way.type for way in ways],
+                                [way.user for way in ways], [way.tags for way in ways])
+        # The collector would otherwise run over the whole network again and again while the cache is filled
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for way, feature in zip(ways, features.tolist()):
+                way._feature = (way.nids, (way.id, way.type, way.user, way.tags), feature)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def export_subset(self, way_ids):
+        """
+        Export some of the ways as a GeoJSON FeatureCollection, from their cached features
+        :param way_ids: The ids of the ways to export
+        :return: A GeoJSON string
+        """
+        return "".join(self.iter_geojson(way_ids))
+
+    def iter_geojson(self, way_ids=None):
+        """
+        Export ways as a GeoJSON FeatureCollection, piece by piece, e.g. for a writer that compresses and writes
+        the pieces while the next ones are encoded (see streams.py)
+        :param way_ids: The ids of the ways to export (default: all the ways)
+        :return: A generator of strings
+        """
+        ways = self.ways.ways
+        if way_ids is None:
+            way_ids = ways.keys()
+        yield '{"type": "FeatureCollection", "features": ['
+        for i, way_id in enumerate(way_ids):
+            if i:
+                yield ", "
+            yield self.encode_feature(ways[way_id])
+        yield ']}'
+
+    def way_records(self, crosswalks=False):
+        """
+        Generate the attributes and the coordinates of the ways of one kind, for the table writers (see db/loader.py
+        and geopackage.py). The ways with fewer than two nodes are skipped.
+        :param crosswalks: Generate the crosswalks instead of the other ways
+        :return: A generator of ((id, type, street_id), list of (lng, lat))
+        """
+        nodes = self.nodes
+        for way in self.ways.get_list():
+            if (way.type == "crosswalk") != crosswalks:
+                continue
+            coordinates = []
+            for nid in way.nids:
+                node = nodes.get(nid)
+                coordinates.append((node.lng, node.lat))
+            if len(coordinates) < 2:
+                continue
+            yield (way.id, way.type, getattr(way, "street_id", None)), coordinates
+
+    def node_records(self):
+        """
+        Generate the attributes and the coordinates of the nodes, for the table writers
+        :return: A generator of ((id, is crosswalk node), (lng, lat))
+        """
+        crosswalk_node_ids = set(self.nodes.crosswalk_node_ids)
+        for node in self.nodes.get_list():
+            yield (node.id, node.id in crosswalk_node_ids), (node.lng, node.lat)
 
     def merge_nodes(self, distance_threshold=0.015):
         """
@@ -399,6 +538,7 @@ class OSM(Network):
         This method finds parallel segments and returns a list of pair of way ids
         :return: A list of pair of parallel way ids
         """
+        from shapely.geometry import Polygon
         streets = self.ways.get_list()
         street_polygons = []
         # Threshold for merging - increasing this will merge parallel ways that are further apart.
@@ -583,12 +723,15 @@ class OSM(Network):
         Instead, I can mark ways that have parallel neighbors not make sidewalks on both sides...
 
         :param parallel_pairs: pairs of street_ids.
+        :return: The number of pairs that were merged
         Todo: This method needs to be optimized using some spatial data structure (e.g., r*-tree) and other metadata..
         # Expand streets into rectangles, then find intersections between them.
         # http://gis.stackexchange.com/questions/90055/how-to-find-if-two-polygons-intersect-in-python
         """
+        from shapely.geometry import LineString
 
         # Merge parallel pairs
+        pairs_merged = 0
         for pair in parallel_pairs:
             streets_to_remove = []
             street_pair = (self.ways.get(pair[0]), self.ways.get(pair[1]))
@@ -660,11 +803,12 @@ class OSM(Network):
                     self.add_node(new_node)
                     new_street_nids.append(new_node.id)
 
-            log.debug(pair)
+            log.debug("Merged a parallel pair %s", pair)
             node_to[subset_nids[0]] = new_street_nids[0]
             node_to[subset_nids[-1]] = new_street_nids[-1]
 
             merged_street = Street(None, new_street_nids)
+            merged_street.tags = common_tags(street_pair[0].tags, street_pair[1].tags)
             merged_street.distance_to_sidewalk *= 2
             streets_to_remove.append(street_pair[0].id)
             streets_to_remove.append(street_pair[1].id)
@@ -679,28 +823,34 @@ class OSM(Network):
                         if subset_nids[0] in street1_segment[1]:
                             street1_segment[0][-1] = node_to[street1_segment[0][-1]]
                             s = Street(None, street1_segment[0])
+                            s.tags = street_pair[0].tags
                             self.add_way(s)
                         else:
                             street2_segment[0][-1] = node_to[street2_segment[0][-1]]
                             s = Street(None, street2_segment[0])
+                            s.tags = street_pair[1].tags
                             self.add_way(s)
                     else:
                         # Both street1_segment and street2_segment exist, but they do not share a common node
                         street1_segment[0][-1] = node_to[street1_segment[0][-1]]
                         s = Street(None, street1_segment[0])
+                        s.tags = street_pair[0].tags
                         self.add_way(s)
                         street2_segment[0][-1] = node_to[street2_segment[0][-1]]
                         s = Street(None, street2_segment[0])
+                        s.tags = street_pair[1].tags
                         self.add_way(s)
                 elif street1_segment[0]:
                     # Only street1_segment exists
                     street1_segment[0][-1] = node_to[street1_segment[0][-1]]
                     s = Street(None, street1_segment[0])
+                    s.tags = street_pair[0].tags
                     self.add_way(s)
                 else:
                     # Only street2_segment exists
                     street2_segment[0][-1] = node_to[street2_segment[0][-1]]
                     s = Street(None, street2_segment[0])
+                    s.tags = street_pair[1].tags
                     self.add_way(s)
 
             if street1_segment[2] or street2_segment[2]:
@@ -711,28 +861,34 @@ class OSM(Network):
                         if subset_nids[-1] in street1_segment[1]:
                             street1_segment[2][0] = node_to[subset_nids[-1]]
                             s = Street(None, street1_segment[2])
+                            s.tags = street_pair[0].tags
                             self.add_way(s)
                         else:
                             street2_segment[2][0] = node_to[subset_nids[-1]]
                             s = Street(None, street2_segment[2])
+                            s.tags = street_pair[1].tags
                             self.add_way(s)
                     else:
                         # Both street1_segment and street2_segment exist, but they do not share a common node
                         street1_segment[2][0] = node_to[subset_nids[-1]]
                         s = Street(None, street1_segment[2])
+                        s.tags = street_pair[0].tags
                         self.add_way(s)
                         street2_segment[2][0] = node_to[subset_nids[-1]]
                         s = Street(None, street2_segment[2])
+                        s.tags = street_pair[1].tags
                         self.add_way(s)
                 elif street1_segment[2]:
                     # Only street1_segment exists
                     street1_segment[2][0] = node_to[subset_nids[-1]]
                     s = Street(None, street1_segment[2])
+                    s.tags = street_pair[0].tags
                     self.add_way(s)
                 else:
                     # Only street2_segment exists
                     street2_segment[2][0] = node_to[subset_nids[-1]]
                     s = Street(None, street2_segment[2])
+                    s.tags = street_pair[1].tags
                     self.add_way(s)
 
             self.add_way(merged_street)
@@ -769,8 +925,9 @@ class OSM(Network):
                             merged_street.add_node(n)
                             break
                 self.remove_way(street_id)
+            pairs_merged += 1
         #print self.export()
-        return
+        return pairs_merged
 
     def simplify(self, way_id, threshold=0.5):
         """
@@ -861,11 +1018,13 @@ class OSM(Network):
                         if idx != 0 and idx != len(way.nids):
                             new_nids = way.nids[prev_idx:idx + 1]
                             new_way = Street(None, new_nids, way.type)
+                            new_way.tags = way.tags
                             # new_streets.add(new_way)
                             self.add_way(new_way)
                             prev_idx = idx
                     new_nids = way.nids[prev_idx:]
                     new_way = Street(None, new_nids, way.type)
+                    new_way.tags = way.tags
                     # new_streets.add(new_way)
                     self.add_way(new_way)
                     self.remove_way(way.id)
@@ -884,52 +1043,214 @@ class OSM(Network):
                 self.nodes.get(nid).append_way(street.id)
 
 
-def parse(filename):
+def encode_way_feature(way_id, way_type, user, tags, coordinates):
+    """
+    Encode the GeoJSON feature of a way as a JSON string (see OSM.encode_feature)
+    :param tags: The OSM tags of the way as a flat (key, value, ...) tuple
+    :param coordinates: A list of [lng, lat]
+    """
+    # Mapbox GeoJson format
+    # https://github.com/mapbox/simplestyle-spec/tree/master/1.1.0
+    feature = {}
+    feature['properties'] = dict(zip(tags[::2], tags[1::2]))
+    feature['properties'].update({
+        'type': way_type,
+        'id': way_id,
+        'user': user,
+        'stroke': '#555555'
+    })
+    feature['type'] = 'Feature'
+    feature['id'] = 'way/%s' % way_id
+    feature['geometry'] = {
+        'type': 'LineString',
+        'coordinates': coordinates
+    }
+    return json.dumps(feature)
+
+
+def parse(filename, tag_keys=TAG_KEYS, area=None, margin=0.2):
     """
     Parse a OSM file
+    :param filename: The OSM file, which may be compressed with gzip or bzip2
+    :param tag_keys: The tags of the ways to keep (see tags.py)
+    :param area: Only keep the streets that touch an area: a bbox (min lat, min lng, max lat, max lng), a list of
+    (lat, lng) vertices of a polygon, or a Shapely polygon in (lng, lat). See area.py.
+    :param margin: With an area, also keep the nodes within this distance of it (in kilometers)
     """
-    with open(filename, "rb") as osm:
-        # Find element
-        # http://stackoverflow.com/questions/222375/elementtree-xpath-select-element-based-on-attribute
-        tree = ET.parse(osm)
-
-        nodes_tree = tree.findall(".//node")
-        ways_tree = tree.findall(".//way")
-        bounds_elem = tree.find(".//bounds")
-        bounds = [bounds_elem.get("minlat"), bounds_elem.get("minlon"), bounds_elem.get("maxlat"), bounds_elem.get("maxlon")]
-
-    # Parse nodes and ways. Only read the ways that have the tags specified in valid_highways
+    from area import AreaFilter
+    area_filter = AreaFilter(area, margin) if area is not None else None
+
+    # The file is streamed, and every element is dropped from the tree once it is read
+    nodes = []
+    street_list = []
+    bounds = None
+    near = {}
+    # The ids and outcodes of the nodes beyond the margin of the area (see AreaFilter.outcode)
+    far_ids = array("l")
+    far_codes = array("b")
+    far_index = None
+    # The tags are copied out of the elements so that no Street keeps a reference into the parsed tree
+    tag_store = TagStore(tag_keys)
+    with open_input(filename) as osm:
+        context = ET.iterparse(osm, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "start":
+                continue
+            if elem.tag == "node":
+                if area_filter is None:
+                    nodes.append(Node(elem.get("id"), elem.get("lat"), elem.get("lon")))
+                else:
+                    code = area_filter.outcode(float(elem.get("lat")), float(elem.get("lon")))
+                    if code == 0:
+                        node = Node(elem.get("id"), elem.get("lat"), elem.get("lon"))
+                        nodes.append(node)
+                        near[node.id] = node
+                    else:
+                        far_ids.append(int(elem.get("id")))
+                        far_codes.append(code)
+            elif elem.tag == "way":
+                street = _parse_street(elem, tag_store)
+                if street is not None:
+                    if area_filter is not None:
+                        if far_index is None:
+                            far_index = _outcode_index(far_ids, far_codes)
+                        if not _may_touch(street.nids, near, far_index):
+                            continue
+                    street_list.append(street)
+            elif elem.tag == "bounds":
+                bounds = [elem.get("minlat"), elem.get("minlon"), elem.get("maxlat"), elem.get("maxlon")]
+            else:
+                continue
+            root.clear()
+
+    if area_filter is not None:
+        # Read the nodes of the candidate streets that lie beyond the margin, and keep the streets whose whole
+        # geometry touches the area
+        missing = set(nid for street in street_list for nid in street.nids if nid not in near)
+        far = dict((node.id, node) for node in read_nodes(filename, missing)) if missing else {}
+        kept = []
+        for street in street_list:
+            street_nodes = [near.get(nid) or far.get(nid) for nid in street.nids]
+            if not area_filter.touches([node.location() for node in street_nodes if node is not None]):
+                continue
+            kept.append(street)
+            for node in street_nodes:
+                if node is not None and node.id not in near:
+                    nodes.append(node)
+                    near[node.id] = node
+        street_list = kept
+
+    # Parse nodes and ways. Only read the ways that have the tags specified in VALID_HIGHWAYS
     streets = Streets()
     street_nodes = Nodes()
     street_network = OSM(street_nodes, streets, bounds)
-    for node in nodes_tree:
-        mynode = Node(node.get("id"), node.get("lat"), node.get("lon"))
-        street_network.add_node(mynode)
-
-    valid_highways = {'primary', 'secondary', 'tertiary', 'residential'}
-    for way in ways_tree:
-        highway_tag = way.find(".//tag[@k='highway']")
-        oneway_tag = way.find(".//tag[@k='oneway']")
-        ref_tag = way.find(".//tag[@k='ref']")
-        if highway_tag is not None and highway_tag.get("v") in valid_highways:
-            node_elements = filter(lambda elem: elem.tag == "nd", list(way))
-            nids = [node.get("ref") for node in node_elements]
-
-            # Sort the nodes by longitude.
-            if street_nodes.get(nids[0]).lng > street_nodes.get(nids[-1]).lng:
-                nids = nids[::-1]
-
-            street = Street(way.get("id"), nids)
-            if oneway_tag is not None:
-                street.set_oneway_tag('yes')
-            else:
-                street.set_oneway_tag('no')
-            street.set_ref_tag(ref_tag)
-            street_network.add_way(street)
+    for node in nodes:
+        street_network.add_node(node)
+
+    for street in street_list:
+        if area_filter is not None:
+            if any(nid not in near for nid in street.nids):
+                log.warning("Way %s refers to nodes that are not in the file", street.id)
+                street.nids = [nid for nid in street.nids if nid in near]
+            if len(street.nids) < 2:
+                continue
 
+        # Sort the nodes by longitude.
+        if street_nodes.get(street.nids[0]).lng > street_nodes.get(street.nids[-1]).lng:
+            street.nids = street.nids[::-1]
+        street_network.add_way(street)
+
+    if area_filter is not None or bounds is None:
+        # The bounds of a filtered network are the extent of its streets
+        locations = [street_nodes.get(nid).location() for street in streets.get_list() for nid in street.nids]
+        if not locations:
+            locations = [node.location() for node in nodes]
+        if locations:
+            street_network.bounds = [str(min(lat for lat, _ in locations)), str(min(lng for _, lng in locations)),
+                                     str(max(lat for lat, _ in locations)), str(max(lng for _, lng in locations))]
+        elif area_filter is not None:
+            min_lng, min_lat, max_lng, max_lat = area_filter.polygon.bounds
+            street_network.bounds = [str(min_lat), str(min_lng), str(max_lat), str(max_lng)]
+
+    # Files saved by JOSM have negative ids, which the generated nodes and ways must not reuse
+    reserve_ids(nid for nid in street_nodes.nodes if nid[0] == "-")
+    reserve_ids(wid for wid in streets.ways if wid[0] == "-")
     return street_network
 
 
+def _parse_street(way, tag_store):
+    """
+    Read a way element
+    :return: A Street, or None if the way is not one of the VALID_HIGHWAYS
+    """
+    highway_tag = way.find(".//tag[@k='highway']")
+    if highway_tag is None or highway_tag.get("v") not in VALID_HIGHWAYS:
+        return None
+    oneway_tag = way.find(".//tag[@k='oneway']")
+    ref_tag = way.find(".//tag[@k='ref']")
+    nids = [node.get("ref") for node in way if node.tag == "nd"]
+
+    street = Street(way.get("id"), nids)
+    if oneway_tag is not None:
+        street.set_oneway_tag('yes')
+    else:
+        street.set_oneway_tag('no')
+    street.set_ref_tag(tag_store.intern(ref_tag.get("v")) if ref_tag is not None else None)
+    street.tags = tag_store.from_element(way)
+    return street
+
+
+def _outcode_index(ids, codes):
+    """
+    Sort the ids and outcodes of the nodes beyond the margin of an area for _may_touch
+    :return: A tuple of arrays (sorted ids, outcodes)
+    """
+    ids = np.array(ids, dtype=np.int64)
+    codes = np.array(codes, dtype=np.int8)
+    order = np.argsort(ids, kind="mergesort")
+    return ids[order], codes[order]
+
+
+def _may_touch(nids, near, far_index):
+    """
+    Check whether a street may touch an area, from the outcodes of its nodes. The nodes near the area have the
+    outcode 0. Two consecutive nodes beyond the same side of the area have no segment that touches it. The nodes
+    missing from the file are skipped, as they are dropped from the street.
+    :param near: The nodes near the area, by id
+    :param far_index: The sorted ids and outcodes of the other nodes (see _outcode_index)
+    """
+    if any(nid in near for nid in nids):
+        return True
+    ids, codes = far_index
+    if len(nids) < 2 or not len(ids):
+        return False
+    keys = np.array([int(nid) for nid in nids], dtype=np.int64)
+    positions = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+    street_codes = codes[positions[ids[positions] == keys]]
+    return bool(((street_codes[:-1] & street_codes[1:]) == 0).any())
+
+
+def read_nodes(filename, nids):
+    """
+    Read some nodes of an OSM file. The nodes come before the ways in an OSM file, so the scan stops at the first way.
+    :param nids: A set of node ids
+    :return: A generator of Nodes
+    """
+    with open_input(filename) as osm:
+        context = ET.iterparse(osm, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "start":
+                if elem.tag in ("way", "relation"):
+                    break
+                continue
+            if elem.tag == "node":
+                if elem.get("id") in nids:
+                    yield Node(elem.get("id"), elem.get("lat"), elem.get("lon"))
+                root.clear()
+
+
 def parse_intersections(nodes, ways):
     node_list = nodes.get_list()
     intersection_node_ids = [node.id for node in node_list if node.is_intersection()]
@@ -1,4 +1,5 @@
 from latlng import LatLng
+from utilities import new_id
 import json
 import numpy as np
 import math
@@ -9,9 +10,10 @@ class Node(LatLng):
         super(Node, self).__init__(lat, lng)
 
         if nid is None:
-            self.id = str(id(self))
+            self.id = new_id()
         else:
             self.id = str(nid)
+        self.generated = nid is None
 
         self.way_ids = []
         self.sidewalk_nodes = {}
@@ -20,6 +22,25 @@ class Node(LatLng):
         self.parent_nodes = None
         return
 
+    def set_location(self, lat, lng):
+        """
+        Move the node, and discard the cached GeoJSON features of its ways
+        """
+        self.lat = float(lat)
+        self.lng = float(lng)
+        self.invalidate_features()
+
+    def invalidate_features(self):
+        """
+        Discard the cached GeoJSON features of the ways of this node
+        """
+        network = self.parent_nodes.parent_network if self.parent_nodes is not None else None
+        if network is not None:
+            for way_id in self.way_ids:
+                way = network.ways.ways.get(way_id)
+                if way is not None:
+                    way.invalidate_feature()
+
     def __str__(self):
         return "Node object, id: " + str(self.id) + ", latlng: " + str(self.location())
 
@@ -38,14 +59,12 @@ class Node(LatLng):
         return self.parent_nodes
 
     def export(self):
+        """
+        Export the ways of this node as a GeoJSON FeatureCollection, from their cached features
+        """
         if self.parent_nodes and self.parent_nodes.parent_network:
-            geojson = {}
-            geojson['type'] = "FeatureCollection"
-            geojson['features'] = []
-            for way_id in self.way_ids:
-                way = self.parent_nodes.parent_network.ways.get(way_id)
-                geojson['features'].append(way.get_geojson_features())
-            return json.dumps(geojson)
+            network = self.parent_nodes.parent_network
+            return network.export_subset([way_id for way_id in self.way_ids if way_id in network.ways.ways])
 
     def get_way_ids(self):
         return self.way_ids
@@ -116,6 +135,8 @@ class Nodes(object):
         return
 
     def update(self, nid, new_node):
+        if nid in self.nodes:
+            self.nodes[nid].invalidate_features()
         self.nodes[nid] = new_node
         return
 
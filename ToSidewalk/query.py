@@ -0,0 +1,244 @@
+"""
+Spatial queries over a built sidewalk network.
+
+SidewalkQuery indexes the segments and the nodes of a network once, so that repeated lookups do not scan every way:
+
+    query = SidewalkQuery.from_network(sidewalk_network)
+    query.ways_in_bbox((47.65, -122.32, 47.66, -122.31))
+    query.nodes_within(47.655, -122.315, 0.02)
+    query.crosswalks_near(street_node, 0.03)
+    way_ids, segments, points, distances = query.snap(lats, lngs)
+
+Boxes follow the convention of network bounds, (min lat, min lng, max lat, max lng). Distances are in kilometers,
+like LatLng.distance_to. The index can be saved next to the exported network and loaded without the network.
+"""
+import numpy as np
+
+from arrays import NetworkArrays, KM_PER_DEGREE, haversine, project_to_segments
+from index import GridIndex
+
+
+def _radius_box(lat, lng, radius):
+    """
+    Return an index box (min lng, min lat, max lng, max lat) around a point that contains the circle of the given
+    radius in kilometers
+    """
+    dlat = radius / KM_PER_DEGREE
+    dlng = dlat / max(np.cos(np.radians(lat)), 1e-6)
+    return lng - dlng, lat - dlat, lng + dlng, lat + dlat
+
+
+def _segments_in_box(start, end, bbox):
+    """
+    Vectorized Liang-Barsky test of whether segments intersect an index box (min lng, min lat, max lng, max lat)
+    :param start: A (n, 2) array of the (lat, lng) of the segment starts
+    :param end: A (n, 2) array of the (lat, lng) of the segment ends
+    """
+    min_x, min_y, max_x, max_y = bbox
+    x0, y0 = start[:, 1], start[:, 0]
+    dx, dy = end[:, 1] - x0, end[:, 0] - y0
+    t0 = np.zeros(len(start))
+    t1 = np.ones(len(start))
+    inside = np.ones(len(start), dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for p, q in ((-dx, x0 - min_x), (dx, max_x - x0), (-dy, y0 - min_y), (dy, max_y - y0)):
+            parallel = p == 0
+            inside &= ~(parallel & (q < 0))
+            t = q / p
+            t0 = np.where(~parallel & (p < 0), np.maximum(t0, t), t0)
+            t1 = np.where(~parallel & (p > 0), np.minimum(t1, t), t1)
+    return inside & (t0 <= t1)
+
+
+class SidewalkQuery(object):
+    def __init__(self, arrays, segment_index=None, node_index=None):
+        """
+        :param arrays: The NetworkArrays of the network
+        :param segment_index: A GridIndex over the segments of the ways (built if not given)
+        :param node_index: A GridIndex over the nodes (built if not given)
+        """
+        self.arrays = arrays
+        self.segment_start, self.segment_end, self.segment_way, self.segment_position = arrays.segments()
+        start = arrays.coordinates[self.segment_start]
+        end = arrays.coordinates[self.segment_end]
+        if segment_index is None:
+            segment_index = GridIndex(np.column_stack((np.minimum(start[:, 1], end[:, 1]),
+                                                       np.minimum(start[:, 0], end[:, 0]),
+                                                       np.maximum(start[:, 1], end[:, 1]),
+                                                       np.maximum(start[:, 0], end[:, 0]))))
+        if node_index is None:
+            lng_lat = arrays.coordinates[:, ::-1]
+            node_index = GridIndex(np.hstack((lng_lat, lng_lat)))
+        self.segment_index = segment_index
+        self.node_index = node_index
+        # Segment starts and directions, (lat, lng, dlat, dlng), for snapping
+        self._segment_coordinates = np.hstack((start, end - start))
+
+    @classmethod
+    def from_network(cls, network):
+        return cls(NetworkArrays.from_network(network))
+
+    def save(self, filename):
+        """
+        Save the network arrays and the indices to an .npz file
+        """
+        arrays = self.arrays.arrays()
+        arrays.update(self.segment_index.arrays("segment_"))
+        arrays.update(self.node_index.arrays("node_"))
+        np.savez(filename, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a query object saved with save()
+        """
+        arrays = np.load(filename)
+        try:
+            return cls(NetworkArrays.from_arrays(arrays), GridIndex.from_arrays(arrays, "segment_"),
+                       GridIndex.from_arrays(arrays, "node_"))
+        finally:
+            arrays.close()
+
+    def _way_ids(self, way_indices):
+        return self.arrays.way_ids[np.unique(way_indices)].tolist()
+
+    def ways_in_bbox(self, bbox):
+        """
+        Return the ids of the ways that intersect a box
+        :param bbox: (min lat, min lng, max lat, max lng)
+        """
+        min_lat, min_lng, max_lat, max_lng = [float(value) for value in bbox]
+        box = (min_lng, min_lat, max_lng, max_lat)
+        segments = self.segment_index.query(box)
+        start = self.arrays.coordinates[self.segment_start[segments]]
+        end = self.arrays.coordinates[self.segment_end[segments]]
+        return self._way_ids(self.segment_way[segments[_segments_in_box(start, end, box)]])
+
+    def ways_in_polygon(self, polygon):
+        """
+        Return the ids of the ways that intersect a polygon
+        :param polygon: A list of (lat, lng) vertices, or a Shapely polygon in (lng, lat)
+        """
+        from shapely.geometry import LineString, Polygon
+        from shapely.prepared import prep
+
+        if not hasattr(polygon, "bounds"):
+            polygon = Polygon([(lng, lat) for lat, lng in polygon])
+        min_lng, min_lat, max_lng, max_lat = polygon.bounds
+        candidates = np.unique(self.segment_way[self.segment_index.query((min_lng, min_lat, max_lng, max_lat))])
+        prepared = prep(polygon)
+        ways = []
+        for i in candidates:
+            coordinates = self.arrays.coordinates[self.arrays.way_nodes(i)][:, ::-1]
+            if len(coordinates) > 1 and prepared.intersects(LineString(coordinates)):
+                ways.append(i)
+        return self._way_ids(np.array(ways, dtype=np.int64))
+
+    def nodes_within(self, lat, lng, radius):
+        """
+        Return the ids of the nodes within a radius of a point, nearest first
+        :param radius: Radius in kilometers
+        """
+        nodes = self.node_index.query(_radius_box(lat, lng, radius))
+        coordinates = self.arrays.coordinates[nodes]
+        distances = haversine(lat, lng, coordinates[:, 0], coordinates[:, 1])
+        within = distances <= radius
+        order = np.argsort(distances[within], kind="mergesort")
+        return self.arrays.node_ids[nodes[within][order]].tolist()
+
+    def crosswalks_near(self, intersection, radius=0.03):
+        """
+        Return the ids of the crosswalks that pass within a radius of an intersection
+        :param intersection: A Node (or any object with lat and lng), or a (lat, lng) tuple
+        :param radius: Radius in kilometers
+        """
+        if hasattr(intersection, "lat"):
+            lat, lng = intersection.lat, intersection.lng
+        else:
+            lat, lng = intersection
+        segments = self.segment_index.query(_radius_box(lat, lng, radius))
+        segments = segments[self.arrays.way_types[self.segment_way[segments]] == "crosswalk"]
+        start = self.arrays.coordinates[self.segment_start[segments]]
+        end = self.arrays.coordinates[self.segment_end[segments]]
+        _, _, distances = project_to_segments(lat, lng, start, end)
+        return self._way_ids(self.segment_way[segments[distances <= radius]])
+
+    def snap(self, lat, lng, max_distance=None, chunk_size=65536):
+        """
+        Snap points to their nearest way. The points are processed in chunks, each with vectorized projections on
+        the segments in the grid cells around the points; the neighborhood of a point grows only while a nearer
+        segment could lie outside of it.
+        :param lat: An array of latitudes
+        :param lng: An array of longitudes
+        :param max_distance: Points farther than this from every way (in kilometers) are not snapped
+        :param chunk_size: Number of points projected at once
+        :return: A tuple of arrays (way ids, index of the segment in the way, (n, 2) projected (lat, lng) points,
+        distances in kilometers). Points that are not snapped have an empty way id, a segment index of -1, a NaN
+        projected point and an infinite distance.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        n = len(lat)
+        best_segment = np.full(n, -1, dtype=np.int64)
+        best_distance = np.full(n, np.inf)
+        projected = np.full((n, 2), np.nan)
+        if len(self.segment_way) > 0:
+            for start in range(0, n, chunk_size):
+                self._snap_chunk(lat, lng, np.arange(start, min(start + chunk_size, n)), max_distance,
+                                 best_segment, best_distance, projected)
+
+        snapped = best_segment >= 0
+        way_ids = np.zeros(n, dtype=self.arrays.way_ids.dtype)
+        way_ids[snapped] = self.arrays.way_ids[self.segment_way[best_segment[snapped]]]
+        segments = np.full(n, -1, dtype=np.int64)
+        segments[snapped] = self.segment_position[best_segment[snapped]]
+        return way_ids, segments, projected, best_distance
+
+    def _snap_chunk(self, lat, lng, points, max_distance, best_segment, best_distance, projected):
+        k = 1
+        max_k = max(self.segment_index.shape)
+        while len(points):
+            x_scale = KM_PER_DEGREE * np.cos(np.radians(lat[points]))
+            pairs, segments, bounds = self.segment_index.neighborhood(lng[points], lat[points], k, x_scale,
+                                                                      KM_PER_DEGREE)
+            # Planar projection in kilometers around each point
+            s = self._segment_coordinates[segments]
+            scale = x_scale[pairs]
+            ax = (s[:, 1] - lng[points][pairs]) * scale
+            ay = (s[:, 0] - lat[points][pairs]) * KM_PER_DEGREE
+            dx = s[:, 3] * scale
+            dy = s[:, 2] * KM_PER_DEGREE
+            length2 = dx * dx + dy * dy
+            with np.errstate(invalid="ignore", divide="ignore"):
+                t = -(ax * dx + ay * dy) / length2
+            t[~(t > 0)] = 0.
+            t[t > 1] = 1.
+            ax += t * dx
+            ay += t * dy
+            distances = ax * ax + ay * ay
+            np.sqrt(distances, out=distances)
+
+            # The pairs are grouped by point: take the first pair at the minimum distance of each point
+            nearest = np.full(len(points), np.inf)
+            if len(pairs):
+                group_starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]])
+                nearest[pairs[group_starts]] = np.minimum.reduceat(distances, group_starts)
+            at_minimum = np.flatnonzero(distances == nearest[pairs])
+            first = at_minimum[np.r_[True, pairs[at_minimum[1:]] != pairs[at_minimum[:-1]]]] if len(at_minimum) \
+                else at_minimum
+            if max_distance is not None:
+                nearest[nearest > max_distance] = np.inf
+
+            done = (nearest <= bounds) | np.isinf(bounds) | (k >= max_k)
+            if max_distance is not None:
+                done |= bounds >= max_distance
+            found = pairs[first]
+            keep = done[found] & ~np.isinf(nearest[found])
+            first = first[keep]
+            resolved = points[found[keep]]
+            best_segment[resolved] = segments[first]
+            projected[resolved] = s[first, :2] + t[first, None] * s[first, 2:]
+            best_distance[resolved] = haversine(lat[resolved], lng[resolved], projected[resolved, 0],
+                                                projected[resolved, 1])
+            points = points[~done]
+            k *= 2
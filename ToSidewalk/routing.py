@@ -0,0 +1,237 @@
+"""
+Pedestrian routing over a sidewalk network.
+
+PedestrianGraph compiles the sidewalks and crosswalks of a network into a CSR adjacency with geodesic edge lengths
+(in kilometers). The graph is compiled once and then answers any number of queries:
+
+    graph = PedestrianGraph.from_network(sidewalk_network)
+    distance, path = graph.shortest_path(source_id, target_id)
+    distances = graph.shortest_paths(source_id, target_ids, crosswalk_penalty=1.5)
+
+Crosswalk edges can be made costlier with a penalty factor that multiplies their length. The search runs on plain
+Python lists rather than NumPy scalars, which are slow to index one at a time.
+
+The compiled graph can be saved as plain .npy arrays (node coordinates, CSR indptr and indices, edge lengths, edge
+ways and way ids and types) that analytics code can memory-map with np.load(mmap_mode="r"), with no parsing and
+shared between processes through the page cache.
+"""
+import math
+import os
+from heapq import heappush, heappop
+
+import numpy as np
+
+from arrays import NetworkArrays, EARTH_RADIUS, haversine
+
+
+class PedestrianGraph(object):
+    # The arrays written by save(), one .npy file each
+    ARRAYS = ("node_ids", "coordinates", "indptr", "indices", "lengths", "edge_ways", "way_ids", "way_types")
+
+    def __init__(self, node_ids, coordinates, indptr, indices, lengths, edge_ways, way_ids, way_types):
+        """
+        :param node_ids: An array of node ids
+        :param coordinates: A (number of nodes, 2) array of (lat, lng)
+        :param indptr: CSR offsets: the edges from node i are indptr[i]:indptr[i + 1]
+        :param indices: The target node of each edge
+        :param lengths: The length of each edge in kilometers
+        :param edge_ways: The index in way_ids of the way of each edge
+        :param way_ids: An array of way ids
+        :param way_types: An array of way types
+        """
+        self.node_ids = node_ids
+        self.coordinates = coordinates
+        self.indptr = indptr
+        self.indices = indices
+        self.lengths = lengths
+        self.edge_ways = edge_ways
+        self.way_ids = way_ids
+        self.way_types = way_types
+        self.crosswalk = np.asarray(way_types)[edge_ways] == "crosswalk"
+
+        self._indptr = np.asarray(indptr).tolist()
+        self._indices = np.asarray(indices).tolist()
+        self._lat = np.radians(coordinates[:, 0]).tolist()
+        self._lng = np.radians(coordinates[:, 1]).tolist()
+        self._weights = {}
+        self._node_positions = None
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Compile the graph of a network
+        :param arrays: The NetworkArrays of a sidewalk network
+        """
+        start, end, way, _ = arrays.segments()
+        lengths = haversine(arrays.coordinates[start, 0], arrays.coordinates[start, 1],
+                            arrays.coordinates[end, 0], arrays.coordinates[end, 1])
+
+        # Both directions of each segment, sorted by source node
+        sources = np.concatenate((start, end))
+        order = np.argsort(sources, kind="mergesort")
+        indptr = np.zeros(len(arrays.node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(arrays.node_ids)), out=indptr[1:])
+        return cls(arrays.node_ids, arrays.coordinates, indptr, np.concatenate((end, start))[order],
+                   np.concatenate((lengths, lengths))[order], np.concatenate((way, way))[order], arrays.way_ids,
+                   arrays.way_types)
+
+    @classmethod
+    def from_network(cls, network):
+        return cls.from_arrays(NetworkArrays.from_network(network))
+
+    def save(self, path):
+        """
+        Save the graph as NumPy arrays, which other processes can memory-map without parsing
+        :param path: A directory for one .npy file per array, or a file name ending with .npz for a single
+        uncompressed archive
+        """
+        arrays = dict((name, np.asarray(getattr(self, name))) for name in self.ARRAYS)
+        if path.endswith(".npz"):
+            np.savez(path, **arrays)
+            return
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + ".npy"), array)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Load a graph saved with save()
+        :param path: A directory of .npy files or an .npz file
+        :param mmap_mode: Memory-map the .npy files with this mode (None to read them into memory). The arrays of an
+        .npz archive are always read into memory.
+        """
+        if path.endswith(".npz"):
+            archive = np.load(path)
+            try:
+                return cls(*[archive[name] for name in cls.ARRAYS])
+            finally:
+                archive.close()
+        return cls(*[np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS])
+
+    def node_position(self, nid):
+        """
+        Return the index of a node id
+        """
+        if self._node_positions is None:
+            self._node_positions = dict((nid, i) for i, nid in enumerate(np.asarray(self.node_ids).tolist()))
+        return self._node_positions[nid]
+
+    def weights(self, crosswalk_penalty=1.):
+        """
+        Return the edge weights for a crosswalk penalty as a list (cached)
+        :param crosswalk_penalty: Factor applied to the length of crosswalk edges
+        """
+        crosswalk_penalty = float(crosswalk_penalty)
+        if crosswalk_penalty not in self._weights:
+            self._weights[crosswalk_penalty] = np.where(self.crosswalk, self.lengths * crosswalk_penalty,
+                                                        self.lengths).tolist()
+        return self._weights[crosswalk_penalty]
+
+    def _position(self, node):
+        if hasattr(node, "id"):
+            node = node.id
+        return self.node_position(node)
+
+    def _distance(self, u, v):
+        """
+        Great circle distance between two nodes, from the cached coordinates in radians
+        """
+        lat1, lat2 = self._lat[u], self._lat[v]
+        a = math.sin((lat2 - lat1) / 2) ** 2 + \
+            math.cos(lat1) * math.cos(lat2) * math.sin((self._lng[v] - self._lng[u]) / 2) ** 2
+        return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.)))
+
+    def shortest_path(self, source, target, crosswalk_penalty=1., heuristic=True):
+        """
+        Find the shortest path between two nodes with A* and a great circle distance heuristic
+        :param source: A node id or a Node
+        :param target: A node id or a Node
+        :param crosswalk_penalty: Factor applied to the length of crosswalks
+        :param heuristic: Use A*. If False, run Dijkstra's algorithm.
+        :return: A tuple (distance in kilometers, list of node ids), or (inf, []) if target cannot be reached
+        """
+        s, t = self._position(source), self._position(target)
+        weights = self.weights(crosswalk_penalty)
+        indptr, indices = self._indptr, self._indices
+        # The heuristic must not overestimate: crosswalks may be cheaper than their length
+        scale = min(1., float(crosswalk_penalty)) if heuristic else 0.
+
+        distances = {s: 0.}
+        previous = {s: -1}
+        settled = set()
+        heap = [(scale * self._distance(s, t), s)]
+        while heap:
+            _, u = heappop(heap)
+            if u in settled:
+                continue
+            if u == t:
+                path = []
+                while u != -1:
+                    path.append(u)
+                    u = previous[u]
+                return distances[t], np.asarray(self.node_ids)[path[::-1]].tolist()
+            settled.add(u)
+            d = distances[u]
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                dv = d + weights[e]
+                if v not in distances or dv < distances[v]:
+                    distances[v] = dv
+                    previous[v] = u
+                    heappush(heap, (dv + scale * self._distance(v, t) if scale else dv, v))
+        return float("inf"), []
+
+    def shortest_paths(self, source, targets=None, crosswalk_penalty=1., cutoff=None):
+        """
+        Find the shortest path distances from one node to many with Dijkstra's algorithm. The search stops as soon as
+        all the targets are settled.
+        :param source: A node id or a Node
+        :param targets: A list of node ids or Nodes. If None, the distances to all the nodes are returned.
+        :param crosswalk_penalty: Factor applied to the length of crosswalks
+        :param cutoff: Do not search farther than this distance (in kilometers)
+        :return: An array of distances aligned with targets (or with the nodes of the graph), inf where unreachable
+        """
+        s = self._position(source)
+        weights = self.weights(crosswalk_penalty)
+        indptr, indices = self._indptr, self._indices
+        if targets is None:
+            remaining = None
+        else:
+            target_positions = [self._position(target) for target in targets]
+            remaining = set(target_positions)
+
+        distances = {s: 0.}
+        settled = {}
+        heap = [(0., s)]
+        while heap:
+            d, u = heappop(heap)
+            if u in settled:
+                continue
+            if cutoff is not None and d > cutoff:
+                break
+            settled[u] = d
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                dv = d + weights[e]
+                if v not in distances or dv < distances[v]:
+                    distances[v] = dv
+                    heappush(heap, (dv, v))
+
+        if targets is None:
+            result = np.full(len(self.node_ids), np.inf)
+            result[list(settled.keys())] = list(settled.values())
+            return result
+        return np.array([settled.get(t, np.inf) for t in target_positions])
+
+    def distance_matrix(self, sources, targets, crosswalk_penalty=1., cutoff=None):
+        """
+        Find the shortest path distances between every source and every target
+        :return: A (number of sources, number of targets) array of distances in kilometers
+        """
+        return np.array([self.shortest_paths(source, targets, crosswalk_penalty, cutoff) for source in sources])
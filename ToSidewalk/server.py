@@ -0,0 +1,315 @@
+"""
+An HTTP service that generates sidewalks on demand for a bounding box, e.g. for the viewport of an editor:
+
+    python -m ToSidewalk.server input.osm --port 8080 --processes 4
+    curl "http://localhost:8080/sidewalks?bbox=38.90,-77.01,38.91,-77.00"
+
+The bbox is (min lat, min lng, max lat, max lng), like the bounds of a network. The street network is parsed and
+preprocessed once at startup and kept in memory. A request is snapped outward to the Web Mercator tiles that cover
+it, the streets that touch the snapped box are copied into a small network, and make_sidewalks and make_crosswalks
+run on it in a process pool. The GeoJSON responses are kept in an LRU cache keyed by the snapped tile range, so the
+repeated requests of a viewport that moves a little are served from the cache, and concurrent requests for the same
+tiles share a single computation.
+
+Each request is handled in its own thread. The threads only extract the sub-networks and wait for the pool, so a
+long request does not hold up the others.
+"""
+import copy
+import json
+import logging as log
+import math
+import multiprocessing
+import sys
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from collections import OrderedDict
+from SocketServer import ThreadingMixIn
+from urlparse import urlparse, parse_qs
+
+from mvt import tile_range
+from network import OSM
+from nodes import Node, Nodes
+from ways import Streets
+
+
+def tile_bbox(zoom, min_x, min_y, max_x, max_y):
+    """
+    Return the bbox (min lat, min lng, max lat, max lng) of a range of Web Mercator tiles
+    """
+    n = 2. ** zoom
+
+    def lat(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat(max_y + 1), min_x / n * 360. - 180., lat(min_y), (max_x + 1) / n * 360. - 180.
+
+
+def subnetwork(network, way_ids, bounds):
+    """
+    Copy some ways of a street network and their nodes into a new network
+    :param network: A street network
+    :param way_ids: The ids of the ways to copy
+    :param bounds: The bounds of the new network
+    :return: An OSM network that shares no objects with network, so that the pipeline can modify it
+    """
+    streets = Streets()
+    nodes = Nodes()
+    sub = OSM(nodes, streets, [str(value) for value in bounds])
+    for way_id in way_ids:
+        way = network.ways.get(way_id)
+        for nid in way.nids:
+            if nodes.get(nid) is None:
+                node = network.nodes.get(nid)
+                sub.add_node(Node(node.id, node.lat, node.lng))
+        street = copy.copy(way)
+        street.nids = list(way.nids)
+        street.sidewalk_ids = []
+        sub.add_way(street)
+    sub.parse_intersections()
+    return sub
+
+
+def generate(street_network, crosswalks=True):
+    """
+    Run make_sidewalks (and make_crosswalks) on a street network in a worker process
+    :return: The sidewalk network as GeoJSON
+    """
+    from ToSidewalk import make_sidewalks, make_crosswalks
+    sidewalk_network = make_sidewalks(street_network)
+    if crosswalks:
+        make_crosswalks(street_network, sidewalk_network)
+    return sidewalk_network.export(format="geojson")
+
+
+class LRUCache(object):
+    def __init__(self, size):
+        """
+        :param size: The maximum number of entries
+        """
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SidewalkService(object):
+    def __init__(self, street_network, processes=None, cache_size=256, zoom=16, max_tiles=64):
+        """
+        :param street_network: A preprocessed street network
+        :param processes: Size of the process pool (default: number of CPUs)
+        :param cache_size: Number of responses kept in the cache
+        :param zoom: The zoom level of the tiles that requests are snapped to
+        :param max_tiles: Reject the requests that cover more tiles than this
+        """
+        from query import SidewalkQuery
+        self.street_network = street_network
+        self.query = SidewalkQuery.from_network(street_network)
+        self.zoom = zoom
+        self.max_tiles = max_tiles
+        self.cache = LRUCache(cache_size)
+        self.pool = multiprocessing.Pool(processes)
+        # Computations in progress, so that concurrent requests for the same tiles wait for one result
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, filename, **kwargs):
+        from network import parse
+        street_network = parse(filename)
+        street_network.preprocess()
+        street_network.parse_intersections()
+        return cls(street_network, **kwargs)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def snap(self, bbox):
+        """
+        Snap a bbox outward to the tiles that cover it
+        :return: The cache key (zoom, min x, min y, max x, max y)
+        """
+        min_lat, min_lng, max_lat, max_lng = bbox
+        if not (min_lat <= max_lat and min_lng <= max_lng):
+            raise ValueError("Invalid bbox %s" % (bbox,))
+        min_x, min_y, max_x, max_y = tile_range(bbox, self.zoom)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > self.max_tiles:
+            raise ValueError("The bbox covers more than %d tiles at zoom %d" % (self.max_tiles, self.zoom))
+        return self.zoom, min_x, min_y, max_x, max_y
+
+    def sidewalks(self, bbox, crosswalks=True):
+        """
+        Return the sidewalks of the tiles that cover a bbox
+        :param bbox: (min lat, min lng, max lat, max lng)
+        :param crosswalks: Include the crosswalks
+        :return: A GeoJSON string
+        """
+        key = self.snap(bbox) + (bool(crosswalks),)
+        geojson = self.cache.get(key)
+        if geojson is not None:
+            return geojson
+
+        with self._lock:
+            result = self._pending.get(key)
+            owner = result is None
+            if owner:
+                result = self._pending[key] = _PendingResult()
+        if not owner:
+            return result.wait()
+
+        try:
+            snapped = tile_bbox(*key[:5])
+            way_ids = self.query.ways_in_bbox(snapped)
+            if way_ids:
+                sub = subnetwork(self.street_network, way_ids, snapped)
+                geojson = self.pool.apply_async(generate, (sub, crosswalks)).get()
+            else:
+                geojson = json.dumps({"type": "FeatureCollection", "features": []})
+            self.cache.put(key, geojson)
+            result.set(geojson)
+            return geojson
+        except Exception as e:
+            result.set_error(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def status(self):
+        return {
+            "ways": len(self.street_network.ways.ways),
+            "zoom": self.zoom,
+            "cached": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses
+        }
+
+
+class _PendingResult(object):
+    def __init__(self):
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+
+    def set(self, value):
+        self._value = value
+        self._event.set()
+
+    def set_error(self, error):
+        self._error = error
+        self._event.set()
+
+    def wait(self):
+        # Event.wait() without a timeout cannot be interrupted in Python 2
+        while not self._event.wait(1.):
+            pass
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class SidewalkRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/status":
+            self._send(200, json.dumps(self.server.service.status()))
+        elif url.path == "/sidewalks":
+            params = parse_qs(url.query)
+            try:
+                bbox = [float(value) for value in params["bbox"][0].split(",")]
+                if len(bbox) != 4:
+                    raise ValueError("bbox must have four values")
+                crosswalks = params.get("crosswalks", ["1"])[0] not in ("0", "false", "no")
+                key = self.server.service.snap(bbox)
+            except (KeyError, ValueError) as e:
+                self._send(400, json.dumps({"error": "Expected bbox=min_lat,min_lng,max_lat,max_lng (%s)" % e}))
+                return
+            try:
+                geojson = self.server.service.sidewalks(bbox, crosswalks)
+            except Exception as e:
+                log.exception("Request for tiles %s failed", key)
+                self._send(500, json.dumps({"error": "%s: %s" % (type(e).__name__, e)}))
+                return
+            self._send(200, geojson)
+        else:
+            self._send(404, json.dumps({"error": "Not found"}))
+
+    def _send(self, code, body):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.info("%s %s", self.address_string(), format % args)
+
+
+class SidewalkServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        """
+        :param address: A (host, port) tuple
+        :param service: A SidewalkService
+        """
+        HTTPServer.__init__(self, address, SidewalkRequestHandler)
+        self.service = service
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="tosidewalk-server",
+                                     description="Serve the sidewalks of a bounding box over HTTP")
+    parser.add_argument("input", help="Input OSM file")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: %(default)s)")
+    parser.add_argument("-p", "--port", type=int, default=8080, help="Port to listen on (default: %(default)s)")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--cache-size", type=int, default=256, help="Number of responses to cache")
+    parser.add_argument("--zoom", type=int, default=16, help="Zoom level of the tiles requests are snapped to")
+    parser.add_argument("--max-tiles", type=int, default=64, help="Largest number of tiles in a request")
+    args = parser.parse_args(argv)
+    log.basicConfig(format="%(levelname)s: %(message)s", level=log.INFO)
+
+    try:
+        service = SidewalkService.from_file(args.input, processes=args.processes, cache_size=args.cache_size,
+                                            zoom=args.zoom, max_tiles=args.max_tiles)
+    except IOError as e:
+        log.error(e)
+        return 1
+    server = SidewalkServer((args.host, args.port), service)
+    log.info("Serving %d streets on http://%s:%d/sidewalks", len(service.street_network.ways.ways), args.host,
+             args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
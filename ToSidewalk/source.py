@@ -0,0 +1,135 @@
+"""
+Build a street network directly from the street table in PostGIS (see WaysTable in db/db.py) instead of an OSM file.
+
+Only the ways that intersect a bounding box are read. The rows are streamed from a server-side cursor in batches,
+and nodes shared between ways (identical coordinates) are merged as the rows come in.
+
+Example:
+    db = DB()
+    street_network = stream_bbox(db.engine, [38.89, -76.99, 38.90, -76.97])
+    street_network.preprocess()
+"""
+import struct
+
+from network import OSM, VALID_HIGHWAYS
+from nodes import Node, Nodes
+from ways import Street, Streets
+from utilities import reserve_ids
+
+WKB_LINESTRING = 2
+
+
+def linestring_from_wkb(wkb):
+    """
+    Decode a WKB (or EWKB) LineString into a list of (lng, lat) tuples
+    :param wkb: WKB bytes
+    """
+    wkb = bytes(wkb)
+    byte_order = "<" if ord(wkb[0:1]) == 1 else ">"
+    geometry_type, = struct.unpack_from(byte_order + "I", wkb, 1)
+    offset = 5
+    if geometry_type & 0x20000000:
+        # EWKB with an SRID
+        offset += 4
+    if geometry_type & 0xffff != WKB_LINESTRING:
+        raise ValueError("Expected a LineString, got WKB geometry type %d" % (geometry_type & 0xffff))
+    count, = struct.unpack_from(byte_order + "I", wkb, offset)
+    values = struct.unpack_from(byte_order + "%dd" % (2 * count), wkb, offset + 4)
+    return zip(values[0::2], values[1::2])
+
+
+def build_network(rows, bounds, highway_types=VALID_HIGHWAYS):
+    """
+    Build a street network from (way id, highway type, WKB LineString) or (way id, highway type, WKB LineString,
+    oneway tag) rows
+    :param rows: An iterable of rows. It is consumed once. Like parse(), a street is oneway if it has a oneway tag
+    (not NULL or empty), whatever its value.
+    :param bounds: The bounds of the network (min lat, min lng, max lat, max lng)
+    :param highway_types: Highway types to keep. None keeps every row.
+    :return: An OSM street network
+    """
+    streets = Streets()
+    street_nodes = Nodes()
+    street_network = OSM(street_nodes, streets, list(bounds))
+
+    # Nodes that were already read, keyed by their coordinates. New nodes get generated (negative) ids like unsaved
+    # OSM nodes.
+    node_ids = {}
+    for row in rows:
+        way_id, highway_type, wkb = row[:3]
+        if highway_types is not None and highway_type not in highway_types:
+            continue
+        coordinates = linestring_from_wkb(wkb)
+        if len(coordinates) < 2:
+            continue
+
+        nids = []
+        for lng, lat in coordinates:
+            nid = node_ids.get((lng, lat))
+            if nid is None:
+                node = Node(None, lat, lng)
+                nid = node_ids[(lng, lat)] = node.id
+                street_network.add_node(node)
+            if not nids or nids[-1] != nid:
+                nids.append(nid)
+
+        # Sort the nodes by longitude like parse() does.
+        if street_nodes.get(nids[0]).lng > street_nodes.get(nids[-1]).lng:
+            nids = nids[::-1]
+
+        way_id = str(way_id)
+        if way_id.startswith("way/"):
+            way_id = way_id[4:]
+        street = Street(way_id, nids, highway_type)
+        street.set_oneway_tag("yes" if len(row) > 3 and row[3] else "no")
+        street_network.add_way(street)
+    # The table may hold negative way ids, e.g. of ways drawn in JOSM
+    reserve_ids(street_network.ways.ways)
+    return street_network
+
+
+def fetch_bbox(connection, bbox, table="ogrgeojson", id_column="id", type_column="type",
+               geometry_column="wkb_geometry", oneway_column=None, srid=4326, batch_size=5000):
+    """
+    Stream the (id, type, WKB) rows of the ways that intersect a bounding box from a server-side cursor
+    :param connection: A DB-API (psycopg2) connection
+    :param bbox: The bounding box (min lat, min lng, max lat, max lng)
+    :param oneway_column: The column of the oneway tag, if the table has one. Its value is added to the rows.
+    :param batch_size: Number of rows fetched per round trip
+    """
+    min_lat, min_lng, max_lat, max_lng = [float(value) for value in bbox]
+    cursor = connection.cursor(name="tosidewalk_bbox")
+    cursor.itersize = batch_size
+    try:
+        columns = "%s, %s, ST_AsBinary(%s)" % (id_column, type_column, geometry_column)
+        if oneway_column is not None:
+            columns += ", " + oneway_column
+        cursor.execute("SELECT %s FROM %s WHERE %s && ST_MakeEnvelope(%%s, %%s, %%s, %%s, %%s)"
+                       % (columns, table, geometry_column),
+                       (min_lng, min_lat, max_lng, max_lat, srid))
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield row
+    finally:
+        cursor.close()
+
+
+def stream_bbox(engine, bbox, highway_types=VALID_HIGHWAYS, **kwargs):
+    """
+    Build a street network from the ways in PostGIS that intersect a bounding box
+    :param engine: A SQLAlchemy engine (e.g., DB().engine)
+    :param bbox: The bounding box (min lat, min lng, max lat, max lng). It becomes the bounds of the network.
+    :param highway_types: Highway types to keep. None keeps every way.
+    :param kwargs: Passed to fetch_bbox() (table and column names, oneway_column, batch_size)
+    :return: An OSM street network
+    """
+    connection = engine.raw_connection()
+    try:
+        street_network = build_network(fetch_bbox(connection, bbox, **kwargs), bbox, highway_types)
+        connection.commit()
+    finally:
+        connection.close()
+    return street_network
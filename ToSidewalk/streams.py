@@ -0,0 +1,252 @@
+"""
+Input and output streams that move decompression, compression and disk I/O to background threads.
+
+open_input() opens a plain, gzip or bzip2 OSM file (the compression is detected from the first bytes). A compressed
+file is decompressed by a background thread that feeds the parser through a bounded queue of blocks, so decompression
+overlaps parsing instead of running before it, and no decompressed copy is written to disk:
+
+    with open_input("district-of-columbia.osm.bz2") as f:
+        tree = ET.parse(f)
+
+open_output() returns a writer whose compression (for file names ending with .gz or .bz2) and disk writes run in a
+background thread while the caller keeps encoding:
+
+    with open_output("sidewalks.geojson.gz") as f:
+        for chunk in network.iter_geojson():
+            f.write(chunk)
+
+zlib, bz2 and file I/O release the GIL, so the threads run in parallel with the Python code of the pipeline.
+"""
+import bz2
+import gzip
+import sys
+import threading
+from Queue import Queue, Full
+
+BLOCK_SIZE = 1 << 20
+QUEUE_SIZE = 16
+# BackgroundWriter gathers small writes into chunks of this size before handing them to its thread
+WRITE_SIZE = 1 << 16
+# Magic numbers of the compressed formats
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+
+
+def compression(filename):
+    """
+    Detect the compression of a file from its first bytes
+    :return: "gzip", "bzip2" or None
+    """
+    with open(filename, "rb") as f:
+        head = f.read(3)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(BZIP2_MAGIC):
+        return "bzip2"
+    return None
+
+
+def open_input(filename, queue_size=QUEUE_SIZE, block_size=BLOCK_SIZE):
+    """
+    Open a file for reading, decompressing it in a background thread if it is compressed
+    :param filename: A plain, gzip or bzip2 file
+    :param queue_size: Number of decompressed blocks that can wait for the reader
+    :param block_size: Size of the decompressed blocks in bytes
+    :return: A file-like object
+    """
+    kind = compression(filename)
+    if kind == "gzip":
+        return BackgroundReader(gzip.open(filename, "rb"), queue_size, block_size)
+    if kind == "bzip2":
+        return BackgroundReader(bz2.BZ2File(filename, "rb"), queue_size, block_size)
+    return open(filename, "rb")
+
+
+def open_output(filename, queue_size=QUEUE_SIZE):
+    """
+    Open a file for writing in a background thread, compressing it if the name ends with .gz or .bz2
+    :param filename: The output file, or "-" for the standard output
+    :param queue_size: Number of writes that can wait for the background thread
+    :return: A BackgroundWriter
+    """
+    if filename == "-":
+        return BackgroundWriter(lambda: sys.stdout, queue_size, close=False)
+    if filename.endswith(".gz"):
+        return BackgroundWriter(lambda: gzip.open(filename, "wb"), queue_size)
+    if filename.endswith(".bz2"):
+        return BackgroundWriter(lambda: bz2.BZ2File(filename, "wb"), queue_size)
+    return BackgroundWriter(lambda: open(filename, "wb"), queue_size)
+
+
+def strip_compression(filename):
+    """
+    Remove a .gz or .bz2 extension from a file name
+    """
+    for extension in (".gz", ".bz2"):
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+
+class BackgroundReader(object):
+    def __init__(self, stream, queue_size=QUEUE_SIZE, block_size=BLOCK_SIZE):
+        """
+        :param stream: A file-like object, e.g. a decompressing one, that is read in a background thread
+        :param queue_size: Number of blocks that can wait for the reader
+        :param block_size: Size of the blocks read from stream
+        """
+        self.stream = stream
+        self.block_size = block_size
+        self._queue = Queue(queue_size)
+        self._block = b""
+        self._position = 0
+        self._eof = False
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="BackgroundReader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._closed.is_set():
+                block = self.stream.read(self.block_size)
+                self._put(block)
+                if not block:
+                    break
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        # Wait for room in the queue, unless the reader was closed
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def _next_block(self):
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            self._eof = True
+            raise item
+        if not item:
+            self._eof = True
+        self._block = item
+        self._position = 0
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes (all the remaining bytes if size is negative)
+        """
+        chunks = []
+        remaining = size
+        while size < 0 or remaining > 0:
+            if self._position >= len(self._block):
+                if self._eof:
+                    break
+                self._next_block()
+                continue
+            if size < 0:
+                end = len(self._block)
+            else:
+                end = min(len(self._block), self._position + remaining)
+                remaining -= end - self._position
+            chunks.append(self._block[self._position:end])
+            self._position = end
+        return b"".join(chunks)
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class BackgroundWriter(object):
+    def __init__(self, opener, queue_size=QUEUE_SIZE, close=True):
+        """
+        :param opener: A function that opens the output stream. It is called in the background thread, so that e.g.
+        the header of a compressed file is written there too.
+        :param queue_size: Number of writes that can wait for the background thread
+        :param close: Close the stream at the end
+        """
+        self._opener = opener
+        self._close = close
+        self._queue = Queue(queue_size)
+        self._error = None
+        self._closed = False
+        self._pending = []
+        self._pending_size = 0
+        self._thread = threading.Thread(target=self._run, name="BackgroundWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        stream = None
+        done = False
+        try:
+            stream = self._opener()
+            while True:
+                data = self._queue.get()
+                if data is None:
+                    done = True
+                    break
+                stream.write(data)
+            if self._close:
+                stream.close()
+            else:
+                stream.flush()
+        except Exception as e:
+            self._error = e
+            # Keep taking the writes so that the writer does not block
+            while not done and self._queue.get() is not None:
+                pass
+
+    def write(self, data):
+        if self._error is not None:
+            raise self._error
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= WRITE_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending_size:
+            self._queue.put(b"".join(self._pending))
+        self._pending = []
+        self._pending_size = 0
+
+    def close(self):
+        """
+        Wait for the pending writes, and raise the error of the background thread if there was one
+        """
+        if not self._closed:
+            self._closed = True
+            self._flush()
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Do not hide the original exception
+            try:
+                self.close()
+            except Exception:
+                pass
+        return False
@@ -0,0 +1,59 @@
+"""
+A compact store for the OSM tags of ways.
+
+parse() keeps only a whitelist of tag keys. The tags of a way are stored on the way as one flat tuple
+(key, value, key, value, ...) ordered like the whitelist, and every key and value string is interned in a TagStore
+shared by the whole network. A way then costs one small tuple of pointers to shared strings, rather than a dict or a
+reference into the ElementTree that would keep the parsed document alive. Way.get_tag() and Way.get_tags() read the
+tuple back.
+"""
+
+# Tags kept by parse()
+TAG_KEYS = ("highway", "oneway", "ref", "name", "sidewalk", "width", "lanes")
+
+
+class TagStore(object):
+    def __init__(self, keys=TAG_KEYS):
+        """
+        :param keys: The tag keys to keep
+        """
+        self.keys = tuple(keys)
+        self._order = dict((key, i) for i, key in enumerate(self.keys))
+        self._strings = dict((key, key) for key in self.keys)
+
+    def intern(self, string):
+        """
+        Return the shared copy of a string
+        """
+        return self._strings.setdefault(string, string)
+
+    def encode(self, pairs):
+        """
+        Encode tags as a flat tuple
+        :param pairs: An iterable of (key, value). Keys outside of the whitelist are dropped.
+        :return: A tuple (key, value, key, value, ...) in the order of the whitelist
+        """
+        kept = sorted((self._order[key], value) for key, value in pairs if key in self._order)
+        tags = []
+        for i, value in kept:
+            tags.append(self.keys[i])
+            tags.append(self.intern(value))
+        return tuple(tags)
+
+    def from_element(self, element):
+        """
+        Encode the <tag> children of an OSM element
+        """
+        return self.encode((tag.get("k"), tag.get("v")) for tag in element.iter("tag"))
+
+
+def common_tags(tags_1, tags_2):
+    """
+    Return the tags that two ways share, e.g. for a way that replaces both
+    """
+    pairs_2 = set(zip(tags_2[::2], tags_2[1::2]))
+    common = []
+    for key, value in zip(tags_1[::2], tags_1[1::2]):
+        if (key, value) in pairs_2:
+            common.extend((key, value))
+    return tuple(common)
@@ -0,0 +1,90 @@
+import unittest
+import os
+import shutil
+import tempfile
+from shapely.geometry import LineString, box
+from ToSidewalk.area import AreaFilter
+from ToSidewalk.network import parse
+
+
+class TestAreaMethods(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.filename = "../../resources/SmallMap_01.osm"
+        cls.full = parse(cls.filename)
+        min_lat, min_lng, max_lat, max_lng = [float(value) for value in cls.full.bounds]
+        dlat, dlng = (max_lat - min_lat) / 4, (max_lng - min_lng) / 4
+        cls.bbox = (min_lat + dlat, min_lng + dlng, max_lat - dlat, max_lng - dlng)
+
+    def line(self, network, way):
+        return LineString([(network.nodes.get(nid).lng, network.nodes.get(nid).lat) for nid in way.nids])
+
+    def test_area_filter(self):
+        area_filter = AreaFilter((1., 2., 3., 4.), margin=0.)
+        self.assertTrue(area_filter.near(2., 3.))
+        self.assertFalse(area_filter.near(0.5, 3.))
+        self.assertTrue(area_filter.touches([(0., 3.), (5., 3.)]))
+        self.assertFalse(area_filter.touches([(0., 0.), (0., 5.)]))
+        self.assertFalse(area_filter.touches([]))
+        self.assertTrue(AreaFilter((1., 2., 3., 4.), margin=1.).near(0.995, 3.))
+        triangle = AreaFilter([(0., 0.), (0., 2.), (2., 0.)], margin=0.)
+        self.assertFalse(triangle.touches([(1.5, 1.5)]))
+        self.assertEqual(triangle.box, (0., 0., 2., 2.))
+        self.assertRaises(ValueError, AreaFilter, (3., 2., 1., 4.))
+        self.assertEqual(area_filter.outcode(2., 3.), 0)
+        self.assertEqual(area_filter.outcode(0., 3.) & area_filter.outcode(0., 5.), 1)
+        self.assertEqual(area_filter.outcode(2., 1.) & area_filter.outcode(2., 5.), 0)
+
+    def test_parse_bbox(self):
+        network = parse(self.filename, area=self.bbox)
+        area = box(self.bbox[1], self.bbox[0], self.bbox[3], self.bbox[2])
+        expected = set(way.id for way in self.full.ways.get_list() if self.line(self.full, way).intersects(area))
+        self.assertTrue(0 < len(expected) < len(self.full.ways.ways))
+        self.assertEqual(set(network.ways.ways.keys()), expected)
+        for way in network.ways.get_list():
+            # The streets that cross the boundary are kept whole
+            self.assertEqual(way.nids, self.full.ways.get(way.id).nids)
+        self.assertTrue(len(network.nodes.nodes) < len(self.full.nodes.nodes))
+
+        locations = [network.nodes.get(nid).location() for way in network.ways.get_list() for nid in way.nids]
+        self.assertEqual([float(value) for value in network.bounds],
+                         [min(lat for lat, _ in locations), min(lng for _, lng in locations),
+                          max(lat for lat, _ in locations), max(lng for _, lng in locations)])
+
+    def test_parse_polygon(self):
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        polygon = [(min_lat, min_lng), (min_lat, max_lng), (max_lat, max_lng), (max_lat, min_lng)]
+        network = parse(self.filename, area=polygon)
+        self.assertEqual(set(network.ways.ways.keys()), set(parse(self.filename, area=self.bbox).ways.ways.keys()))
+
+        empty = parse(self.filename, area=(0., 0., 0.001, 0.001))
+        self.assertEqual(len(empty.ways.ways), 0)
+        self.assertEqual(empty.bounds, ["0.0", "0.0", "0.001", "0.001"])
+
+    def test_parse_long_street(self):
+        # Streets whose only nodes are far from the area, on both sides of it
+        nodes = [(1, 38.9, -77.1), (2, 38.9, -77.0), (3, 38.95, -77.1), (4, 38.95, -77.0), (5, 38.85, -77.0)]
+        ways = [(10, (1, 2)), (11, (3, 4)), (12, (3, 5)), (13, (1, 99, 2))]
+        temp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(temp_dir, "long.osm")
+            with open(filename, "w") as f:
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+                for nid, lat, lng in nodes:
+                    f.write('<node id="%d" lat="%f" lon="%f"/>\n' % (nid, lat, lng))
+                for wid, nids in ways:
+                    f.write('<way id="%d">%s<tag k="highway" v="residential"/></way>\n' %
+                            (wid, "".join('<nd ref="%d"/>' % nid for nid in nids)))
+                f.write('</osm>\n')
+
+            triangle = [(38.89, -77.06), (38.91, -77.06), (38.91, -77.04)]
+            network = parse(filename, area=triangle, margin=0.1)
+            self.assertEqual(sorted(network.ways.ways.keys()), ["10", "12", "13"])
+            self.assertEqual(network.ways.get("10").nids, ["1", "2"])
+            self.assertEqual(sorted(network.nodes.nodes.keys()), ["1", "2", "3", "5"])
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from ToSidewalk.batch import *
+
+
+class TestBatchMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.temp_dir, "output")
+        self.manifest = os.path.join(self.temp_dir, "manifest.txt")
+        self.resources = os.path.abspath("../../resources")
+        with open(self.manifest, "w") as f:
+            f.write("# Regions\n")
+            f.write(os.path.join(self.resources, "SmallMap_01.osm") + "\n\n")
+            f.write(os.path.join(self.resources, "SmallMap_02.osm") + " custom/small_02.geojson\n")
+            f.write("missing.osm\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_manifest(self):
+        entries = read_manifest(self.manifest, self.output_dir)
+        self.assertEqual(entries, [
+            (os.path.join(self.resources, "SmallMap_01.osm"), os.path.join(self.output_dir, "SmallMap_01.geojson")),
+            (os.path.join(self.resources, "SmallMap_02.osm"), os.path.join(self.temp_dir, "custom/small_02.geojson")),
+            (os.path.join(self.temp_dir, "missing.osm"), os.path.join(self.output_dir, "missing.geojson"))
+        ])
+        self.assertTrue(read_manifest(self.manifest, self.output_dir, "mvt")[0][1].endswith(".mbtiles"))
+
+    def test_run_batch(self):
+        entries = read_manifest(self.manifest, self.output_dir)
+        journal = os.path.join(self.temp_dir, "journal.jsonl")
+        results = run_batch(entries, journal, processes=2)
+        self.assertEqual([r["status"] for r in results], ["done", "done", "failed"])
+        for input_path, output_path in entries[:2]:
+            with open(output_path) as f:
+                self.assertEqual(json.load(f)["type"], "FeatureCollection")
+        self.assertEqual([name for name in os.listdir(self.output_dir) if name.startswith(".tmp")], [])
+
+        # A rerun skips the regions that are done, and a region runs again when its output is gone
+        os.remove(entries[1][1])
+        results = run_batch(entries, journal, processes=2)
+        self.assertEqual([r["status"] for r in results], ["skipped", "done", "failed"])
+        self.assertEqual([r["status"] for r in run_batch(entries, journal, format="osm")][:2], ["done", "done"])
+        self.assertEqual(len(read_journal(journal)), 3)
+
+        # Other pipeline parameters run the regions again
+        results = run_batch(entries, journal, format="osm", min_component_size=5)
+        self.assertEqual([r["status"] for r in results], ["done", "done", "failed"])
+        self.assertEqual(read_journal(journal)[entries[0][0]]["min_component_size"], 5)
+        results = run_batch(entries, journal, format="osm", min_component_size=5)
+        self.assertEqual([r["status"] for r in results][:2], ["skipped", "skipped"])
+        results = run_batch(entries, journal, format="osm", stages=STAGES[:-1], min_component_size=5)
+        self.assertEqual([r["status"] for r in results][:2], ["done", "done"])
+
+    def test_worker_killed(self):
+        # A worker that dies without reporting fails its region, and the others still run
+        import ToSidewalk.batch as batch
+        entries = read_manifest(self.manifest, self.output_dir)[:2]
+        journal = os.path.join(self.temp_dir, "journal.jsonl")
+        run = batch.run_region
+
+        def crash(task):
+            if task[0] == entries[0][0]:
+                os.kill(os.getpid(), 9)
+            return run(task)
+
+        batch.run_region = crash
+        try:
+            results = run_batch(entries, journal, processes=2)
+        finally:
+            batch.run_region = run
+        self.assertEqual([r["status"] for r in results], ["failed", "done"])
+        self.assertIn("signal 9", results[0]["error"])
+        self.assertEqual(read_journal(journal)[entries[0][0]]["status"], "failed")
+        self.assertEqual([r["status"] for r in run_batch(entries, journal)], ["done", "skipped"])
+
+    def test_main(self):
+        self.assertEqual(main([self.manifest, "-o", self.output_dir, "-j", "1", "--memory-limit", "4096"]), 1)
+        records = read_journal(os.path.join(self.output_dir, JOURNAL_NAME))
+        self.assertEqual(sorted(r["status"] for r in records.values()), ["done", "done", "failed"])
+
+
+if __name__ == '__main__':
+    unittest.main()
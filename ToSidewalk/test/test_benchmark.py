@@ -0,0 +1,69 @@
+import unittest
+import os
+import shutil
+import tempfile
+from ToSidewalk.benchmark import *
+from ToSidewalk.network import *
+
+
+class TestBenchmarkMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_make_grid_city(self):
+        filename = os.path.join(self.temp_dir, "grid.osm")
+        node_count = make_grid_city(filename, 5, segment_nodes=2, dual_carriageway_every=0, diagonal_every=0)
+        self.assertEqual(node_count, 5 * 5 + 2 * (2 * 5 * 4))
+
+        street_network = parse(filename)
+        self.assertEqual(len(street_network.nodes.get_list()), node_count)
+        self.assertEqual(len(street_network.ways.get_list()), 10)
+
+        # Dual carriageways add a second way to every 2nd row, diagonals add high-degree intersections
+        node_count = make_grid_city(filename, 5, segment_nodes=2, dual_carriageway_every=2, diagonal_every=2)
+        street_network = parse(filename)
+        self.assertEqual(len(street_network.nodes.get_list()), node_count)
+        self.assertEqual(len(street_network.ways.get_list()), 10 + 2 + 2)
+        self.assertTrue(max(len(node.way_ids) for node in street_network.nodes.get_list()) >= 3)
+
+    def test_grid_size_for(self):
+        self.assertEqual(grid_size_for(7000), 32)
+        self.assertEqual(grid_size_for(1), 2)
+
+    def test_run_pipeline(self):
+        filename = os.path.join(self.temp_dir, "grid.osm")
+        node_count = make_grid_city(filename, 4, dual_carriageway_every=0)
+        records = run_pipeline(filename)
+
+        self.assertEqual([record["stage"] for record in records], STAGES)
+        for record in records:
+            self.assertEqual(record["status"], "ok")
+            self.assertEqual(record["nodes"], node_count)
+            self.assertTrue(record["wall_time"] >= 0)
+            self.assertTrue(record["peak_memory"] > 0)
+
+    def test_run_pipeline_default_grid(self):
+        # The default synthetic city must run through every stage, since the benchmark uses it at every size
+        filename = os.path.join(self.temp_dir, "grid.osm")
+        make_grid_city(filename, grid_size_for(1000))
+        records = run_pipeline(filename)
+
+        self.assertEqual([record["stage"] for record in records], STAGES)
+        self.assertEqual([record["status"] for record in records], ["ok"] * len(STAGES))
+        for record in records:
+            if record["peak_memory_source"] == "process_maxrss":
+                self.assertTrue(record["peak_memory_increase"] >= 0)
+
+    def test_compare(self):
+        old = {"records": [{"case": "a", "stage": "parse", "status": "ok", "wall_time": 2.0},
+                           {"case": "a", "stage": "preprocess", "status": "error", "wall_time": 1.0}]}
+        new = {"records": [{"case": "a", "stage": "parse", "status": "ok", "wall_time": 1.0},
+                           {"case": "a", "stage": "preprocess", "status": "ok", "wall_time": 1.0}]}
+        self.assertEqual(compare(old, new), [("a", "parse", 2.0, 1.0, 2.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
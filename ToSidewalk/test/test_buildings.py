@@ -0,0 +1,64 @@
+import unittest
+from ToSidewalk.buildings import *
+from ToSidewalk.network import *
+from ToSidewalk.nodes import Node, Nodes
+from ToSidewalk.ways import Sidewalk, Sidewalks
+from ToSidewalk.ToSidewalk import make_sidewalks
+
+
+class TestBuildingsMethods(unittest.TestCase):
+    def make_network(self):
+        """
+        A sidewalk a-b-c that runs through a building, and a sidewalk d-e along its wall
+        """
+        from shapely.geometry import box
+        nodes = Nodes()
+        ways = Sidewalks()
+        network = OSM(nodes, ways, ["0", "0", "0.001", "0.004"])
+        for nid, lat, lng in (("a", 0., 0.), ("b", 0., 0.002), ("c", 0., 0.004), ("d", 0.001, 0.001),
+                              ("e", 0.001, 0.003)):
+            network.add_node(Node(nid, lat, lng))
+        network.add_way(Sidewalk("1", ["a", "b", "c"], "footway"))
+        network.add_way(Sidewalk("2", ["d", "e"], "footway"))
+        buildings = Buildings(["10"], [box(0.001, -0.001, 0.003, 0.001)])
+        return network, buildings
+
+    def test_flag(self):
+        network, buildings = self.make_network()
+        self.assertEqual(mark_buildings(network, buildings), 1)
+        self.assertEqual(network.ways.get("1").get_tag(CONFLICT_TAG), "yes")
+        self.assertIsNone(network.ways.get("2").get_tag(CONFLICT_TAG))
+        self.assertIn('"building_conflict": "yes"', network.export())
+
+    def test_clip(self):
+        network, buildings = self.make_network()
+        self.assertEqual(mark_buildings(network, buildings, clip=True), 1)
+        pieces = sorted([network.nodes.get(nid).location() for nid in way.nids]
+                        for way in network.ways.get_list() if way.id != "2")
+        self.assertEqual(pieces, [[(0., 0.), (0., 0.001)], [(0., 0.003), (0., 0.004)]])
+        self.assertIsNone(network.nodes.get("b"))
+        self.assertEqual(mark_buildings(network, buildings, clip=True), 0)
+
+    def test_from_file(self):
+        filename = "../../resources/SmallMap_02.osm"
+        buildings = Buildings.from_file(filename)
+        self.assertEqual(len(buildings), len(read_building_ways(filename)))
+        self.assertTrue(len(buildings) > 100)
+        self.assertTrue(all(polygon.is_valid for polygon in buildings.polygons))
+
+        street_network = parse(filename)
+        street_network.preprocess()
+        street_network.parse_intersections()
+        sidewalk_network = make_sidewalks(street_network)
+        count = len(sidewalk_network.ways.ways)
+        self.assertTrue(mark_buildings(sidewalk_network, buildings, clip=True) > 0)
+        self.assertTrue(len(sidewalk_network.ways.ways) > count)
+        self.assertEqual(mark_buildings(sidewalk_network, buildings), 0)
+
+        bounds = [float(value) for value in street_network.bounds]
+        corner = (bounds[0], bounds[1], (bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2)
+        self.assertTrue(0 < len(Buildings.from_file(filename, area=corner)) < len(buildings))
+
+
+if __name__ == '__main__':
+    unittest.main()
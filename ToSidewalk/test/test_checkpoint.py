@@ -0,0 +1,115 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import time
+from ToSidewalk.checkpoint import *
+from ToSidewalk.cli import build, checkpoint_keys, main
+from ToSidewalk.instrument import Instrument
+from ToSidewalk.nodes import Node
+
+
+def geometries(network):
+    # Generated ways and nodes are identified by id(), so compare the exports by type and geometry
+    features = json.loads(network.export())["features"]
+    return sorted((f["properties"]["type"], f["geometry"]["coordinates"]) for f in features)
+
+
+class TestCheckpointMethods(unittest.TestCase):
+    filename = "../../resources/SmallMap_01.osm"
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_stage_key(self):
+        key = stage_key("abc", "parse", {"a": 1, "b": (2, 3)})
+        self.assertEqual(key, stage_key("abc", "parse", {"b": (2, 3), "a": 1}))
+        self.assertNotEqual(key, stage_key("abd", "parse", {"a": 1, "b": (2, 3)}))
+        self.assertNotEqual(key, stage_key("abc", "parse", {"a": 2, "b": (2, 3)}))
+
+        keys = dict(checkpoint_keys(self.filename))
+        self.assertEqual(sorted(keys), ["make_sidewalks", "parse", "preprocess"])
+        without_preprocess = dict(checkpoint_keys(self.filename, ["sidewalks"]))
+        self.assertEqual(keys["parse"], without_preprocess["parse"])
+        self.assertNotEqual(keys["make_sidewalks"], without_preprocess["make_sidewalks"])
+
+    def test_cache(self):
+        cache = CheckpointCache(os.path.join(self.temp_dir, "cache"), max_size=2500)
+        self.assertEqual(cache.load("a"), None)
+        cache.save("a", "x" * 1000)
+        cache.save("b", "y" * 1000)
+        self.assertEqual(cache.load("a"), "x" * 1000)
+        # Make the last uses distinct for file systems with a coarse mtime
+        os.utime(cache.path("b"), (time.time() - 10, time.time() - 10))
+
+        # "b" is the least recently used
+        cache.save("c", "z" * 1000)
+        self.assertTrue("a" in cache and "c" in cache)
+        self.assertFalse("b" in cache)
+        self.assertTrue(cache.size() <= 2500)
+
+        # A checkpoint larger than the cache is kept until the next save
+        cache.save("d", "w" * 3000)
+        self.assertEqual(cache.load("d"), "w" * 3000)
+        self.assertEqual(len(cache.entries()), 1)
+
+        with open(cache.path("e"), "wb") as f:
+            f.write("truncated")
+        self.assertEqual(cache.load("e"), None)
+        self.assertFalse("e" in cache)
+
+    def test_build_resume(self):
+        cache = CheckpointCache(self.temp_dir)
+        expected = geometries(build(self.filename, cache=cache))
+        self.assertEqual(len(cache.entries()), 3)
+
+        instrument = Instrument(trace_memory=False)
+        network = build(self.filename, instrument=instrument, cache=cache)
+        stages = [record["name"] for record in instrument.report()["stages"]]
+        self.assertNotIn("parse", stages)
+        self.assertNotIn("make_sidewalks", stages)
+        self.assertIn("make_crosswalks", stages)
+        self.assertEqual(instrument.report()["counters"]["checkpoint_hits"], 1)
+        self.assertEqual(geometries(network), expected)
+
+        # Resume from the preprocessed street network
+        os.remove(cache.path(dict(checkpoint_keys(self.filename))["make_sidewalks"]))
+        instrument = Instrument(trace_memory=False)
+        network = build(self.filename, instrument=instrument, cache=cache)
+        stages = [record["name"] for record in instrument.report()["stages"]]
+        self.assertNotIn("parse", stages)
+        self.assertNotIn("preprocess", stages)
+        self.assertIn("make_sidewalks", stages)
+        self.assertEqual(geometries(network), expected)
+
+        streets = build(self.filename, stages=["preprocess"], cache=cache)
+        self.assertEqual(len(cache.entries()), 3)
+        self.assertTrue(len(streets.ways.ways) > 0)
+
+    def test_generated_ids(self):
+        from ToSidewalk.utilities import new_id
+        cache = CheckpointCache(self.temp_dir)
+        build(self.filename, cache=cache)
+        _, sidewalk_network = cache.load(dict(checkpoint_keys(self.filename))["make_sidewalks"])
+        nodes = sidewalk_network.nodes.get_list()
+        self.assertTrue(all(node.generated and int(node.id) < 0 for node in nodes))
+
+        # The ids created after loading a checkpoint do not reuse the restored ones
+        lowest = min(int(node.id) for node in nodes)
+        self.assertTrue(int(new_id()) < lowest)
+        self.assertFalse(Node(1, 0, 0).generated)
+
+    def test_main_cache_dir(self):
+        output = os.path.join(self.temp_dir, "sidewalks.geojson")
+        cache_dir = os.path.join(self.temp_dir, "cache")
+        for _ in range(2):
+            self.assertEqual(main([self.filename, "-o", output, "--cache-dir", cache_dir]), 0)
+        self.assertEqual(len(CheckpointCache(cache_dir).entries()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from xml.etree import cElementTree as ET
+from ToSidewalk.cli import *
+
+
+class TestCliMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_run(self):
+        filename = "../../resources/SmallMap_01.osm"
+        geojson = json.loads(run(filename))
+        types = set(feature["properties"]["type"] for feature in geojson["features"])
+        self.assertEqual(types, {"footway", "crosswalk"})
+
+        geojson = json.loads(run(filename, stages=["preprocess", "sidewalks"]))
+        types = set(feature["properties"]["type"] for feature in geojson["features"])
+        self.assertEqual(types, {"footway"})
+
+        osm = ET.fromstring(run(filename, stages=["preprocess"], format="osm"))
+        self.assertTrue(len(osm.findall("way")) > 0)
+
+        self.assertRaises(ValueError, run, filename, ["crosswalks"])
+
+    def test_main(self):
+        output = os.path.join(self.temp_dir, "sidewalks.geojson")
+        report = os.path.join(self.temp_dir, "report.json")
+        self.assertEqual(main(["../../resources/SmallMap_01.osm", "-o", output, "--report", report]), 0)
+
+        with open(output) as f:
+            self.assertEqual(json.load(f)["type"], "FeatureCollection")
+        with open(report) as f:
+            stages = [record["name"] for record in json.load(f)["stages"]]
+        self.assertEqual(stages[0], "parse")
+        self.assertEqual(stages[-1], "export")
+
+        self.assertEqual(main([os.path.join(self.temp_dir, "missing.osm")]), 1)
+
+    def test_min_component_size(self):
+        from ToSidewalk.components import Components
+        network = build("../../resources/SmallMap_01.osm", min_component_size=10)
+        self.assertTrue(Components.from_network(network).sizes.min() >= 10)
+
+    def test_split_crossings(self):
+        from ToSidewalk.arrays import NetworkArrays
+        from ToSidewalk.crossings import find_crossings
+        network = build("../../resources/SmallMap_01.osm", crossings=True)
+        self.assertEqual(len(find_crossings(NetworkArrays.from_network(network))), 0)
+
+    def test_processes(self):
+        outputs = []
+        for processes in ("1", "2"):
+            output = os.path.join(self.temp_dir, "sidewalks_%s.geojson" % processes)
+            report = os.path.join(self.temp_dir, "report_%s.json" % processes)
+            self.assertEqual(main(["../../resources/SmallMap_01.osm", "-o", output, "-j", processes,
+                                   "--report", report]), 0)
+            with open(output) as f:
+                features = json.load(f)["features"]
+            with open(report) as f:
+                stages = dict((record["name"], record) for record in json.load(f)["stages"])
+            self.assertTrue(stages["encode"]["counters"]["length_km"] > 0)
+            outputs.append(sorted(feature["geometry"]["coordinates"] for feature in features))
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_main_index(self):
+        from ToSidewalk.query import SidewalkQuery
+        output = os.path.join(self.temp_dir, "sidewalks.geojson")
+        index = os.path.join(self.temp_dir, "sidewalks.index.npz")
+        self.assertEqual(main(["../../resources/SmallMap_01.osm", "-o", output, "--index", index]), 0)
+        with open(output) as f:
+            features = json.load(f)["features"]
+        query = SidewalkQuery.load(index)
+        self.assertEqual(len(query.arrays.way_ids), len(features))
+
+
+if __name__ == '__main__':
+    unittest.main()
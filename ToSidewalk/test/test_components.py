@@ -0,0 +1,67 @@
+import unittest
+import json
+import numpy as np
+from ToSidewalk.components import *
+from ToSidewalk.arrays import NetworkArrays
+from ToSidewalk.network import *
+from ToSidewalk.nodes import Node, Nodes
+from ToSidewalk.ways import Sidewalk, Sidewalks
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+class TestComponentsMethods(unittest.TestCase):
+    def make_network(self):
+        """
+        A path a-b-c-d, a separate way e-f, and an isolated node g
+        """
+        nodes = Nodes()
+        ways = Sidewalks()
+        network = Network(nodes, ways)
+        for i, nid in enumerate("abcdefg"):
+            network.add_node(Node(nid, i, i))
+        network.add_way(Sidewalk("1", ["a", "b", "c"], "footway"))
+        network.add_way(Sidewalk("2", ["d", "c"], "footway"))
+        network.add_way(Sidewalk("3", ["e", "f"], "footway"))
+        network.nodes.crosswalk_node_ids = ["a", "e"]
+        return network
+
+    def test_connected_components(self):
+        arrays = NetworkArrays.from_network(self.make_network())
+        labels = connected_components(arrays)
+        label = dict(zip(arrays.node_ids.tolist(), labels.tolist()))
+        self.assertEqual(len(set(label[nid] for nid in "abcd")), 1)
+        self.assertEqual(label["a"], 0)
+        self.assertEqual(label["e"], label["f"])
+        self.assertEqual(len(set(labels)), 3)
+
+    def test_components(self):
+        network = self.make_network()
+        components = Components.from_network(network)
+        self.assertEqual(components.sizes.tolist(), [4, 2, 1])
+        self.assertEqual(components.bboxes[0].tolist(), [0, 0, 3, 3])
+        report = json.loads(json.dumps(components.report(min_size=3)))
+        self.assertEqual(report["components"], 3)
+        self.assertEqual([(c["size"], c["way_ids"]) for c in report["small"]], [(2, ["3"]), (1, [])])
+
+        self.assertEqual(drop_small_components(network, 3, components), (1, 3))
+        self.assertEqual(sorted(network.nodes.nodes.keys()), ["a", "b", "c", "d"])
+        self.assertEqual(sorted(network.ways.ways.keys()), ["1", "2"])
+        self.assertEqual(network.nodes.crosswalk_node_ids, ["a"])
+
+    def test_sidewalk_network(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, sidewalk_network)
+
+        components = Components.from_network(sidewalk_network)
+        self.assertEqual(components.sizes.sum(), len(sidewalk_network.nodes.get_list()))
+        largest = components.sizes[0]
+        drop_small_components(sidewalk_network, largest)
+        self.assertEqual(len(sidewalk_network.nodes.get_list()), (components.sizes == largest).sum() * largest)
+        self.assertEqual(Components.from_network(sidewalk_network).sizes.min(), largest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from ToSidewalk.crossings import *
+from ToSidewalk.arrays import NetworkArrays
+from ToSidewalk.network import *
+from ToSidewalk.nodes import Node, Nodes
+from ToSidewalk.ways import Sidewalk, Sidewalks
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+class TestCrossingsMethods(unittest.TestCase):
+    def make_network(self):
+        """
+        Two sidewalks that cross near their ends (a-b-c and d-e), and a sidewalk f-g that touches a-b-c without
+        crossing it
+        """
+        nodes = Nodes()
+        ways = Sidewalks()
+        network = Network(nodes, ways)
+        for nid, lat, lng in (("a", 0., 0.), ("b", 0., 0.005), ("c", 0., 0.01), ("d", 0.01, 0.0099),
+                              ("e", -0.0001, 0.0099), ("f", 0.01, 0.002), ("g", 0., 0.002)):
+            network.add_node(Node(nid, lat, lng))
+        network.add_way(Sidewalk("1", ["a", "b", "c"], "footway"))
+        network.add_way(Sidewalk("2", ["d", "e"], "footway"))
+        network.add_way(Sidewalk("3", ["f", "g"], "footway"))
+        return network
+
+    def test_find_crossings(self):
+        arrays = NetworkArrays.from_network(self.make_network())
+        crossings = find_crossings(arrays)
+        self.assertEqual(len(crossings), 1)
+        start, end, way, _ = arrays.segments()
+        self.assertEqual(sorted(arrays.way_ids[way[[crossings.segment_a[0], crossings.segment_b[0]]]].tolist()),
+                         ["1", "2"])
+        self.assertAlmostEqual(crossings.coordinates[0, 0], 0.)
+        self.assertAlmostEqual(crossings.coordinates[0, 1], 0.0099)
+
+    def test_split_crossings(self):
+        network = self.make_network()
+        self.assertEqual(split_crossings(network), (1, 2, 2))
+        ways = sorted(network.ways.get_list(), key=lambda way: way.nids[0])
+        self.assertEqual(len(ways), 3)
+        self.assertEqual(ways[0].nids[:3], ["a", "b"] + ways[0].nids[2:3])
+        crossing = ways[0].nids[-1]
+        self.assertEqual(ways[1].nids, ["d", crossing])
+        self.assertIsNone(network.nodes.get("c"))
+        self.assertIsNone(network.nodes.get("e"))
+        self.assertEqual(sorted(network.nodes.get(crossing).way_ids), sorted([ways[0].id, ways[1].id]))
+        self.assertEqual(len(find_crossings(NetworkArrays.from_network(network))), 0)
+
+        # Without trimming, both ways are only split
+        network = self.make_network()
+        self.assertEqual(split_crossings(network, max_overshoot=0), (1, 2, 0))
+        self.assertEqual(len(network.ways.ways), 5)
+
+    def test_sidewalk_network(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, sidewalk_network)
+
+        count, _, _ = split_crossings(sidewalk_network)
+        self.assertTrue(count > 0)
+        self.assertEqual(len(find_crossings(NetworkArrays.from_network(sidewalk_network))), 0)
+        for way in sidewalk_network.ways.get_list():
+            for nid in way.nids:
+                self.assertIsNotNone(sidewalk_network.nodes.get(nid))
+
+
+if __name__ == '__main__':
+    unittest.main()
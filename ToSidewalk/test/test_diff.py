@@ -0,0 +1,86 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from ToSidewalk.diff import *
+from ToSidewalk.network import parse
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+class TestDiffMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def sidewalk_network(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, sidewalk_network)
+        return sidewalk_network
+
+    def test_hausdorff(self):
+        a = np.array([[0., 0.], [2., 0.]])
+        b = np.array([[2., 1.], [0., 1.], [0., 3.]])
+        self.assertAlmostEqual(directed_hausdorff(a, b), np.sqrt(2.) / 2 * np.sqrt(2.))
+        self.assertAlmostEqual(hausdorff(a, b), 3.)
+        self.assertAlmostEqual(hausdorff(a, a[::-1]), 0.)
+        self.assertEqual(geometry_key(a), geometry_key(a[::-1]))
+
+    def test_diff(self):
+        old = self.sidewalk_network()
+        new = self.sidewalk_network()
+        diff = NetworkDiff.from_sources(old, new)
+        self.assertEqual(diff.summary(), {"added": 0, "removed": 0, "modified": 0,
+                                          "unchanged": len(old.ways.ways)})
+
+        ways = sorted(new.ways.get_list(), key=lambda way: new.nodes.get(way.nids[0]).location())
+        moved, removed, retagged = [way for way in ways if way.type == "footway"][:3]
+        node = new.nodes.get(moved.nids[1])
+        node.set_location(node.lat, node.lng + 0.00001)
+        new.remove_way(removed.id)
+        retagged.tags = ("surface", "asphalt")
+        diff = NetworkDiff.from_sources(old, new)
+        summary = diff.summary()
+        self.assertEqual(summary["removed"], 1)
+        self.assertEqual(summary["added"], 0)
+        self.assertTrue(summary["modified"] >= 2)
+        features = diff.to_geojson()["features"]
+        modified = dict((feature["properties"]["id"], feature["properties"]) for feature in features
+                        if feature["properties"]["diff"] == "modified")
+        self.assertTrue(0 < modified[moved.id]["distance"] <= TOLERANCE)
+        self.assertEqual(modified[retagged.id]["distance"], 0.)
+        self.assertEqual([feature["properties"]["diff"] for feature in features].count("removed"), 1)
+
+        # A way that moved farther than the tolerance is removed and added
+        node.set_location(node.lat, node.lng + 0.001)
+        features = NetworkDiff.from_sources(old, new).to_geojson()["features"]
+        added = [feature["properties"]["id"] for feature in features if feature["properties"]["diff"] == "added"]
+        self.assertIn(moved.id, added)
+
+    def test_main(self):
+        old_file = os.path.join(self.temp_dir, "old.geojson")
+        new_file = os.path.join(self.temp_dir, "new.geojson.gz")
+        output = os.path.join(self.temp_dir, "diff.geojson")
+        network = self.sidewalk_network()
+        with open(old_file, "w") as f:
+            f.write(network.export())
+        network.remove_way(network.ways.get_list()[0].id)
+        import gzip
+        with gzip.open(new_file, "wb") as f:
+            f.write(network.export())
+
+        self.assertEqual(main([old_file, new_file, "-o", output]), 0)
+        with open(output) as f:
+            features = json.load(f)["features"]
+        self.assertEqual([feature["properties"]["diff"] for feature in features], ["removed"])
+        self.assertEqual(main([old_file, os.path.join(self.temp_dir, "missing.geojson")]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import numpy as np
+from ToSidewalk.executor import *
+from ToSidewalk.arrays import NetworkArrays, haversine
+from ToSidewalk.network import parse
+from ToSidewalk.ToSidewalk import make_sidewalks, make_sidewalk_nodes
+from ToSidewalk.utilities import window
+
+
+class TestExecutorMethods(unittest.TestCase):
+    def street_network(self, filename="../../resources/SmallMap_01.osm"):
+        street_network = parse(filename)
+        street_network.preprocess()
+        street_network.parse_intersections()
+        return street_network
+
+    def geometries(self, network):
+        return sorted(tuple(np.round([c for nid in way.nids for c in network.nodes.get(nid).location()], 10))
+                      for way in network.ways.get_list())
+
+    def test_way_lengths(self):
+        arrays = NetworkArrays.from_network(self.street_network())
+        executor = SharedExecutor(arrays, processes=1, chunk_size=3)
+        expected = []
+        for i in range(len(arrays.way_ids)):
+            coordinates = arrays.coordinates[arrays.way_nodes(i)]
+            expected.append(haversine(coordinates[:-1, 0], coordinates[:-1, 1],
+                                      coordinates[1:, 0], coordinates[1:, 1]).sum())
+        np.testing.assert_allclose(executor.map(way_lengths), expected)
+
+    def test_make_sidewalks(self):
+        street_network = self.street_network()
+        expected = []
+        for street in street_network.ways.get_list():
+            for nids in window(street.nids, 3, padding=1):
+                nodes = [street_network.nodes.get(nid) for nid in nids]
+                expected.append([c for node in make_sidewalk_nodes(street, *nodes) for c in node.location()])
+
+        street_network = self.street_network()
+        sidewalk_network = make_sidewalks(street_network)
+        actual = []
+        for street in street_network.ways.get_list():
+            sidewalk_1, sidewalk_2 = [sidewalk_network.ways.get(wid) for wid in street.get_sidewalk_ids()]
+            for nid_1, nid_2 in zip(sidewalk_1.nids, sidewalk_2.nids):
+                actual.append([c for nid in (nid_1, nid_2) for c in sidewalk_network.nodes.get(nid).location()])
+        # The generated ids of the streets, and so their order, differ between the two networks
+        np.testing.assert_allclose(sorted(actual), sorted(expected), rtol=0, atol=1e-12)
+        node = street_network.nodes.get_intersection_nodes()[0]
+        self.assertEqual(len(node.get_sidewalk_nodes(node.way_ids[0])), 2)
+
+    def test_geojson_features(self):
+        sidewalk_network = make_sidewalks(self.street_network())
+        expected = sidewalk_network.export()
+        for way in sidewalk_network.ways.get_list():
+            way.invalidate_feature()
+        for processes in (1, 2):
+            with SharedExecutor(NetworkArrays.from_network(sidewalk_network), processes, chunk_size=4) as executor:
+                sidewalk_network.encode_features(executor)
+            self.assertEqual(sidewalk_network.export(), expected)
+
+    def test_update(self):
+        small = NetworkArrays.from_network(self.street_network())
+        large = NetworkArrays.from_network(self.street_network("../../resources/SmallMap_02.osm"))
+        with SharedExecutor(large, processes=2, chunk_size=4) as executor:
+            pool = executor.pool
+            executor.update(small)
+            self.assertIs(executor.pool, pool)
+            self.assertEqual(len(executor.map(way_lengths)), len(small.way_ids))
+            self.assertEqual(len(executor.shared.coordinates), len(small.coordinates))
+            executor.update(large)
+            self.assertIs(executor.pool, pool)
+            lengths = executor.map(way_lengths)
+        with SharedExecutor(small, processes=2) as executor:
+            executor.update(large)
+            self.assertIsNot(executor.pool, None)
+            np.testing.assert_allclose(executor.map(way_lengths), lengths)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+from ToSidewalk.geopackage import *
+from ToSidewalk.network import *
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+class TestGeoPackageMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_geometry_blob(self):
+        blob, envelope = geometry_blob(WKB_LINESTRING, [(1.0, 2.0), (3.0, -4.0)])
+        self.assertEqual(envelope, (1.0, 3.0, -4.0, 2.0))
+        blob = bytes(blob)
+        magic, version, flags, srs_id = struct.unpack_from("<2sBBi", blob)
+        self.assertEqual((magic, version, flags, srs_id), (b"GP", 0, 0x03, 4326))
+        self.assertEqual(struct.unpack_from("<4d", blob, 8), envelope)
+        self.assertEqual(struct.unpack_from("<BII4d", blob, 40), (1, WKB_LINESTRING, 2, 1.0, 2.0, 3.0, -4.0))
+
+        blob, envelope = geometry_blob(WKB_POINT, [(1.0, 2.0)])
+        self.assertEqual(struct.unpack_from("<2sBBiBI2d", bytes(blob)), (b"GP", 0, 0x01, 4326, 1, WKB_POINT, 1.0, 2.0))
+
+    def test_write_geopackage(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, sidewalk_network)
+
+        filename = os.path.join(self.temp_dir, "sidewalks.gpkg")
+        counts = write_geopackage(sidewalk_network, filename, batch_size=10)
+        types = [way.type for way in sidewalk_network.ways.get_list()]
+        self.assertEqual(counts["crosswalks"], types.count("crosswalk"))
+        self.assertEqual(counts["sidewalks"], len(types) - types.count("crosswalk"))
+        self.assertEqual(counts["nodes"], len(sidewalk_network.nodes.get_list()))
+
+        connection = sqlite3.connect(filename)
+        self.assertEqual(connection.execute("PRAGMA application_id").fetchone()[0], APPLICATION_ID)
+        for table in ("sidewalks", "crosswalks", "nodes"):
+            n = connection.execute("SELECT count(*) FROM %s" % table).fetchone()[0]
+            self.assertEqual(n, counts[table])
+            min_x, max_x = connection.execute("SELECT min_x, max_x FROM gpkg_contents WHERE table_name = ?",
+                                              (table,)).fetchone()
+            self.assertTrue(min_x <= max_x)
+
+        # Query the spatial index with the bounds of the network
+        min_lat, min_lng, max_lat, max_lng = sidewalk_network.bounds
+        fids = connection.execute("SELECT id FROM rtree_sidewalks_geom WHERE maxx >= ? AND minx <= ? AND maxy >= ? "
+                                  "AND miny <= ?", (float(min_lng), float(max_lng), float(min_lat),
+                                                    float(max_lat))).fetchall()
+        self.assertTrue(0 < len(fids) <= counts["sidewalks"])
+        connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from ToSidewalk.instrument import *
+from ToSidewalk.network import *
+from ToSidewalk.ToSidewalk import main
+
+
+class TestInstrumentMethods(unittest.TestCase):
+    def test_stage(self):
+        instrument = Instrument()
+        with instrument.stage("outer"):
+            instrument.count("a")
+            with instrument.stage("inner"):
+                instrument.count("a", 2)
+                instrument.count("b")
+        report = instrument.report()
+
+        self.assertEqual([record["name"] for record in report["stages"]], ["outer", "inner"])
+        self.assertEqual(report["stages"][1]["parent"], "outer")
+        self.assertEqual(report["stages"][0]["counters"], {"a": 1})
+        self.assertEqual(report["counters"], {"a": 3, "b": 1})
+        for record in report["stages"]:
+            self.assertTrue(record["wall_time"] >= 0)
+            self.assertTrue(record["cpu_time"] >= 0)
+            self.assertTrue(record["peak_memory"] >= 0)
+        self.assertEqual(json.loads(instrument.to_json())["counters"], {"a": 3, "b": 1})
+
+    def test_stage_error(self):
+        instrument = Instrument()
+
+        def fail():
+            with instrument.stage("failing"):
+                raise ValueError("bad input")
+        self.assertRaises(ValueError, fail)
+        record = instrument.report()["stages"][0]
+        self.assertEqual(record["status"], "error")
+        self.assertEqual(record["error"], "ValueError: bad input")
+
+    def test_profile_dir(self):
+        profile_dir = tempfile.mkdtemp()
+        try:
+            instrument = Instrument(profile_dir=profile_dir)
+            with instrument.stage("outer"):
+                with instrument.stage("inner"):
+                    sum(range(100))
+            for record in instrument.report()["stages"]:
+                self.assertTrue(os.path.exists(record["profile"]))
+        finally:
+            shutil.rmtree(profile_dir)
+
+    def test_null_instrument(self):
+        with NULL_INSTRUMENT.stage("stage"):
+            NULL_INSTRUMENT.count("a")
+        self.assertEqual(NULL_INSTRUMENT.report(), {"stages": [], "counters": {}})
+
+    def test_pipeline(self):
+        filename = "../../resources/SmallMap_01.osm"
+        instrument = Instrument()
+        street_network = parse(filename)
+        street_network.preprocess(instrument=instrument)
+        street_network.parse_intersections()
+        main(street_network, instrument=instrument)
+        report = instrument.report()
+
+        names = [record["name"] for record in report["stages"]]
+        self.assertEqual(names, ["preprocess", "find_parallel_street_segments", "join_connected_ways",
+                                 "merge_parallel_street_segments", "split_streets", "merge_nodes",
+                                 "clean_street_segmentation", "make_sidewalks", "make_crosswalks", "export"])
+        self.assertTrue(report["counters"]["candidate_pairs_tested"] > 0)
+        self.assertTrue(report["counters"]["crosswalks_built"] > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
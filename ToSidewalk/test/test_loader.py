@@ -0,0 +1,68 @@
+import unittest
+import os
+from ToSidewalk.db.loader import *
+from ToSidewalk.network import *
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+# Set this to a SQLAlchemy URL of a PostGIS database (e.g., postgresql://localhost/test) to run the load test.
+DATABASE_URL = os.environ.get("TOSIDEWALK_TEST_DATABASE_URL")
+
+
+def make_sidewalk_network():
+    street_network = parse("../../resources/SmallMap_01.osm")
+    street_network.preprocess()
+    street_network.parse_intersections()
+    sidewalk_network = make_sidewalks(street_network)
+    make_crosswalks(street_network, sidewalk_network)
+    return sidewalk_network
+
+
+class TestLoaderMethods(unittest.TestCase):
+    def test_rows(self):
+        sidewalk_network = make_sidewalk_network()
+        sidewalk_rows = list(way_rows(sidewalk_network, "footway"))
+        crosswalk_rows = list(way_rows(sidewalk_network, "crosswalk"))
+        types = [way.type for way in sidewalk_network.ways.get_list()]
+        self.assertEqual(len(sidewalk_rows), types.count("footway"))
+        self.assertEqual(len(crosswalk_rows), types.count("crosswalk"))
+        self.assertEqual(len(list(node_rows(sidewalk_network))), len(sidewalk_network.nodes.get_list()))
+
+        fields = crosswalk_rows[0].rstrip("\n").split("\t")
+        self.assertEqual(fields[1], "crosswalk")
+        self.assertEqual(fields[2], "\\N")
+        self.assertTrue(fields[3].startswith("SRID=4326;LINESTRING("))
+
+    def test_ewkt(self):
+        self.assertEqual(linestring_ewkt([(1.5, 2.0), (3.0, 4.25)]), "SRID=4326;LINESTRING(1.5 2.0,3.0 4.25)")
+        self.assertEqual(point_ewkt(-77.0, 38.5), "SRID=4326;POINT(-77.0 38.5)")
+
+    def test_iterator_file(self):
+        rows = ["a\t1\n", "bb\t2\n", "ccc\t3\n"]
+        f = IteratorFile(iter(rows))
+        chunks = []
+        while True:
+            chunk = f.read(4)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.assertEqual("".join(chunks), "".join(rows))
+        self.assertTrue(all(len(chunk) <= 4 for chunk in chunks))
+        self.assertEqual(f.rows, 3)
+
+    @unittest.skipUnless(DATABASE_URL, "TOSIDEWALK_TEST_DATABASE_URL is not set")
+    def test_load(self):
+        from sqlalchemy import create_engine
+        engine = create_engine(DATABASE_URL)
+        sidewalk_network = make_sidewalk_network()
+        loader = Loader(engine, prefix="tosidewalk_test_")
+        counts = loader.load(sidewalk_network)
+        self.assertEqual(counts["nodes"], len(sidewalk_network.nodes.get_list()))
+        with engine.connect() as connection:
+            n = connection.execute("SELECT count(*) FROM tosidewalk_test_sidewalks").scalar()
+            self.assertEqual(n, counts["sidewalks"])
+            connection.execute("DROP TABLE tosidewalk_test_sidewalks, tosidewalk_test_crosswalks, "
+                               "tosidewalk_test_nodes")
+
+
+if __name__ == '__main__':
+    unittest.main()
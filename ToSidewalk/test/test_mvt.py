@@ -0,0 +1,63 @@
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+from ToSidewalk.mvt import *
+from ToSidewalk.network import *
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+class TestMvtMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_encode_geometry(self):
+        # The LineString example of the vector tile specification
+        self.assertEqual(encode_geometry([[(2, 2), (2, 10), (10, 10)]]), [9, 4, 4, 18, 0, 16, 16, 0])
+        self.assertEqual([zigzag(n) for n in (0, -1, 1, -2, 2)], [0, 1, 2, 3, 4])
+
+    def test_clip_line(self):
+        # A line that crosses the square
+        self.assertEqual(clip_line([(-10., 5.), (20., 5.)], 0., 10.), [[(0., 5.), (10., 5.)]])
+        # A line that leaves and comes back is split into two parts
+        parts = clip_line([(2., 2.), (2., 20.), (8., 20.), (8., 2.)], 0., 10.)
+        self.assertEqual(parts, [[(2., 2.), (2., 10.)], [(8., 10.), (8., 2.)]])
+        # A line outside the square
+        self.assertEqual(clip_line([(20., 20.), (30., 30.)], 0., 10.), [])
+        # A line inside the square comes back whole, with its vertices unchanged. x0 + 1. * (x1 - x0) is not always
+        # x1, e.g. on the long zigzag segments of this line.
+        points = [(100.3 + 3900.7 * (i % 2) + 0.37 * i, 50.1 + 79.3 * i) for i in range(50)]
+        self.assertEqual(clip_line(points, 0., 4096.), [points])
+
+    def test_tile_range(self):
+        self.assertEqual(tile_range([-85., -180., 85., 180.], 1), (0, 0, 1, 1))
+        self.assertEqual(tile_range([38.88, -77.0, 38.89, -76.99], 0), (0, 0, 0, 0))
+
+    def test_write_tiles(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, sidewalk_network)
+
+        directory = os.path.join(self.temp_dir, "tiles")
+        count = write_tiles(sidewalk_network, directory, min_zoom=15, max_zoom=17, processes=2)
+        files = [os.path.join(root, f) for root, dirs, fs in os.walk(directory) for f in fs]
+        self.assertEqual(len(files), count)
+        self.assertTrue(count >= 3)
+        self.assertEqual(sorted(os.listdir(directory)), ["15", "16", "17"])
+
+        filename = os.path.join(self.temp_dir, "tiles.mbtiles")
+        self.assertEqual(write_tiles(sidewalk_network, filename, min_zoom=15, max_zoom=17, processes=2), count)
+        connection = sqlite3.connect(filename)
+        self.assertEqual(connection.execute("SELECT count(*) FROM tiles").fetchone()[0], count)
+        self.assertEqual(connection.execute("SELECT value FROM metadata WHERE name = 'format'").fetchone()[0], "pbf")
+        connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
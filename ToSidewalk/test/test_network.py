@@ -1,3 +1,7 @@
+import json
+import os
+import shutil
+import tempfile
 import unittest
 from ToSidewalk.network import *
 from ToSidewalk.nodes import *
@@ -166,6 +170,73 @@ class TestNetworkMethods(unittest.TestCase):
         street_network.preprocess()
         # Todo: Write a better test...
 
+    def test_clean_street_segmentation(self):
+        # A street split into five segments, alternating in direction, with a side street at node 3
+        network = OSM(Nodes(), Streets(), [0, 0, 1, 1])
+        for i in range(8):
+            network.add_node(Node(i, 0, i))
+        network.add_node(Node(10, 1, 3))
+        segments = [[1, 0], [1, 2], [3, 2], [3, 4, 5], [6, 5]]
+        for nids in segments:
+            street = Street(None, [str(nid) for nid in nids])
+            street.tags = ("highway", "residential", "name", "Main")
+            network.add_way(street)
+        side = Street("side", ["3", "10"])
+        side.tags = ("highway", "residential")
+        network.add_way(side)
+
+        network.clean_street_segmentation()
+        nids = sorted(way.nids for way in network.ways.get_list())
+        self.assertEqual(len(nids), 3)
+        self.assertIn(["10", "3"], [sorted(n) for n in nids])
+        chains = [n for n in nids if "10" not in n]
+        self.assertIn(chains[0], (["0", "1", "2", "3"], ["3", "2", "1", "0"]))
+        self.assertIn(chains[1], (["3", "4", "5", "6"], ["6", "5", "4", "3"]))
+        for way in network.ways.get_list():
+            if way.id != "side":
+                self.assertEqual(way.get_tag("name"), "Main")
+        self.assertEqual(sorted(network.nodes.get("3").get_way_ids()), sorted(w.id for w in network.ways.get_list()))
+        self.assertEqual(len(network.nodes.get("4").get_way_ids()), 1)
+
+        # A closed loop of segments becomes one closed street
+        network = OSM(Nodes(), Streets(), [0, 0, 1, 1])
+        for i in range(4):
+            network.add_node(Node(i, i % 2, i // 2))
+        for nids in [[0, 1], [1, 3], [3, 2], [2, 0]]:
+            network.add_way(Street(None, [str(nid) for nid in nids]))
+        network.clean_street_segmentation()
+        ways = network.ways.get_list()
+        self.assertEqual(len(ways), 1)
+        self.assertEqual(len(ways[0].nids), 5)
+        self.assertEqual(ways[0].nids[0], ways[0].nids[-1])
+
+    def test_export_subset(self):
+        network = OSM(Nodes(), Streets(), [0, 0, 1, 1])
+        for i in range(4):
+            network.add_node(Node(i, 0, i))
+        network.add_way(Street("a", ["0", "1"]))
+        network.add_way(Street("b", ["1", "2", "3"]))
+
+        geojson = json.loads(network.export_subset(["b"]))
+        self.assertEqual([feature["id"] for feature in geojson["features"]], ["way/b"])
+        self.assertEqual(geojson["features"][0]["geometry"]["coordinates"], [[1, 0], [2, 0], [3, 0]])
+        self.assertEqual(len(json.loads(network.export())["features"]), 2)
+
+        # The cached features follow the changes to the ways and nodes
+        feature = network.encode_feature(network.ways.get("b"))
+        self.assertIs(network.encode_feature(network.ways.get("b")), feature)
+        network.nodes.get("2").set_location(1, 2)
+        coordinates = json.loads(network.encode_feature(network.ways.get("b")))["geometry"]["coordinates"]
+        self.assertEqual(coordinates[1], [2, 1])
+        network.ways.get("b").swap_nodes("3", "0")
+        coordinates = json.loads(network.encode_feature(network.ways.get("b")))["geometry"]["coordinates"]
+        self.assertEqual(coordinates[2], [0, 0])
+        network.ways.get("b").nids = ["1", "2"]
+        network.ways.get("b").tags = ("name", "Main")
+        properties = json.loads(network.export_subset(["b"]))["features"][0]["properties"]
+        self.assertEqual(properties["name"], "Main")
+        self.assertEqual(len(json.loads(network.export_subset(["b"]))["features"][0]["geometry"]["coordinates"]), 2)
+
     def test_swap_nodes(self):
         node1 = Node(1, 1, 1)
         node2 = Node(2, 2, 2)
@@ -246,6 +317,27 @@ class TestNetworkMethods(unittest.TestCase):
         string = """{"type": "FeatureCollection", "features": [{"geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [1.0, 0.0]]}, "type": "Feature", "properties": {"stroke": "#555555", "type": null, "id": "1", "user": "test"}, "id": "way/1"}, {"geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [-1.0, 0.0]]}, "type": "Feature", "properties": {"stroke": "#555555", "type": null, "id": "3", "user": "test"}, "id": "way/3"}, {"geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [0.0, 1.0]]}, "type": "Feature", "properties": {"stroke": "#555555", "type": null, "id": "2", "user": "test"}, "id": "way/2"}, {"geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [0.0, -1.0]]}, "type": "Feature", "properties": {"stroke": "#555555", "type": null, "id": "4", "user": "test"}, "id": "way/4"}]}"""
         self.assertEqual(mygeojson, string)
 
+    def test_parse_negative_ids(self):
+        # Files saved by JOSM have negative ids, which the generated nodes and ways must not reuse
+        from ToSidewalk.utilities import new_id
+        temp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(temp_dir, "josm.osm")
+            with open(filename, "w") as f:
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n'
+                        '<node id="-100000001" lat="38.9" lon="-77.0"/>\n'
+                        '<node id="-100000002" lat="38.9" lon="-77.001"/>\n'
+                        '<way id="-100000003"><nd ref="-100000001"/><nd ref="-100000002"/>'
+                        '<tag k="highway" v="residential"/></way>\n</osm>\n')
+            street_network = parse(filename)
+        finally:
+            shutil.rmtree(temp_dir)
+        self.assertEqual(sorted(street_network.nodes.nodes.keys()), ["-100000001", "-100000002"])
+        self.assertTrue(int(new_id()) < -100000003)
+        node = Node(None, 38.9, -77.002)
+        street_network.add_node(node)
+        self.assertEqual(len(street_network.nodes.get_list()), 3)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,3 +1,4 @@
+import json
 import unittest
 from ToSidewalk.nodes import *
 from ToSidewalk.latlng import *
@@ -11,9 +12,12 @@ class TestNodeMethods(unittest.TestCase):
         """
         node = Node(None, 0, 0)
         self.assertNotEqual(str(0), node.id)
+        self.assertTrue(node.generated)
+        self.assertTrue(int(node.id) < 0)
 
         node = Node(0, 0, 0)
         self.assertEqual(str(0), node.id)
+        self.assertFalse(node.generated)
 
         lat, lng = 38.898556, -77.037852
         node = Node(None, lat, lng)
@@ -73,6 +77,31 @@ class TestNodeMethods(unittest.TestCase):
         self.assertEqual(v[0], 0)
         self.assertEqual(v[1], 0)
 
+    def test_export(self):
+        nodes = Nodes()
+        streets = Streets()
+        network = OSM(nodes, streets, None)
+        node1, node2 = Node(None, 38.9, -77.0), Node(None, 38.9, -77.001)
+        network.add_nodes([node1, node2])
+        street = Street(None, [node1.id, node2.id])
+        network.add_way(street)
+
+        geojson = node1.export()
+        coordinates = json.loads(geojson)["features"][0]["geometry"]["coordinates"]
+        self.assertEqual(coordinates, [[-77.0, 38.9], [-77.001, 38.9]])
+        self.assertEqual(street.export(), geojson)
+        # The second export reuses the cached feature of the way
+        cached = street._feature[2]
+        self.assertEqual(node2.export(), geojson)
+        self.assertIs(street._feature[2], cached)
+
+        # Moving a node discards the cached features of its ways
+        node1.set_location(38.91, -77.0)
+        self.assertIsNone(street._feature)
+        coordinates = json.loads(node2.export())["features"][0]["geometry"]["coordinates"]
+        self.assertEqual(coordinates[0], [-77.0, 38.91])
+
+
 class TestNodesMethods(unittest.TestCase):
     def test_belongs_to(self):
         """
@@ -0,0 +1,142 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from ToSidewalk.arrays import *
+from ToSidewalk.index import *
+from ToSidewalk.query import *
+from ToSidewalk.network import *
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+class TestQueryMethods(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        cls.street_network = street_network
+        cls.sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, cls.sidewalk_network)
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_ragged_offsets(self):
+        self.assertEqual(ragged_offsets([2, 0, 3]).tolist(), [0, 1, 0, 1, 2])
+        self.assertEqual(ragged_offsets([]).tolist(), [])
+
+    def test_grid_index(self):
+        bboxes = np.array([[0, 0, 1, 1], [2, 2, 3, 3], [0.5, 0.5, 2.5, 2.5], [np.nan] * 4])
+        index = GridIndex(bboxes, cell_size=0.7)
+        self.assertEqual(sorted(index.query((0.9, 0.9, 1.1, 1.1))), [0, 2])
+        self.assertEqual(sorted(index.query((2.9, 2.9, 4, 4))), [1])
+        self.assertEqual(sorted(index.query((5, 5, 6, 6))), [])
+
+        random = np.random.RandomState(0)
+        corners = random.uniform(0, 10, (500, 2))
+        bboxes = np.hstack((corners, corners + random.uniform(0, 1, (500, 2))))
+        index = GridIndex.from_arrays(GridIndex(bboxes).arrays())
+        box = (3, 4, 5, 4.5)
+        expected = np.nonzero((bboxes[:, 0] <= 5) & (bboxes[:, 2] >= 3) & (bboxes[:, 1] <= 4.5) &
+                              (bboxes[:, 3] >= 4))[0]
+        self.assertEqual(sorted(index.query(box)), expected.tolist())
+
+        queries = np.vstack((bboxes[:50], [[3, 4, 5, 4.5], [20, 20, 21, 21]]))
+        boxes, items = index.join(queries)
+        pairs = set(zip(boxes.tolist(), items.tolist()))
+        self.assertEqual(len(pairs), len(boxes))
+        self.assertEqual(pairs, set((i, item) for i, query in enumerate(queries) for item in index.query(query)))
+
+    def test_network_arrays(self):
+        arrays = NetworkArrays.from_network(self.sidewalk_network)
+        for i, wid in enumerate(arrays.way_ids):
+            way = self.sidewalk_network.ways.get(wid)
+            self.assertEqual(arrays.node_ids[arrays.way_nodes(i)].tolist(), way.nids)
+        start, end, way, position = arrays.segments()
+        lengths = [len(w.nids) - 1 for w in self.sidewalk_network.ways.get_list()]
+        self.assertEqual(len(start), sum(lengths))
+        i = 5
+        nids = self.sidewalk_network.ways.get(arrays.way_ids[way[i]]).nids
+        self.assertEqual(arrays.node_ids[start[i]], nids[position[i]])
+        self.assertEqual(arrays.node_ids[end[i]], nids[position[i] + 1])
+
+    def test_ways_in_bbox(self):
+        query = SidewalkQuery.from_network(self.sidewalk_network)
+        min_lat, min_lng, max_lat, max_lng = [float(v) for v in self.sidewalk_network.bounds]
+        self.assertEqual(sorted(query.ways_in_bbox((min_lat - 1, min_lng - 1, max_lat + 1, max_lng + 1))),
+                         sorted(self.sidewalk_network.ways.ways.keys()))
+
+        bbox = (min_lat, min_lng, (min_lat + max_lat) / 2, (min_lng + max_lng) / 2)
+        inside = set(query.ways_in_bbox(bbox))
+        for way in self.sidewalk_network.ways.get_list():
+            nodes = [self.sidewalk_network.nodes.get(nid) for nid in way.nids]
+            if any(bbox[0] <= n.lat <= bbox[2] and bbox[1] <= n.lng <= bbox[3] for n in nodes):
+                self.assertIn(way.id, inside)
+
+        polygon = [(bbox[0], bbox[1]), (bbox[0], bbox[3]), (bbox[2], bbox[3]), (bbox[2], bbox[1])]
+        self.assertEqual(sorted(query.ways_in_polygon(polygon)), sorted(inside))
+
+    def test_nodes_within(self):
+        query = SidewalkQuery.from_network(self.sidewalk_network)
+        center = self.sidewalk_network.nodes.get_list()[0]
+        radius = 0.05
+        expected = [n.id for n in self.sidewalk_network.nodes.get_list() if center.distance_to(n) <= radius]
+        found = query.nodes_within(center.lat, center.lng, radius)
+        self.assertEqual(sorted(found), sorted(expected))
+        self.assertEqual(found[0], center.id)
+
+    def test_crosswalks_near(self):
+        query = SidewalkQuery.from_network(self.sidewalk_network)
+        crosswalk_ids = set(w.id for w in self.sidewalk_network.ways.get_list() if w.type == "crosswalk")
+        found = set()
+        for node in self.street_network.nodes.get_list():
+            if node.is_intersection():
+                near = query.crosswalks_near(node, 0.05)
+                self.assertTrue(set(near) <= crosswalk_ids)
+                found.update(near)
+        self.assertTrue(found)
+
+    def test_snap(self):
+        query = SidewalkQuery.from_network(self.sidewalk_network)
+        min_lat, min_lng, max_lat, max_lng = [float(v) for v in self.sidewalk_network.bounds]
+        random = np.random.RandomState(0)
+        lat = random.uniform(min_lat - 0.002, max_lat + 0.002, 200)
+        lng = random.uniform(min_lng - 0.002, max_lng + 0.002, 200)
+        way_ids, segments, points, distances = query.snap(lat, lng, chunk_size=64)
+
+        start = query.arrays.coordinates[query.segment_start]
+        end = query.arrays.coordinates[query.segment_end]
+        for i in range(len(lat)):
+            _, _, brute_force = project_to_segments(lat[i], lng[i], start, end)
+            self.assertAlmostEqual(distances[i], brute_force.min(), places=9)
+            way = self.sidewalk_network.ways.get(way_ids[i])
+            a = self.sidewalk_network.nodes.get(way.nids[segments[i]])
+            b = self.sidewalk_network.nodes.get(way.nids[segments[i] + 1])
+            _, projected, _ = project_to_segments(lat[i], lng[i], np.array([a.location()]), np.array([b.location()]))
+            self.assertTrue(np.allclose(projected[0], points[i]))
+
+        far = distances > 0.02
+        way_ids, segments, points, limited = query.snap(lat, lng, max_distance=0.02)
+        self.assertTrue(np.isinf(limited[far]).all())
+        self.assertTrue((way_ids[far] == "").all() and (segments[far] == -1).all())
+        self.assertTrue(np.isnan(points[far]).all())
+        self.assertTrue(np.allclose(limited[~far], distances[~far]))
+
+    def test_save_load(self):
+        query = SidewalkQuery.from_network(self.sidewalk_network)
+        filename = os.path.join(self.temp_dir, "sidewalks.index.npz")
+        query.save(filename)
+        loaded = SidewalkQuery.load(filename)
+        bbox = [float(v) for v in self.sidewalk_network.bounds]
+        self.assertEqual(loaded.ways_in_bbox(bbox), query.ways_in_bbox(bbox))
+        node = self.sidewalk_network.nodes.get_list()[3]
+        self.assertEqual(loaded.nodes_within(node.lat, node.lng, 0.1), query.nodes_within(node.lat, node.lng, 0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from ToSidewalk.routing import *
+from ToSidewalk.network import *
+from ToSidewalk.nodes import Node, Nodes
+from ToSidewalk.ways import Sidewalk, Sidewalks
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+class TestRoutingMethods(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_square(self):
+        """
+        A square a-b-c-d with a crosswalk from a to c across it
+        """
+        nodes = Nodes()
+        ways = Sidewalks()
+        network = Network(nodes, ways)
+        for nid, lat, lng in (("a", 0, 0), ("b", 0, 0.001), ("c", 0.001, 0.001), ("d", 0.001, 0), ("e", 1, 1)):
+            network.add_node(Node(nid, lat, lng))
+        network.add_way(Sidewalk("1", ["a", "b", "c"], "footway"))
+        network.add_way(Sidewalk("2", ["c", "d", "a"], "footway"))
+        network.add_way(Sidewalk("3", ["a", "c"], "crosswalk"))
+        return network
+
+    def test_shortest_path(self):
+        graph = PedestrianGraph.from_network(self.make_square())
+        side = haversine(0, 0, 0, 0.001)
+        diagonal = haversine(0, 0, 0.001, 0.001)
+
+        distance, path = graph.shortest_path("a", "c")
+        self.assertEqual(path, ["a", "c"])
+        self.assertAlmostEqual(distance, diagonal)
+
+        distance, path = graph.shortest_path("a", "c", crosswalk_penalty=2)
+        self.assertIn(path, (["a", "b", "c"], ["a", "d", "c"]))
+        self.assertAlmostEqual(distance, 2 * side, places=6)
+
+        distance, path = graph.shortest_path("b", "d", heuristic=False)
+        self.assertAlmostEqual(distance, 2 * side, places=6)
+        self.assertEqual(graph.shortest_path("a", "e"), (float("inf"), []))
+
+    def test_shortest_paths(self):
+        graph = PedestrianGraph.from_network(self.make_square())
+        distances = graph.shortest_paths("a", ["b", "c", "e"], crosswalk_penalty=2)
+        side = haversine(0, 0, 0, 0.001)
+        self.assertTrue(np.allclose(distances[:2], [side, 2 * side]))
+        self.assertTrue(np.isinf(distances[2]))
+
+        everything = graph.shortest_paths("a", cutoff=side * 1.2)
+        self.assertEqual(np.isfinite(everything).sum(), 3)
+
+    def test_sidewalk_network(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, sidewalk_network)
+        graph = PedestrianGraph.from_network(sidewalk_network)
+
+        source = graph.node_ids[0]
+        dijkstra = graph.shortest_paths(source)
+        reachable = np.flatnonzero(np.isfinite(dijkstra))
+        self.assertTrue(len(reachable) > 1)
+        matrix = graph.distance_matrix([source], graph.node_ids[reachable])
+        self.assertTrue(np.allclose(matrix[0], dijkstra[reachable]))
+        for target in graph.node_ids[reachable[::7]]:
+            distance, path = graph.shortest_path(source, target)
+            self.assertAlmostEqual(distance, dijkstra[graph.node_position(target)])
+            self.assertEqual((path[0], path[-1]), (source, target))
+
+    def test_save_load(self):
+        graph = PedestrianGraph.from_network(self.make_square())
+        directory = os.path.join(self.temp_dir, "graph")
+        graph.save(directory)
+        self.assertEqual(sorted(os.listdir(directory)), sorted(name + ".npy" for name in PedestrianGraph.ARRAYS))
+
+        loaded = PedestrianGraph.load(directory)
+        self.assertTrue(isinstance(loaded.indptr, np.memmap))
+        self.assertNotEqual(loaded.node_ids.dtype, np.dtype(object))
+        self.assertEqual(loaded.indptr.tolist(), graph.indptr.tolist())
+        self.assertEqual(loaded.way_types[loaded.edge_ways].tolist(), graph.way_types[graph.edge_ways].tolist())
+        self.assertEqual(loaded.shortest_path("b", "d", crosswalk_penalty=2), graph.shortest_path("b", "d", 2))
+
+        archive = os.path.join(self.temp_dir, "graph.npz")
+        graph.save(archive)
+        loaded = PedestrianGraph.load(archive)
+        self.assertTrue(np.array_equal(loaded.lengths, graph.lengths))
+        self.assertEqual(loaded.shortest_path("a", "c"), graph.shortest_path("a", "c"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import json
+import threading
+import urllib2
+from ToSidewalk.mvt import tile_range
+from ToSidewalk.server import *
+
+
+class TestServerMethods(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = SidewalkService.from_file("../../resources/SmallMap_01.osm", processes=1, cache_size=4)
+        cls.bounds = [float(value) for value in cls.service.street_network.bounds]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+
+    def test_tile_bbox(self):
+        x0, y0, x1, y1 = tile_range(self.bounds, 16)
+        bbox = tile_bbox(16, x0, y0, x1, y1)
+        self.assertTrue(bbox[0] <= self.bounds[0] and bbox[1] <= self.bounds[1])
+        self.assertTrue(bbox[2] >= self.bounds[2] and bbox[3] >= self.bounds[3])
+        self.assertEqual(tile_range(bbox, 16), (x0, y0, x1 + 1, y1 + 1))
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+    def test_subnetwork(self):
+        street_network = self.service.street_network
+        way_ids = self.service.query.ways_in_bbox(self.bounds)[:3]
+        sub = subnetwork(street_network, way_ids, self.bounds)
+        self.assertEqual(sorted(sub.ways.ways.keys()), sorted(way_ids))
+        for way_id in way_ids:
+            self.assertIsNot(sub.ways.get(way_id), street_network.ways.get(way_id))
+            for nid in sub.ways.get(way_id).nids:
+                self.assertIsNot(sub.nodes.get(nid), street_network.nodes.get(nid))
+
+    def test_sidewalks(self):
+        service = SidewalkService(self.service.street_network, processes=2)
+        try:
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(service.sidewalks(self.bounds)))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(set(results)), 1)
+            types = set(feature["properties"]["type"] for feature in json.loads(results[0])["features"])
+            self.assertEqual(types, {"footway", "crosswalk"})
+
+            # A slightly moved viewport is served from the cache
+            hits = service.cache.hits
+            moved = [self.bounds[0] + 1e-5, self.bounds[1] + 1e-5, self.bounds[2] - 1e-5, self.bounds[3] - 1e-5]
+            if service.snap(moved) == service.snap(self.bounds):
+                self.assertIs(service.sidewalks(moved), results[0])
+                self.assertEqual(service.cache.hits, hits + 1)
+
+            empty = json.loads(service.sidewalks([0, 0, 0.001, 0.001]))
+            self.assertEqual(empty["features"], [])
+            self.assertRaises(ValueError, service.sidewalks, [0, 0, 10, 10])
+        finally:
+            service.close()
+
+    def test_server(self):
+        server = SidewalkServer(("127.0.0.1", 0), self.service)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = "http://127.0.0.1:%d" % server.server_address[1]
+        try:
+            bbox = ",".join(str(value) for value in self.bounds)
+            geojson = json.load(urllib2.urlopen(url + "/sidewalks?crosswalks=0&bbox=" + bbox))
+            types = set(feature["properties"]["type"] for feature in geojson["features"])
+            self.assertEqual(types, {"footway"})
+            self.assertEqual(json.load(urllib2.urlopen(url + "/status"))["ways"],
+                             len(self.service.street_network.ways.ways))
+            for path in ("/sidewalks?bbox=1,2,3", "/sidewalks", "/missing"):
+                try:
+                    urllib2.urlopen(url + path)
+                    self.fail()
+                except urllib2.HTTPError as e:
+                    self.assertEqual(e.code, 404 if path == "/missing" else 400)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import struct
+from ToSidewalk.source import *
+
+
+def wkb_linestring(coordinates, byte_order="<"):
+    header = struct.pack(byte_order + "BII", 1 if byte_order == "<" else 0, 2, len(coordinates))
+    values = [value for coordinate in coordinates for value in coordinate]
+    return header + struct.pack(byte_order + "%dd" % len(values), *values)
+
+
+class TestSourceMethods(unittest.TestCase):
+    def test_linestring_from_wkb(self):
+        coordinates = [(-77.0, 38.9), (-77.1, 38.8)]
+        self.assertEqual(list(linestring_from_wkb(wkb_linestring(coordinates))), coordinates)
+        self.assertEqual(list(linestring_from_wkb(wkb_linestring(coordinates, ">"))), coordinates)
+
+        point = struct.pack("<BIdd", 1, 1, 0., 0.)
+        self.assertRaises(ValueError, linestring_from_wkb, point)
+
+    def test_build_network(self):
+        rows = [
+            ("way/1", "residential", wkb_linestring([(0.0, 0.0), (0.001, 0.0), (0.002, 0.0)])),
+            ("way/2", "residential", wkb_linestring([(0.001, 0.001), (0.001, 0.0), (0.001, -0.001)])),
+            ("way/3", "footway", wkb_linestring([(0.0, 0.0), (0.0, 0.001)]))
+        ]
+        street_network = build_network(iter(rows), [-0.01, -0.01, 0.01, 0.01])
+
+        self.assertEqual(sorted(way.id for way in street_network.ways.get_list()), ["1", "2"])
+        # The node at (0.001, 0.0) is shared by the two ways
+        self.assertEqual(len(street_network.nodes.get_list()), 5)
+        shared = street_network.nodes.get(street_network.ways.get("1").nids[1])
+        self.assertEqual(sorted(shared.get_way_ids()), ["1", "2"])
+        self.assertEqual(street_network.bounds, [-0.01, -0.01, 0.01, 0.01])
+
+        # The nodes get generated ids, and the streets a oneway tag like in parse()
+        self.assertTrue(all(node.generated for node in street_network.nodes.get_list()))
+        self.assertEqual(street_network.ways.get("1").get_oneway_tag(), "no")
+
+        street_network = build_network(iter(rows), [-0.01, -0.01, 0.01, 0.01], highway_types=None)
+        self.assertEqual(len(street_network.ways.get_list()), 3)
+
+        # Negative way ids of the table are reserved
+        from ToSidewalk.utilities import new_id
+        build_network(iter([("-200000000", "residential", rows[0][2])]), [-0.01, -0.01, 0.01, 0.01])
+        self.assertTrue(int(new_id()) < -200000000)
+
+        rows = [row + (oneway,) for row, oneway in zip(rows, ("yes", None, ""))]
+        street_network = build_network(iter(rows), [-0.01, -0.01, 0.01, 0.01], highway_types=None)
+        self.assertEqual([street_network.ways.get(wid).get_oneway_tag() for wid in ("1", "2", "3")],
+                         ["yes", "no", "no"])
+
+
+if __name__ == '__main__':
+    unittest.main()
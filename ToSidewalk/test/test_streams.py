@@ -0,0 +1,85 @@
+import unittest
+import bz2
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from ToSidewalk.streams import *
+from ToSidewalk.network import parse
+from ToSidewalk.cli import main
+
+
+class TestStreamsMethods(unittest.TestCase):
+    filename = "../../resources/SmallMap_01.osm"
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        with open(self.filename, "rb") as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def compressed(self, extension):
+        filename = os.path.join(self.temp_dir, "map.osm" + extension)
+        f = gzip.open(filename, "wb") if extension == ".gz" else bz2.BZ2File(filename, "wb")
+        f.write(self.data)
+        f.close()
+        return filename
+
+    def test_background_reader(self):
+        reader = BackgroundReader(io.BytesIO(self.data), queue_size=2, block_size=1000)
+        chunks = []
+        for size in (1, 999, 1500, 7, 100000):
+            chunks.append(reader.read(size))
+        self.assertEqual([len(chunk) for chunk in chunks[:4]], [1, 999, 1500, 7])
+        self.assertEqual(b"".join(chunks) + reader.read(), self.data)
+        self.assertEqual(reader.read(10), b"")
+        reader.close()
+
+        # Closing before the end stops the thread
+        reader = BackgroundReader(io.BytesIO(self.data), queue_size=1, block_size=10)
+        reader.read(5)
+        reader.close()
+        self.assertFalse(reader._thread.is_alive())
+
+    def test_open_input(self):
+        expected = parse(self.filename)
+        for extension in (".gz", ".bz2"):
+            filename = self.compressed(extension)
+            with open_input(filename) as f:
+                self.assertEqual(f.read(), self.data)
+            network = parse(filename)
+            self.assertEqual(sorted(network.ways.ways.keys()), sorted(expected.ways.ways.keys()))
+            self.assertEqual(network.bounds, expected.bounds)
+
+    def test_open_output(self):
+        chunks = ["%d," % i for i in range(100000)]
+        for extension in ("", ".gz", ".bz2"):
+            filename = os.path.join(self.temp_dir, "out.txt" + extension)
+            with open_output(filename) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                f.write(u"\u00e9")
+            with open_input(filename) as f:
+                self.assertEqual(f.read().decode("utf-8"), "".join(chunks) + u"\u00e9")
+
+        # The error of the background thread is raised by a later write or by close()
+        def write_missing():
+            with open_output(os.path.join(self.temp_dir, "missing", "out.txt")) as f:
+                f.write("x")
+        self.assertRaises(IOError, write_missing)
+
+    def test_main(self):
+        output = os.path.join(self.temp_dir, "sidewalks.geojson.gz")
+        self.assertEqual(main([self.compressed(".bz2"), "-o", output]), 0)
+        with open_input(output) as f:
+            geojson = json.loads(f.read())
+        self.assertEqual(geojson["type"], "FeatureCollection")
+        self.assertTrue(len(geojson["features"]) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+from xml.etree import cElementTree as ET
+from ToSidewalk.tags import *
+from ToSidewalk.network import *
+
+
+class TestTagsMethods(unittest.TestCase):
+    def test_tag_store(self):
+        store = TagStore(("highway", "name"))
+        tags = store.encode([("name", "Main"), ("surface", "asphalt"), ("highway", "residential")])
+        self.assertEqual(tags, ("highway", "residential", "name", "Main"))
+        other = store.encode([("highway", "resid" + "ential")])
+        self.assertTrue(other[1] is tags[1])
+
+        element = ET.fromstring('<way id="1"><nd ref="1"/><tag k="name" v="Main"/><tag k="lanes" v="2"/></way>')
+        self.assertEqual(store.from_element(element), ("name", "Main"))
+
+    def test_common_tags(self):
+        self.assertEqual(common_tags(("highway", "residential", "name", "A"), ("highway", "residential", "name", "B")),
+                         ("highway", "residential"))
+
+    def test_parse(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        for street in street_network.ways.get_list():
+            self.assertTrue(isinstance(street.tags, tuple))
+            self.assertIn(street.get_tag("highway"), VALID_HIGHWAYS)
+            self.assertTrue(set(street.get_tags()) <= set(TAG_KEYS))
+            self.assertFalse(isinstance(street.get_ref_tag(), type(ET.Element("tag"))))
+
+        street_network = parse("../../resources/SmallMap_01.osm", tag_keys=("highway",))
+        self.assertEqual(set(len(street.tags) for street in street_network.ways.get_list()), {2})
+
+    def test_export(self):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        names = set(street.get_tag("name") for street in street_network.ways.get_list())
+        self.assertTrue(names - {None})
+        street = street_network.ways.get_list()[0]
+        street.tags = street.tags + ("sidewalk", u"b\xf6th & \"more\"")
+
+        osm = ET.fromstring(street_network.export(format="osm"))
+        exported = set(tag.get("v") for tag in osm.findall(".//tag[@k='name']"))
+        self.assertEqual(exported, names - {None})
+        self.assertEqual(osm.find(".//tag[@k='sidewalk']").get("v"), u"b\xf6th & \"more\"")
+
+        geojson = json.loads(street_network.export())
+        exported = set(feature["properties"].get("name") for feature in geojson["features"])
+        self.assertEqual(exported, names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import json
+from ToSidewalk.topojson import *
+from ToSidewalk.network import *
+from ToSidewalk.ToSidewalk import make_sidewalks, make_crosswalks
+
+
+def decode(topology):
+    """
+    Return the coordinates of each geometry, by id
+    """
+    scale_x, scale_y = topology["transform"]["scale"]
+    x0, y0 = topology["transform"]["translate"]
+    arcs = []
+    for arc in topology["arcs"]:
+        x, y = 0, 0
+        positions = []
+        for dx, dy in arc:
+            x, y = x + dx, y + dy
+            positions.append([x0 + x * scale_x, y0 + y * scale_y])
+        arcs.append(positions)
+
+    coordinates = {}
+    for geometry in topology["objects"][OBJECT_NAME]["geometries"]:
+        points = []
+        for ref in geometry.get("arcs", []):
+            positions = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+            points.extend(positions[1:] if points else positions)
+        coordinates[geometry["id"]] = points
+    return coordinates
+
+
+class TestTopoJSONMethods(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        street_network = parse("../../resources/SmallMap_01.osm")
+        street_network.preprocess()
+        street_network.parse_intersections()
+        cls.sidewalk_network = make_sidewalks(street_network)
+        make_crosswalks(street_network, cls.sidewalk_network)
+
+    def test_topojson(self):
+        network = self.sidewalk_network
+        text = network.export(format="topojson", precision=6)
+        topology = json.loads(text)
+        self.assertEqual(topology["type"], "Topology")
+        geojson = json.loads(network.export())
+        coordinates = decode(topology)
+        self.assertEqual(len(coordinates), len(geojson["features"]))
+        for feature in geojson["features"]:
+            points = coordinates[feature["id"]]
+            self.assertEqual(len(points), len(feature["geometry"]["coordinates"]))
+            for (x, y), (lng, lat) in zip(points, feature["geometry"]["coordinates"]):
+                self.assertTrue(abs(x - lng) <= 0.6e-6 and abs(y - lat) <= 0.6e-6)
+
+        geometries = topology["objects"][OBJECT_NAME]["geometries"]
+        self.assertEqual(geometries[0]["properties"]["stroke"], "#555555")
+        unstyled = to_topojson(network, precision=5, style=False)
+        for geometry in unstyled["objects"][OBJECT_NAME]["geometries"]:
+            self.assertNotIn("stroke", geometry["properties"])
+            self.assertNotIn("user", geometry["properties"])
+        self.assertEqual(unstyled["transform"]["scale"], [1e-5, 1e-5])
+        self.assertTrue(len(dumps(network, precision=5, style=False)) < len(text) < len(json.dumps(geojson)))
+
+    def test_shared_arcs(self):
+        network = OSM(Nodes(), Streets(), [0, 0, 1, 1])
+        for i in range(5):
+            network.add_node(Node(i, 0.001 * i, 0.002 * i))
+        network.add_way(Street("a", ["0", "1", "2", "3"]))
+        network.add_way(Street("b", ["3", "2", "1"]))
+        network.add_way(Street("c", ["3", "4"]))
+        topology = to_topojson(network)
+        arcs = dict((g["id"], g["arcs"]) for g in topology["objects"][OBJECT_NAME]["geometries"])
+        # "b" follows the arcs 1-2 and 2-3 of "a" backwards
+        self.assertEqual(len(arcs["way/a"]), 3)
+        self.assertEqual(arcs["way/b"], [~arcs["way/a"][2], ~arcs["way/a"][1]])
+        self.assertEqual(len(topology["arcs"]), 4)
+        self.assertEqual(topology["arcs"][arcs["way/c"][0]], [[6000, 3000], [2000, 1000]])
+
+
+if __name__ == '__main__':
+    unittest.main()
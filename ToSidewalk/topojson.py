@@ -0,0 +1,104 @@
+"""
+Export a network as TopoJSON (https://github.com/topojson/topojson-specification).
+
+In GeoJSON every way repeats the full coordinates of the nodes it shares with other ways. Here each way is cut into
+arcs at the nodes that other ways use as well, an arc that several ways follow is stored once (a way that follows it
+backwards refers to it as ~index), and the coordinates of the arcs are quantized to a grid of 10^-precision degrees
+and delta-encoded as small integers:
+
+    topology = to_topojson(sidewalk_network, precision=6, style=False)
+    text = sidewalk_network.export(format="topojson", precision=6, style=False)
+
+A precision of 6 decimal places is about 0.1 meters. With style=False the style properties (stroke and user) that
+the GeoJSON export repeats on every feature are left out.
+"""
+import json
+
+OBJECT_NAME = "ways"
+# The stroke color of the GeoJSON export
+STROKE = "#555555"
+
+
+def to_topojson(network, precision=6, style=True, name=OBJECT_NAME):
+    """
+    Encode a network as a TopoJSON topology
+    :param network: A network
+    :param precision: Number of decimal places of the quantized coordinates (in degrees)
+    :param style: Include the style properties of the features
+    :param name: The name of the geometry collection of the ways
+    :return: A dictionary that can be serialized to JSON
+    """
+    ways = network.ways.get_list()
+    nodes = network.nodes
+
+    # The number of times each node is used by the ways. Arcs end at the nodes used more than once.
+    uses = {}
+    for way in ways:
+        for nid in way.nids:
+            uses[nid] = uses.get(nid, 0) + 1
+
+    locations = dict((nid, nodes.get(nid).location()) for nid in uses)
+    if locations:
+        min_lat = min(lat for lat, _ in locations.values())
+        min_lng = min(lng for _, lng in locations.values())
+        max_lat = max(lat for lat, _ in locations.values())
+        max_lng = max(lng for _, lng in locations.values())
+    else:
+        min_lat = min_lng = max_lat = max_lng = 0.
+    scale = 10. ** -precision
+    quantized = dict((nid, (int(round((lng - min_lng) / scale)), int(round((lat - min_lat) / scale))))
+                     for nid, (lat, lng) in locations.items())
+
+    arcs = []
+    arc_index = {}
+
+    def arc(run):
+        i = arc_index.get(run)
+        if i is not None:
+            return i
+        i = arc_index.get(run[::-1])
+        if i is not None:
+            return ~i
+        positions = []
+        x0, y0 = 0, 0
+        for nid in run:
+            x, y = quantized[nid]
+            positions.append([x - x0, y - y0])
+            x0, y0 = x, y
+        arc_index[run] = len(arcs)
+        arcs.append(positions)
+        return len(arcs) - 1
+
+    geometries = []
+    for way in ways:
+        properties = way.get_tags()
+        properties.update({'type': way.type, 'id': way.id})
+        if style:
+            properties.update({'user': way.user, 'stroke': STROKE})
+        geometry = {'type': None, 'id': 'way/%s' % way.id, 'properties': properties}
+        nids = way.nids
+        if len(nids) >= 2:
+            refs = []
+            start = 0
+            for i in range(1, len(nids)):
+                if i == len(nids) - 1 or uses[nids[i]] > 1:
+                    refs.append(arc(tuple(nids[start:i + 1])))
+                    start = i
+            geometry['type'] = 'LineString'
+            geometry['arcs'] = refs
+        geometries.append(geometry)
+
+    return {
+        'type': 'Topology',
+        'bbox': [min_lng, min_lat, max_lng, max_lat],
+        'transform': {'scale': [scale, scale], 'translate': [min_lng, min_lat]},
+        'objects': {name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': arcs
+    }
+
+
+def dumps(network, precision=6, style=True, name=OBJECT_NAME):
+    """
+    Encode a network as a compact TopoJSON string
+    """
+    return json.dumps(to_topojson(network, precision, style, name), separators=(",", ":"))
@@ -1,6 +1,38 @@
 from itertools import islice
+import threading
 import numpy as np
 
+# The number of ids given by new_id() so far. It only grows, so the ids stay unique among all the networks of a
+# process, and reserve_ids() moves it past the ids of the networks restored from a checkpoint (see checkpoint.py).
+_last_id = [0]
+_id_lock = threading.Lock()
+
+
+def new_id():
+    """
+    Return an id for a node or a way that was not read from the OSM data. As in JOSM, the generated ids are negative
+    (-1, -2, ... in the order of creation), so they never clash with the ids of the OSM database. Files saved by JOSM
+    carry negative ids of their own; the readers pass those to reserve_ids(). The nodes and ways that get an id from
+    new_id() are marked with generated = True.
+    """
+    with _id_lock:
+        _last_id[0] += 1
+        return str(-_last_id[0])
+
+
+def reserve_ids(ids):
+    """
+    Make new_id() skip some negative ids, e.g. those of an input file or of a network restored from a checkpoint
+    :param ids: An iterable of ids. The ids that are not negative integers are ignored.
+    """
+    lowest = 0
+    for i in ids:
+        if i.startswith("-") and i[1:].isdigit():
+            lowest = min(lowest, int(i))
+    with _id_lock:
+        _last_id[0] = max(_last_id[0], -lowest)
+
+
 def area(p1, p2, p3):
     """
     Given three points (x1, y1), (x2, y2), (x3, y3), return the area of the triangle that is formed by the three points.
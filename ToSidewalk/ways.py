@@ -1,55 +1,57 @@
 import json
 import numpy as np
 import logging as log
+from utilities import new_id
 class Way(object):
+    _feature = None  # The cached GeoJSON feature (see OSM.encode_feature)
+
     def __init__(self, wid=None, nids=(), type=None):
         if wid is None:
-            self.id = str(id(self))
+            self.id = new_id()
         else:
             self.id = str(wid)
+        self.generated = wid is None
         self.nids = nids
         self.type = type
         self.user = 'test'
         self.parent_ways = None
+        self.tags = ()  # OSM tags as a flat (key, value, ...) tuple. See tags.py
 
     def belongs_to(self):
         return self.parent_ways
 
+    def invalidate_feature(self):
+        """
+        Discard the cached GeoJSON feature of this way
+        """
+        self._feature = None
+
     def export(self):
+        """
+        Export this way as a GeoJSON FeatureCollection, from its cached feature (see OSM.encode_feature)
+        """
         if self.parent_ways and self.parent_ways.parent_network:
-            geojson = {}
-            geojson['type'] = "FeatureCollection"
-            geojson['features'] = []
-            feature = self.get_geojson_features()
-            geojson['features'].append(feature)
-            return json.dumps(geojson)
-
-    def get_geojson_features(self):
-        feature = {}
-        feature['properties'] = {
-            'type': self.type,
-            'id': self.id,
-            'user': self.user,
-            "stroke-width": 2,
-            "stroke-opacity": 1,
-            'stroke': '#e93f3f'
-        }
-        feature['type'] = 'Feature'
-        feature['id'] = 'way/%s' % (self.id)
-
-        coordinates = []
-        for nid in self.nids:
-            node = self.parent_ways.parent_network.nodes.get(nid)
-            coordinates.append([node.lng, node.lat])
-        feature['geometry'] = {
-            'type': 'LineString',
-            'coordinates': coordinates
-        }
-        return feature
+            return self.parent_ways.parent_network.export_subset([self.id])
 
     def get_node_ids(self):
         return self.nids
 
+    def get_tag(self, key, default=None):
+        """
+        Return the value of an OSM tag of this way
+        """
+        tags = self.tags
+        for i in range(0, len(tags), 2):
+            if tags[i] == key:
+                return tags[i + 1]
+        return default
+
+    def get_tags(self):
+        """
+        Return the OSM tags of this way as a dictionary
+        """
+        return dict(zip(self.tags[::2], self.tags[1::2]))
+
     def get_shared_node_ids(self, other):
         """
         Other could be either a list of node ids or a Way object
@@ -66,6 +68,7 @@ class Way(object):
     def swap_nodes(self, nid_from, nid_to):
         index_from = self.nids.index(nid_from)
         self.nids[index_from] = nid_to
+        self.invalidate_feature()
 
 class Ways(object):
     def __init__(self):
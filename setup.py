@@ -37,7 +37,13 @@ setup(
     author_email='koe.bluebear@gmail.com',
     description='The program generates potential sidewalk network from OpenStreetMap street data',
     long_description='',
-    packages=['ToSidewalk'],
+    packages=['ToSidewalk', 'ToSidewalk.db'],
+    entry_points={
+        'console_scripts': ['tosidewalk = ToSidewalk.cli:main',
+                            'tosidewalk-batch = ToSidewalk.batch:main',
+                            'tosidewalk-server = ToSidewalk.server:main',
+                            'tosidewalk-diff = ToSidewalk.diff:main']
+    },
     include_package_data=True,
     platforms='any',
     test_suite='',